@@ -3,6 +3,13 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn config.asgi:application``, or
+``gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker``) so
+that async views wait on the event loop instead of holding a worker: the
+notification stream (``myths.streams``) and, with ``API_ASYNC_VIEWS`` (on by
+default here), the myth, category and notification reads
+(``core.async_views``).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +19,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('API_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
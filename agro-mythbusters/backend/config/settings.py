@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 import dj_database_url
@@ -63,8 +64,10 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +75,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ActivityLogMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -191,7 +195,9 @@ REST_FRAMEWORK = {
         'user': '1000/day',
     },
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.FastJSONRenderer',
+        # Only offered when the `msgpack` package is installed.
+        *(['core.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
@@ -238,6 +244,123 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# Full-text search
+# Text search configuration used for the PostgreSQL myth search index.
+MYTH_SEARCH_CONFIG = os.getenv('MYTH_SEARCH_CONFIG', 'simple')
+
+# Vote counters
+# 'direct' updates Myth counters in the voting transaction; 'sharded' spreads
+# them over counter shards that `manage.py flush_vote_counters` folds in.
+MYTH_VOTE_COUNTER_MODE = os.getenv('MYTH_VOTE_COUNTER_MODE', 'direct')
+MYTH_VOTE_COUNTER_SHARDS = int(os.getenv('MYTH_VOTE_COUNTER_SHARDS', '8'))
+
+# Leaderboards
+# Length of the trending/top lists kept in memory (see myths/rankings.py).
+MYTH_RANKING_TOP_N = int(os.getenv('MYTH_RANKING_TOP_N', '50'))
+
+# Notification fan-out (see myths/notifications.py)
+NOTIFICATION_FANOUT_BATCH_SIZE = int(os.getenv('NOTIFICATION_FANOUT_BATCH_SIZE', '1000'))
+# A user gets at most one notification of a type per myth within this window.
+NOTIFICATION_DEDUP_WINDOW = timedelta(
+    minutes=int(os.getenv('NOTIFICATION_DEDUP_WINDOW_MINUTES', '10'))
+)
+# Notification retention (see `manage.py apply_retention`): read
+# notifications are compacted into monthly summaries after
+# NOTIFICATION_COMPACT_AFTER_DAYS and all are dropped after
+# NOTIFICATION_RETENTION_DAYS.
+NOTIFICATION_COMPACT_AFTER_DAYS = int(os.getenv('NOTIFICATION_COMPACT_AFTER_DAYS', '30'))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '365'))
+# Notification event stream (see myths/streams.py); a ticket reopens the
+# stream after each timeout until it is TICKET_MAX_AGE seconds old.
+NOTIFICATION_STREAM_POLL_INTERVAL = float(os.getenv('NOTIFICATION_STREAM_POLL_INTERVAL', '2'))
+NOTIFICATION_STREAM_TIMEOUT = int(os.getenv('NOTIFICATION_STREAM_TIMEOUT', '300'))
+NOTIFICATION_STREAM_TICKET_MAX_AGE = int(os.getenv('NOTIFICATION_STREAM_TICKET_MAX_AGE', '3600'))
+
+# User activity log (see core/activity.py); turned off by the test runner
+# (core/test_runner.py).
+USER_ACTIVITY_LOG_ENABLED = os.getenv('USER_ACTIVITY_LOG_ENABLED', 'True') == 'True'
+# Addresses or networks of the reverse proxies in front of the app (nginx in
+# docker-compose), comma-separated. Requests from them are attributed to the
+# client they report in X-Forwarded-For / X-Real-IP; from anyone else these
+# headers are ignored.
+TRUSTED_PROXY_IPS = [
+    network.strip() for network in os.getenv('TRUSTED_PROXY_IPS', '').split(',') if network.strip()
+]
+USER_ACTIVITY_BUFFER_SIZE = int(os.getenv('USER_ACTIVITY_BUFFER_SIZE', '10000'))
+USER_ACTIVITY_BATCH_SIZE = int(os.getenv('USER_ACTIVITY_BATCH_SIZE', '500'))
+USER_ACTIVITY_FLUSH_INTERVAL = float(os.getenv('USER_ACTIVITY_FLUSH_INTERVAL', '2'))
+# Activities older than this are archived by `manage.py apply_retention`.
+USER_ACTIVITY_RETENTION_DAYS = int(os.getenv('USER_ACTIVITY_RETENTION_DAYS', '180'))
+
+# Offline batch ingestion (see myths/ingest.py)
+MYTH_BATCH_MAX_OPERATIONS = int(os.getenv('MYTH_BATCH_MAX_OPERATIONS', '500'))
+# Idempotency keys are kept this long by `manage.py apply_retention`; a
+# batch replayed later is applied again.
+MYTH_BATCH_KEY_RETENTION_DAYS = int(os.getenv('MYTH_BATCH_KEY_RETENTION_DAYS', '30'))
+
+# List endpoints serialize .values() rows instead of model instances (see
+# core/fast_serializers.py).
+API_FAST_LIST_SERIALIZATION = os.getenv('API_FAST_LIST_SERIALIZATION', 'True') == 'True'
+
+# Response compression (see core/compression.py); brotli requires the
+# `brotli` package, gzip is always available.
+API_COMPRESSION_ENABLED = os.getenv('API_COMPRESSION_ENABLED', 'True') == 'True'
+API_COMPRESSION_MIN_SIZE = int(os.getenv('API_COMPRESSION_MIN_SIZE', '512'))
+API_COMPRESSION_CONTENT_TYPES = (
+    'application/json', 'application/msgpack', 'application/x-ndjson', 'text/csv',
+)
+
+# Request instrumentation (see core/instrumentation.py)
+API_INSTRUMENTATION_ENABLED = os.getenv('API_INSTRUMENTATION_ENABLED', 'True') == 'True'
+# Requests at least this slow are sampled into the slow request traces.
+API_SLOW_REQUEST_MS = float(os.getenv('API_SLOW_REQUEST_MS', '500'))
+API_SLOW_TRACE_SAMPLE_RATE = float(os.getenv('API_SLOW_TRACE_SAMPLE_RATE', '1.0'))
+API_SLOW_TRACE_LIMIT = int(os.getenv('API_SLOW_TRACE_LIMIT', '50'))
+# Bearer token a Prometheus scraper sends to /api/metrics/; staff users can
+# read the metrics without it.
+API_METRICS_TOKEN = os.getenv('API_METRICS_TOKEN', '')
+
+# Delta sync for offline clients (see myths/sync.py)
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+# Changes are served once this old, and a sync page stops at the first
+# change that is not. Covers the clock skew between the app servers and
+# PostgreSQL, which holds back changes made after the oldest open write
+# transaction began (see myths/sync.py).
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '2'))
+# Tombstones are kept this long by `manage.py apply_retention`; older sync
+# tokens are refused and the client syncs from scratch.
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '90'))
+
+# Async views for the myth, category and notification reads (see
+# core/async_views.py). config/asgi.py turns them on; leave them off under WSGI.
+API_ASYNC_VIEWS = os.getenv('API_ASYNC_VIEWS', 'False') == 'True'
+
+# Test runner; see core/test_runner.py.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Caching
+# Local-memory LRU by default; set REDIS_URL (requires the `redis` package)
+# to share the cache between workers.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('LOCMEM_CACHE_MAX_ENTRIES', '5000'))},
+        }
+    }
+
+# Anonymous myth/category read responses (see myths/cache.py)
+API_CACHE_ENABLED = os.getenv('API_CACHE_ENABLED', 'True') == 'True'
+API_CACHE_ALIAS = os.getenv('API_CACHE_ALIAS', 'default')
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', '300'))
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
 DEFAULT_FROM_EMAIL = 'noreply@agromythbusters.com'
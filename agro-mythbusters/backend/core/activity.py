@@ -0,0 +1,228 @@
+"""
+Write-behind ``UserActivity`` logging.
+
+``ActivityLogMiddleware`` records one activity per authenticated API
+request, but never writes it in the request: events go to a bounded
+in-process buffer that a background thread drains every
+``USER_ACTIVITY_FLUSH_INTERVAL`` seconds (or as soon as a batch is full)
+with one ``bulk_create`` per ``USER_ACTIVITY_BATCH_SIZE`` events.
+
+Memory is bounded by ``USER_ACTIVITY_BUFFER_SIZE``: when the database falls
+behind, new events are dropped and counted rather than queued without limit.
+Activity logging is best effort - events still buffered when a process is
+killed are lost - so it must not be used for anything that needs to be
+exact.
+
+The buffer is flushed on interpreter exit and, under gunicorn, from the
+``worker_exit`` hook in ``gunicorn.conf.py``. After a fork (gunicorn
+``--preload``) the child starts with an empty buffer and its own thread.
+"""
+import atexit
+import ipaddress
+import logging
+import os
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import UserActivity
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT_MAX_LENGTH = 512
+
+
+def logging_enabled():
+    return getattr(settings, 'USER_ACTIVITY_LOG_ENABLED', False)
+
+
+class ActivityBuffer:
+    """
+    Bounded queue of pending activities with a background flush thread.
+
+    ``capacity``, ``batch_size`` and ``flush_interval`` default to the
+    ``USER_ACTIVITY_*`` settings; a ``flush_interval`` of 0 starts no thread
+    and leaves flushing to the caller.
+    """
+
+    def __init__(self, capacity=None, batch_size=None, flush_interval=None):
+        self._capacity = capacity
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Serializes flushes, so stop() cannot race the thread's last batch.
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self._reset()
+        self.dropped = self.written = self.failed = 0
+        self.dropped_since_flush = 0
+
+    @property
+    def capacity(self):
+        return self._capacity or getattr(settings, 'USER_ACTIVITY_BUFFER_SIZE', 10000)
+
+    @property
+    def batch_size(self):
+        return self._batch_size or getattr(settings, 'USER_ACTIVITY_BATCH_SIZE', 500)
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'USER_ACTIVITY_FLUSH_INTERVAL', 2.0)
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.events = deque()
+        self.thread = None
+        self.stopping = False
+
+    def add(self, **fields):
+        """Queue one activity. Returns ``False`` when it had to be dropped."""
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            if len(self.events) >= self.capacity:
+                self.dropped += 1
+                self.dropped_since_flush += 1
+                return False
+            fields.setdefault('created_at', timezone.now())
+            self.events.append(fields)
+            full = len(self.events) >= self.batch_size
+            if self.thread is None and self.flush_interval and not self.stopping:
+                self._start()
+        if full:
+            self.wakeup.set()
+        return True
+
+    def _start(self):
+        self.thread = threading.Thread(
+            target=self._run, name='user-activity-flush', daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('User activity flush failed')
+        close_old_connections()
+
+    def _take(self):
+        with self.lock:
+            count = min(len(self.events), self.batch_size)
+            return [self.events.popleft() for _ in range(count)]
+
+    def flush(self):
+        """Write every buffered activity. Returns the number written."""
+        written = 0
+        with self.flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                try:
+                    UserActivity.objects.bulk_create(
+                        [UserActivity(**fields) for fields in batch]
+                    )
+                except DatabaseError:
+                    logger.exception('Dropped %d user activities', len(batch))
+                    with self.lock:
+                        self.failed += len(batch)
+                    continue
+                written += len(batch)
+            with self.lock:
+                self.written += written
+                dropped, self.dropped_since_flush = self.dropped_since_flush, 0
+        if dropped:
+            logger.warning('User activity buffer full: dropped %d activities', dropped)
+        return written
+
+    def stop(self, timeout=5):
+        """Stop the flush thread and write what is left."""
+        with self.lock:
+            self.stopping = True
+            thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            self.wakeup.set()
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'buffered': len(self.events),
+                'capacity': self.capacity,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+            }
+
+
+activity_buffer = ActivityBuffer()
+
+
+def trusted_proxies():
+    return _networks(tuple(getattr(settings, 'TRUSTED_PROXY_IPS', ())))
+
+
+@lru_cache(maxsize=8)
+def _networks(values):
+    return tuple(ipaddress.ip_network(value, strict=False) for value in values)
+
+
+def _address(value):
+    try:
+        return ipaddress.ip_address(value.strip())
+    except ValueError:
+        return None
+
+
+def client_ip(request):
+    """
+    The client's address: ``REMOTE_ADDR``, unless that is a proxy in
+    ``TRUSTED_PROXY_IPS``. Then it is the nearest address in
+    ``X-Forwarded-For`` that is not a trusted proxy, or ``X-Real-IP``.
+    """
+    remote = _address(request.META.get('REMOTE_ADDR') or '')
+    proxies = trusted_proxies()
+
+    def trusted(address):
+        return any(address in network for network in proxies)
+
+    if remote is None or not trusted(remote):
+        return str(remote) if remote else None
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    client = None
+    for value in reversed(forwarded.split(',') if forwarded else []):
+        client = _address(value)
+        if client is None or not trusted(client):
+            break
+    if client is None:
+        client = _address(request.META.get('HTTP_X_REAL_IP', '')) or remote
+    return str(client)
+
+
+def record_request(request, response, buffer=None):
+    """Queue the activity of one API request."""
+    match = request.resolver_match
+    (buffer or activity_buffer).add(
+        user_id=request.user.pk,
+        activity_type=(match.view_name or request.method)[:50],
+        details={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+        },
+        ip_address=client_ip(request),
+        user_agent=request.headers.get('User-Agent', '')[:USER_AGENT_MAX_LENGTH],
+    )
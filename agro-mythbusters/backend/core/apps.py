@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .instrumentation import install_execute_wrapper
+        from .partitions import ensure_all_partitions
+
+        connection_created.connect(install_execute_wrapper)
+
+        # Every deploy migrates, so partitions never depend on the retention job alone.
+        post_migrate.connect(ensure_all_partitions, sender=self)
@@ -0,0 +1,136 @@
+"""
+Native async reads for DRF viewsets.
+
+DRF 3.14 dispatches synchronously, so a request to a viewset holds a worker
+for as long as its queries take. With ``API_ASYNC_VIEWS`` on (``config.asgi``
+turns it on by default), a viewset using ``AsyncReadMixin`` is served by an
+async view for GET and HEAD requests to its ``async_actions``:
+
+* authentication, permissions, throttles and filter backends are sync code
+  that may read the database or the cache; each of those steps runs in one
+  ``sync_to_async`` call;
+* the page, its count and single objects are read with the async ORM
+  (``async for``, ``acount()``, ``aget()``), through the ``a``-prefixed
+  twins of the methods involved: ``alist``, ``aretrieve``,
+  ``aget_object``, ``apaginate_queryset`` (see ``CachedResponseMixin``,
+  ``FastListMixin`` and ``KeysetPagination`` for theirs);
+* serializing runs on the event loop, or in a thread for viewsets whose
+  serializers query while serializing (``serializer_queries``).
+
+Other methods and actions of the same route are passed to the regular view,
+run in a thread.
+
+With the setting off, as under WSGI, viewsets are unchanged: an async view
+there would run every request on an event loop of its own.
+
+Django 4.2's async ORM still runs each query in a thread, since there is no
+async database driver, so the gain is concurrency: under an ASGI server a
+request waiting on the database no longer takes one of a fixed number of
+sync workers. ``manage.py benchmark_concurrency`` measures it.
+"""
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+SAFE_READ_METHODS = ('GET', 'HEAD')
+
+
+def async_views_enabled():
+    return getattr(settings, 'API_ASYNC_VIEWS', False)
+
+
+class AsyncReadMixin:
+    """
+    Viewset mixin serving GET/HEAD requests to ``async_actions`` with async
+    views when ``API_ASYNC_VIEWS`` is on. Must come after mixins that have
+    async twins of ``list``/``retrieve`` (e.g. ``CachedResponseMixin``).
+    """
+    async_actions = ('list', 'retrieve')
+    # Whether serializing may query the database (lazy relations, nested
+    # pages); such serializers run in a thread.
+    serializer_queries = True
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not async_views_enabled() or actions.get('get') not in cls.async_actions:
+            return view
+        sync_view = sync_to_async(view)
+        action_map = {'head': actions['get'], **actions}
+
+        async def async_view(request, *args, **kwargs):
+            if request.method not in SAFE_READ_METHODS:
+                return await sync_view(request, *args, **kwargs)
+            # Like the view of ViewSetMixin.as_view.
+            self = cls(**initkwargs)
+            self.action_map = action_map
+            for method, action in action_map.items():
+                setattr(self, method, getattr(self, action))
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        # Keeps cls, actions, initkwargs and csrf_exempt for routers and schemas.
+        return update_wrapper(async_view, view)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """``dispatch`` calling the ``a<action>`` handler."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, f'a{self.action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def afilter_queryset(self, queryset):
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def apaginate_queryset(self, queryset):
+        paginator = self.paginator
+        if paginator is None:
+            return None
+        if hasattr(paginator, 'apaginate_queryset'):
+            return await paginator.apaginate_queryset(queryset, self.request, view=self)
+        return await sync_to_async(paginator.paginate_queryset)(queryset, self.request, view=self)
+
+    async def aserialize(self, instance, many=False):
+        """The serializer's data for ``instance``; in a thread if ``serializer_queries``."""
+        def serialize():
+            return self.get_serializer(instance, many=many).data
+
+        if self.serializer_queries:
+            return await sync_to_async(serialize)()
+        return serialize()
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            # Like rest_framework.generics.get_object_or_404.
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(await self.aserialize(page, many=True))
+        return Response(await self.aserialize([obj async for obj in queryset], many=True))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(await self.aserialize(await self.aget_object()))
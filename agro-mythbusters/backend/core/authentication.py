@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import BaseAuthentication
+
+# request.auth of requests authenticated by MetricsTokenAuthentication.
+METRICS_SCOPE = 'metrics'
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Bearer <API_METRICS_TOKEN>`` for metrics scrapers. No
+    user is authenticated; other bearer tokens are left to the JWT
+    authentication that follows.
+    """
+
+    def authenticate(self, request):
+        token = getattr(settings, 'API_METRICS_TOKEN', '')
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and constant_time_compare(header, f'Bearer {token}'):
+            return AnonymousUser(), METRICS_SCOPE
+        return None
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
@@ -0,0 +1,211 @@
+"""
+Fast list serialization from ``.values()`` rows.
+
+Serializing a page with a ``ModelSerializer`` instantiates every model (and
+every ``select_related`` model) of the page and walks the serializer's
+fields for each of them, nested serializers included. A ``ValuesSerializer``
+produces the same dicts from a ``.values()`` query instead:
+
+* the field map of its ``serializer_class`` - output key, value column and
+  conversion - is built once per instance; plain strings, numbers and
+  booleans are copied as they come from the database, only dates, decimals,
+  files and the like go through their DRF field's ``to_representation``;
+* nested single serializers (``category = CategorySerializer()``) read the
+  joined columns of the same query (``category__name``) and are built once
+  per distinct related id in a serialized batch; rows share that dict;
+* ``SerializerMethodField`` values come from ``get_<field>(values)`` methods
+  on the ``ValuesSerializer`` itself, reading the columns the serializer
+  names in ``method_field_columns`` (see ``core.fieldsets``) and
+  ``extra_columns``.
+
+Output must stay identical to ``serializer_class``: the tests compare the
+two for every view using one. Fields a values row cannot express (``many``
+relations, ``source='*'``, dotted sources) raise ``ImproperlyConfigured``.
+
+``FastListMixin`` uses a ``ValuesSerializer`` for a viewset's list when
+``API_FAST_LIST_SERIALIZATION`` is on (the default). Serializing rows reads
+nothing from the database, so async views do it on the event loop.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models.fields.files import FieldFile
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+# Fields whose representation of a database value is the value itself.
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    PrimaryKeyRelatedField,
+)
+
+VALUE, NESTED, METHOD = 'value', 'nested', 'method'
+
+
+def fast_list_enabled():
+    return getattr(settings, 'API_FAST_LIST_SERIALIZATION', True)
+
+
+def _file_converter(field, model_field):
+    def convert(name):
+        return field.to_representation(FieldFile(None, model_field, name))
+    return convert
+
+
+class ValuesSerializer:
+    """Builds ``serializer_class`` output from ``.values()`` rows."""
+    serializer_class = None
+    # Columns read by get_<field> methods.
+    extra_columns = ()
+    # Columns selected only when the queryset annotates them.
+    optional_columns = ()
+
+    def __init__(self, context=None, serializer=None):
+        """``serializer`` is a ``serializer_class`` instance to follow, e.g. pruned by ``?fields=``."""
+        if serializer is None:
+            serializer = self.serializer_class(context=context or {})
+        self.columns = []
+        self.plan = self._plan(serializer, serializer.Meta.model, '')
+        for column in self.extra_columns:
+            if column not in self.columns:
+                self.columns.append(column)
+
+    def _plan(self, serializer, model, prefix):
+        plan = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                method = getattr(self, field.method_name, None)
+                if method is None:
+                    raise ImproperlyConfigured(
+                        f'{type(self).__name__} needs {field.method_name}(values) for {name!r}.'
+                    )
+                for column in getattr(serializer, 'method_field_columns', {}).get(name, ()):
+                    if f'{prefix}{column}' not in self.columns:
+                        self.columns.append(f'{prefix}{column}')
+                plan.append((METHOD, name, None, method))
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(f'{name!r}: source {field.source!r} is not a column.')
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(f'{name!r} is not a field of {model.__name__}.')
+            column = f'{prefix}{field.source}'
+
+            if isinstance(field, serializers.BaseSerializer):
+                if isinstance(field, serializers.ListSerializer) or not (
+                    model_field.many_to_one or model_field.one_to_one
+                ):
+                    raise ImproperlyConfigured(f'{name!r}: only forward single relations nest.')
+                related = model_field.related_model
+                key = f'{column}__{related._meta.pk.name}'
+                if key not in self.columns:
+                    self.columns.append(key)
+                plan.append((NESTED, name, key, self._plan(field, related, f'{column}__')))
+                continue
+            if model_field.many_to_many or model_field.one_to_many:
+                raise ImproperlyConfigured(f'{name!r}: many relations are not columns.')
+
+            if isinstance(field, serializers.FileField):
+                converter = _file_converter(field, model_field)
+            elif isinstance(field, IDENTITY_FIELDS):
+                converter = None
+            else:
+                converter = field.to_representation
+            if column not in self.columns:
+                self.columns.append(column)
+            plan.append((VALUE, name, column, converter))
+        return plan
+
+    def values(self, queryset, extra=()):
+        """
+        ``queryset`` as rows with the columns of the field map, ``extra``,
+        annotated ``optional_columns`` and those of its ordering (so keyset
+        cursors can be read off the rows).
+        """
+        columns = list(self.columns)
+        ordering = queryset.query.order_by or (
+            queryset.model._meta.ordering if queryset.query.default_ordering else ()
+        )
+        optional = [name for name in self.optional_columns if name in queryset.query.annotations]
+        for column in [*extra, *optional, *ordering, 'pk']:
+            if isinstance(column, str):
+                column = column.lstrip('-')
+                if column not in columns and not column.startswith('?'):
+                    columns.append(column)
+        return queryset.prefetch_related(None).values(*columns)
+
+    def _build(self, plan, values, shared):
+        data = {}
+        for kind, name, column, arg in plan:
+            if kind is VALUE:
+                value = values[column]
+                data[name] = value if value is None or arg is None else arg(value)
+            elif kind is NESTED:
+                pk = values[column]
+                if pk is None:
+                    data[name] = None
+                    continue
+                built = shared.setdefault(column, {})
+                nested = built.get(pk)
+                if nested is None:
+                    nested = built[pk] = self._build(arg, values, shared)
+                data[name] = nested
+            else:
+                data[name] = arg(values)
+        return data
+
+    def to_representation(self, values, shared):
+        return self._build(self.plan, values, shared)
+
+    def serialize(self, rows):
+        """The representations of ``rows``, sharing nested dicts between them."""
+        shared = {}
+        return [self.to_representation(values, shared) for values in rows]
+
+
+class FastListMixin:
+    """
+    Viewset mixin serializing ``list`` with ``fast_list_serializer_class``
+    (a ``ValuesSerializer``) following ``get_serializer()``.
+    ``required_columns`` are selected as well (see ``SparseFieldsetMixin``).
+    """
+    fast_list_serializer_class = None
+    required_columns = ()
+
+    def use_fast_list(self):
+        return self.fast_list_serializer_class is not None and fast_list_enabled()
+
+    def get_fast_list_serializer(self):
+        return self.fast_list_serializer_class(serializer=self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_fast_list_serializer()
+        queryset = serializer.values(
+            self.filter_queryset(self.get_queryset()), extra=self.required_columns
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+    async def alist(self, request, *args, **kwargs):
+        """``list`` of async views (see ``core.async_views``)."""
+        if not self.use_fast_list():
+            return await super().alist(request, *args, **kwargs)
+        serializer = self.get_fast_list_serializer()
+        queryset = serializer.values(
+            await self.afilter_queryset(self.get_queryset()), extra=self.required_columns
+        )
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize([row async for row in queryset]))
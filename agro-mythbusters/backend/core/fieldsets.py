@@ -0,0 +1,251 @@
+"""
+Sparse fieldsets and expansion control.
+
+GET requests to viewsets using ``SparseFieldsetMixin`` accept
+
+* ``?fields=id,title,submitted_by.first_name`` - only the listed fields are
+  returned; a dotted name selects fields of a nested object, a bare nested
+  name all of them;
+* ``?expand=category,evidence.submitted_by`` - only the listed nested
+  objects are embedded; other single relations are returned as their id and
+  other nested collections are left out. Without ``expand`` everything the
+  serializer nests is embedded.
+
+The serializer is pruned before it serializes anything, and the query is
+derived from the pruned serializer: its ``QueryPlan`` (see
+``core.query_plans``) only joins and prefetches what is still embedded, and
+``only()`` loads the selected columns. ``SerializerMethodField`` values
+name the columns they read in the serializer's ``method_field_columns``;
+without that entry no columns are deferred.
+
+Nested collections are ``NestedPageField``s: the first ``NESTED_PAGE_SIZE``
+rows of the relation as ``{"next": ..., "results": [...]}``, with ``next``
+pointing to a keyset-paginated endpoint (see ``core.pagination``) for the
+rest, so a popular myth no longer embeds every comment it has.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import replace_query_param
+
+from .pagination import encode_cursor
+from .query_plans import plan_for_instance
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+NESTED_PAGE_SIZE = 10
+# Instance attribute holding the rows of its nested pages, by field name.
+NESTED_ROWS_ATTR = '_nested_page_rows'
+
+
+def parse_selection(value):
+    """``'id,evidence.title'`` as ``{'id': {}, 'evidence': {'title': {}}}``."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def format_selection(tree, prefix=''):
+    """Reverse of ``parse_selection``."""
+    paths = []
+    for name, children in tree.items():
+        if children:
+            paths.append(format_selection(children, f'{prefix}{name}.'))
+        else:
+            paths.append(f'{prefix}{name}')
+    return ','.join(paths)
+
+
+def _nested(field):
+    """The serializer a field embeds, or ``None``."""
+    if isinstance(field, (serializers.ListSerializer, NestedPageField)):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+def apply_fieldset(serializer, fields=None, expand=None, path=''):
+    """
+    Prune ``serializer`` (``many`` or not) in place to the ``fields`` and
+    ``expand`` selections; ``None`` keeps every field or expands everything.
+    Raises ``ValidationError`` for names the serializer does not have.
+    """
+    serializer = _nested(serializer) or serializer
+    available = serializer.fields
+    for param, tree, valid in (
+        (FIELDS_PARAM, fields, available),
+        (EXPAND_PARAM, expand, [name for name, field in available.items() if _nested(field)]),
+    ):
+        unknown = [f'{path}{name}' for name in tree or () if name not in valid]
+        if unknown:
+            raise ValidationError({param: [f'Unknown field: {name}' for name in unknown]})
+
+    for name in list(available):
+        field = available[name]
+        if fields is not None and name not in fields:
+            del available[name]
+            continue
+        nested = _nested(field)
+        if nested is None:
+            continue
+        if expand is not None and name not in expand:
+            if field is nested:
+                source = {} if field.source == name else {'source': field.source}
+                available[name] = PrimaryKeyRelatedField(read_only=True, **source)
+            else:
+                del available[name]
+            continue
+        nested_fields = (fields or {}).get(name) or None
+        nested_expand = None if expand is None else expand[name]
+        if isinstance(field, NestedPageField):
+            field.selection = (nested_fields, nested_expand)
+        apply_fieldset(nested, nested_fields, nested_expand, path=f'{path}{name}.')
+
+
+def selected_columns(serializer, model=None, prefix=''):
+    """
+    The ``only()`` paths of the columns ``serializer`` reads, or ``None``
+    when that cannot be told (e.g. a method field without
+    ``method_field_columns``).
+    """
+    serializer = _nested(serializer) or serializer
+    model = model or serializer.Meta.model
+    method_columns = getattr(serializer, 'method_field_columns', {})
+    columns = [f'{prefix}{model._meta.pk.name}']
+    for name, field in serializer.fields.items():
+        if field.write_only or isinstance(field, NestedPageField):
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in method_columns:
+                return None
+            columns.extend(f'{prefix}{column}' for column in method_columns[name])
+            continue
+        if field.source == '*' or '.' in field.source:
+            return None
+        model_field = next(
+            (f for f in model._meta.get_fields() if f.name == field.source), None
+        )
+        if model_field is None:
+            return None
+        if isinstance(field, serializers.ListSerializer) or not model_field.concrete:
+            # Prefetched by the query plan, with their own querysets.
+            continue
+        columns.append(f'{prefix}{field.source}')
+        if isinstance(field, serializers.BaseSerializer):
+            nested = selected_columns(
+                field, model_field.related_model, prefix=f'{prefix}{field.source}__'
+            )
+            if nested is None:
+                return None
+            columns.extend(nested)
+    return columns
+
+
+def load_only(queryset, serializer, extra=()):
+    """``queryset`` deferring the columns ``serializer`` does not read."""
+    columns = selected_columns(serializer)
+    if columns is None or (_nested(serializer) or serializer).Meta.model is not queryset.model:
+        return queryset
+    return queryset.only(*columns, *extra)
+
+
+class NestedPageField(serializers.Field):
+    """
+    The first ``page_size`` rows of the reverse relation ``source``, newest
+    first, as ``{"next": url or None, "results": [...]}``. ``next`` is the
+    ``url_name`` route of the parent (a keyset-paginated list of the same
+    rows, ordered the same way) with the cursor after the last row.
+    """
+    ordering = ('-created_at', '-id')
+
+    def __init__(self, child, url_name, page_size=NESTED_PAGE_SIZE, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.child = child
+        self.child.bind(field_name='', parent=self)
+        self.url_name = url_name
+        self.page_size = page_size
+        # (fields, expand) passed on to the next page; see apply_fieldset.
+        self.selection = (None, None)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def get_queryset(self, instance):
+        queryset = getattr(instance, self.source).all()
+        queryset = plan_for_instance(self.child).apply(queryset)
+        return load_only(queryset, self.child, ['created_at']).order_by(*self.ordering)
+
+    def to_representation(self, instance):
+        rows = list(self.get_queryset(instance)[:self.page_size + 1])
+        has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        pages = getattr(instance, NESTED_ROWS_ATTR, None)
+        if pages is None:
+            pages = {}
+            setattr(instance, NESTED_ROWS_ATTR, pages)
+        pages[self.field_name] = rows
+        return {
+            'next': self.next_link(instance, rows[-1]) if has_next else None,
+            'results': [self.child.to_representation(row) for row in rows],
+        }
+
+    def next_link(self, instance, last):
+        request = self.context.get('request')
+        url = reverse(self.url_name, kwargs={'pk': instance.pk}, request=request)
+        url = replace_query_param(url, 'cursor', encode_cursor([last.created_at, last.pk]))
+        for param, tree in zip((FIELDS_PARAM, EXPAND_PARAM), self.selection):
+            if tree is not None:
+                url = replace_query_param(url, param, format_selection(tree))
+        return url
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin applying ``?fields=`` and ``?expand=`` to the serializer
+    and queryset of GET requests. ``required_columns`` are loaded whatever
+    the selection, for code that reads them off the instances.
+    """
+    required_columns = ()
+
+    def get_fieldset(self):
+        """``(fields, expand)`` selections of the request; ``None`` when absent."""
+        request = self.request
+        if request is None or request.method not in SAFE_METHODS:
+            return None, None
+        fields = request.query_params.get(FIELDS_PARAM)
+        expand = request.query_params.get(EXPAND_PARAM)
+        return (
+            parse_selection(fields) if fields else None,
+            None if expand is None else parse_selection(expand),
+        )
+
+    def has_fieldset(self):
+        return self.get_fieldset() != (None, None)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.has_fieldset():
+            apply_fieldset(serializer, *self.get_fieldset())
+        return serializer
+
+    def get_query_plan(self):
+        plan = super().get_query_plan()
+        if plan is None or not self.has_fieldset():
+            return plan
+        return plan_for_instance(self.get_serializer())
+
+    def load_only_selected(self, queryset):
+        if not self.has_fieldset():
+            return queryset
+        return load_only(queryset, self.get_serializer(), self.required_columns)
+
+    def get_queryset(self):
+        return self.load_only_selected(super().get_queryset())
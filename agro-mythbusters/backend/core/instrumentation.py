@@ -0,0 +1,367 @@
+"""
+Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` (``core.middleware``) profiles every request
+through a database ``execute_wrapper``, so it also works with
+``DEBUG=False``. The wrapper is installed on every connection as it opens
+(see ``core.apps``) and adds queries to the profile held in a context
+variable. ``sync_to_async`` copies the context into the thread it runs in,
+so under ASGI the queries of async views and of sync code run in threads
+are profiled as well. It records:
+
+* wall time, and the view's time spent outside the database (``app``),
+  which on read endpoints is mostly serialization; DRF serializes inside
+  the view, so serialization gets no separate timer;
+* database time and query count;
+* duplicated queries: queries whose SQL, with literals and ``IN`` lists
+  normalized, already ran in the same request, which is how N+1 patterns
+  show up;
+* rendering time (encoding the response body) and response bytes.
+
+Each response gets a ``Server-Timing`` header (``db``, ``app``, ``render``,
+``total``). The numbers are also added to the process-wide ``metrics``,
+which ``/api/metrics/`` serves in the Prometheus text format.
+
+Requests slower than ``API_SLOW_REQUEST_MS`` are sampled at
+``API_SLOW_TRACE_SAMPLE_RATE`` into ``slow_requests``. This bounded store
+keeps the last ``API_SLOW_TRACE_LIMIT`` traces, each with the request's
+query list (SQL without parameters) and its most duplicated fingerprints.
+Staff read them at ``/api/metrics/slow-requests/``.
+
+Metrics and traces are per process. Under gunicorn each worker reports its
+own and samples carry a ``pid`` label. Queries run while a streaming
+response is iterated, after the view returns, are not profiled.
+"""
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Histogram buckets of the request duration, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Queries kept per request for fingerprints and traces; later ones are
+# only counted and timed.
+MAX_PROFILED_QUERIES = 1000
+# Queries listed in a slow request trace.
+MAX_TRACE_QUERIES = 200
+TOP_DUPLICATES = 10
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+def instrumentation_enabled():
+    return getattr(settings, 'API_INSTRUMENTATION_ENABLED', True)
+
+
+def slow_request_ms():
+    return getattr(settings, 'API_SLOW_REQUEST_MS', 500)
+
+
+def slow_trace_sample_rate():
+    return getattr(settings, 'API_SLOW_TRACE_SAMPLE_RATE', 1.0)
+
+
+def fingerprint(sql):
+    """``sql`` with literals and ``IN`` lists normalized."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    return _IN_LISTS.sub('(...)', sql)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+def _profiled_execute(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile._execute(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(connection, **kwargs):
+    """Profile the queries of ``connection``; connected to ``connection_created``."""
+    # First in line, so that execute_wrapper() blocks, which pop the last
+    # wrapper, still remove their own.
+    if _profiled_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _profiled_execute)
+
+
+class RequestProfile:
+    """Timings and queries of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = self.view_finished = None
+        self.render_started = self.render_finished = None
+        self.finished = None
+        self.db_time = 0.0
+        self.view_db_time = 0.0
+        self.query_count = 0
+        self.queries = []
+
+    def _execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_time += elapsed
+            self.query_count += 1
+            if len(self.queries) < MAX_PROFILED_QUERIES:
+                self.queries.append((sql, elapsed))
+
+    @contextmanager
+    def capture(self):
+        """
+        Profile the queries run meanwhile in this context, and in the
+        threads ``sync_to_async`` runs with a copy of it.
+        """
+        # Connections opened before the signal handler was connected.
+        for connection in connections.all(initialized_only=True):
+            install_execute_wrapper(connection)
+        token = _current_profile.set(self)
+        try:
+            yield self
+        finally:
+            _current_profile.reset(token)
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+        self.view_db_time = self.db_time
+
+    def finish_view(self):
+        if self.view_started is not None and self.view_finished is None:
+            self.view_finished = time.perf_counter()
+            self.view_db_time = self.db_time - self.view_db_time
+
+    def start_render(self):
+        self.finish_view()
+        self.render_started = time.perf_counter()
+
+    def finish_render(self):
+        self.render_finished = time.perf_counter()
+
+    def finish(self):
+        self.finish_view()
+        self.finished = time.perf_counter()
+
+    @property
+    def total_time(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def app_time(self):
+        """Time in the view outside the database."""
+        if self.view_started is None or self.view_finished is None:
+            return 0.0
+        return max(self.view_finished - self.view_started - self.view_db_time, 0.0)
+
+    @property
+    def render_time(self):
+        if self.render_started is None or self.render_finished is None:
+            return 0.0
+        return self.render_finished - self.render_started
+
+    def duplicates(self):
+        """``{fingerprint: (count, seconds)}`` of the queries that ran more than once."""
+        counts, times = Counter(), Counter()
+        for sql, elapsed in self.queries:
+            key = fingerprint(sql)
+            counts[key] += 1
+            times[key] += elapsed
+        return {key: (count, times[key]) for key, count in counts.items() if count > 1}
+
+    def server_timing(self, duplicates):
+        duplicated = sum(count - 1 for count, _ in duplicates.values())
+        return ', '.join([
+            f'db;dur={_ms(self.db_time)};desc="{self.query_count} queries, {duplicated} duplicated"',
+            f'app;dur={_ms(self.app_time)}',
+            f'render;dur={_ms(self.render_time)}',
+            f'total;dur={_ms(self.total_time)}',
+        ])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class Metrics:
+    """Process-wide request metrics, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter()
+            self.histograms = {}
+            self.sums = {name: Counter() for name in (
+                'db_seconds', 'queries', 'duplicate_queries', 'app_seconds',
+                'render_seconds', 'response_bytes',
+            )}
+
+    def observe(self, view, method, status, profile, duplicated, response_bytes):
+        duration = profile.total_time
+        with self.lock:
+            self.requests[view, method, status] += 1
+            histogram = self.histograms.setdefault(view, [0] * len(self.buckets) + [0, 0.0])
+            for index, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[index] += 1
+            histogram[-2] += 1
+            histogram[-1] += duration
+            for name, value in (
+                ('db_seconds', profile.db_time),
+                ('queries', profile.query_count),
+                ('duplicate_queries', duplicated),
+                ('app_seconds', profile.app_time),
+                ('render_seconds', profile.render_time),
+                ('response_bytes', response_bytes),
+            ):
+                self.sums[name][view] += value
+
+    def add_response_bytes(self, view, count):
+        with self.lock:
+            self.sums['response_bytes'][view] += count
+
+    def render(self, extra=()):
+        """The metrics, and ``(name, type, help, value)`` ``extra`` ones, as Prometheus text."""
+        pid = os.getpid()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self.lock:
+            family('api_requests_total', 'counter', 'Requests by view, method and status.')
+            for (view, method, status), count in sorted(self.requests.items()):
+                labels = _labels(view=view, method=method, status=status, pid=pid)
+                lines.append(f'api_requests_total{labels} {count}')
+
+            family('api_request_duration_seconds', 'histogram', 'Request wall time by view.')
+            for view, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    labels = _labels(view=view, le=bound, pid=pid)
+                    lines.append(f'api_request_duration_seconds_bucket{labels} {count}')
+                labels = _labels(view=view, le='+Inf', pid=pid)
+                lines.append(f'api_request_duration_seconds_bucket{labels} {histogram[-2]}')
+                labels = _labels(view=view, pid=pid)
+                lines.append(f'api_request_duration_seconds_count{labels} {histogram[-2]}')
+                lines.append(f'api_request_duration_seconds_sum{labels} {histogram[-1]:.6f}')
+
+            for name, help_text in (
+                ('db_seconds', 'Time spent in database queries by view.'),
+                ('queries', 'Database queries by view.'),
+                ('duplicate_queries', 'Queries repeating an earlier one of the same request, by view.'),
+                ('app_seconds', 'Time in views outside the database, by view.'),
+                ('render_seconds', 'Time spent rendering response bodies, by view.'),
+                ('response_bytes', 'Response bytes sent, by view.'),
+            ):
+                family(f'api_{name}_total', 'counter', help_text)
+                for view, value in sorted(self.sums[name].items()):
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'api_{name}_total{_labels(view=view, pid=pid)} {value}')
+
+        for name, kind, help_text, value in extra:
+            family(name, kind, help_text)
+            lines.append(f'{name}{_labels(pid=pid)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class SlowRequestLog:
+    """The last ``limit`` slow request traces (``API_SLOW_TRACE_LIMIT`` by default)."""
+
+    def __init__(self, limit=None):
+        self._limit = limit
+        self.lock = threading.Lock()
+        self.clear()
+
+    @property
+    def limit(self):
+        return self._limit or getattr(settings, 'API_SLOW_TRACE_LIMIT', 50)
+
+    def clear(self):
+        with self.lock:
+            self.traces = deque(maxlen=self.limit)
+
+    def add(self, trace):
+        with self.lock:
+            if self.traces.maxlen != self.limit:
+                self.traces = deque(self.traces, maxlen=self.limit)
+            self.traces.append(trace)
+
+    def all(self):
+        """Traces, newest first."""
+        with self.lock:
+            return list(reversed(self.traces))
+
+
+metrics = Metrics()
+slow_requests = SlowRequestLog()
+
+
+def build_trace(request, status, profile, duplicates):
+    match = request.resolver_match
+    top = sorted(duplicates.items(), key=lambda item: (-item[1][0], -item[1][1]))[:TOP_DUPLICATES]
+    return {
+        'at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': status,
+        'duration_ms': _ms(profile.total_time),
+        'db_ms': _ms(profile.db_time),
+        'app_ms': _ms(profile.app_time),
+        'render_ms': _ms(profile.render_time),
+        'query_count': profile.query_count,
+        'duplicates': [
+            {'sql': sql, 'count': count, 'ms': _ms(elapsed)} for sql, (count, elapsed) in top
+        ],
+        'queries': [
+            {'sql': sql, 'ms': _ms(elapsed)} for sql, elapsed in profile.queries[:MAX_TRACE_QUERIES]
+        ],
+    }
+
+
+def record(request, response, profile):
+    """Add a finished request to the metrics and, if slow, maybe to the traces."""
+    match = request.resolver_match
+    view = (match.view_name or match.url_name or 'unnamed') if match else 'unmatched'
+    duplicates = profile.duplicates()
+    duplicated = sum(count - 1 for count, _ in duplicates.values())
+    response_bytes = 0 if response.streaming else len(response.content)
+    metrics.observe(view, request.method, response.status_code, profile, duplicated, response_bytes)
+    if (
+        profile.total_time * 1000 >= slow_request_ms()
+        and random.random() < slow_trace_sample_rate()
+    ):
+        slow_requests.add(build_trace(request, response.status_code, profile, duplicates))
+    return view, duplicates
+
+
+def counted_stream(chunks, view):
+    """Pass ``chunks`` through, adding their size to the view's response bytes."""
+    for chunk in chunks:
+        metrics.add_response_bytes(view, len(chunk))
+        yield chunk
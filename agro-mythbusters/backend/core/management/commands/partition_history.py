@@ -0,0 +1,39 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from core.partitions import (
+    PARTITIONED_MODELS, is_partitioned, partition_table, supports_partitioning, unpartition_table,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert the activity and notification tables into monthly partitions '
+        '(PostgreSQL only). Each table is rewritten under an exclusive lock, so '
+        'run it in a maintenance window; --reverse converts them back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reverse', action='store_true',
+                            help='Copy partitioned tables back into plain tables.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database alias to convert.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not supports_partitioning(connection):
+            raise CommandError('Table partitioning needs PostgreSQL.')
+        reverse = options['reverse']
+        for label in PARTITIONED_MODELS:
+            table = apps.get_model(label)._meta.db_table
+            if is_partitioned(connection, table) != reverse:
+                self.stdout.write(f'{table} is already {"not " if reverse else ""}partitioned.')
+                continue
+            with transaction.atomic(using=connection.alias):
+                if reverse:
+                    unpartition_table(connection, table)
+                else:
+                    partition_table(connection, table)
+            self.stdout.write(f'{"Unpartitioned" if reverse else "Partitioned"} {table}.')
+        self.stdout.write(self.style.SUCCESS('Done.'))
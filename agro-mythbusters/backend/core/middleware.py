@@ -0,0 +1,150 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .activity import logging_enabled, record_request
+from .compression import choose_encoding, compress, compress_stream, is_compressible, weak_etag
+from .instrumentation import RequestProfile, counted_stream, instrumentation_enabled, record
+
+# Request attribute holding the request's RequestProfile.
+PROFILE_ATTR = '_profile'
+
+
+class ActivityLogMiddleware(MiddlewareMixin):
+    """
+    Record a ``UserActivity`` for every authenticated API request.
+
+    Must come after ``AuthenticationMiddleware``. DRF sets the user it
+    authenticated (e.g. from a JWT) on the underlying request, so token
+    requests are recorded too. The write happens later, in the background
+    (see ``core.activity``).
+    """
+
+    def process_response(self, request, response):
+        user = getattr(request, 'user', None)
+        if (
+            logging_enabled()
+            and user is not None and user.is_authenticated
+            and request.resolver_match is not None
+            and request.path.startswith('/api/')
+        ):
+            record_request(request, response)
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses with brotli or gzip, as the client's
+    ``Accept-Encoding`` allows (see ``core.compression``). Takes the place
+    of Django's ``GZipMiddleware``.
+    """
+
+    def process_response(self, request, response):
+        if not is_compressible(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+        if response.has_header('ETag'):
+            response.headers['ETag'] = weak_etag(response.headers['ETag'])
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    ``WhiteNoiseMiddleware`` that also runs async. WhiteNoise 6.6 is
+    sync-only, which makes Django run every ASGI request through a thread
+    up to it; here only static files are served from a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class InstrumentationMiddleware:
+    """
+    Profile every request (see ``core.instrumentation``) and add a
+    ``Server-Timing`` header. Must come first, so its totals include the
+    other middleware and its byte counts are those sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not instrumentation_enabled():
+            return self.get_response(request)
+        profile = RequestProfile()
+        setattr(request, PROFILE_ATTR, profile)
+        with profile.capture():
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not instrumentation_enabled():
+            return await self.get_response(request)
+        profile = RequestProfile()
+        setattr(request, PROFILE_ATTR, profile)
+        with profile.capture():
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, PROFILE_ATTR, None)
+        if profile is not None:
+            profile.start_view()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns.
+        profile = getattr(request, PROFILE_ATTR, None)
+        if profile is not None:
+            profile.start_render()
+            response.add_post_render_callback(lambda rendered: profile.finish_render())
+        return response
+
+    def finish(self, request, response, profile):
+        profile.finish()
+        view, duplicates = record(request, response, profile)
+        response['Server-Timing'] = profile.server_timing(duplicates)
+        if response.streaming and not response.is_async:
+            response.streaming_content = counted_stream(response.streaming_content, view)
+        return response
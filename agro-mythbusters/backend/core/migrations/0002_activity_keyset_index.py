@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='core_userac_user_id_e3a1dd_idx'),
+        ),
+    ]
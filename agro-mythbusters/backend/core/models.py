@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -58,11 +59,39 @@ class UserActivity(models.Model):
     details = models.JSONField(default=dict)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: activities are written in batches after the fact
+    # (see core.activity) and keep the time they happened.
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         verbose_name_plural = 'User Activities'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.activity_type} - {self.created_at}"
+
+
+class UserActivityArchive(models.Model):
+    """
+    Activities past their retention period, moved out of ``UserActivity``
+    by ``manage.py apply_retention`` while the table is not partitioned
+    (after ``manage.py partition_history`` whole monthly partitions are
+    archived instead).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    activity_type = models.CharField(max_length=50)
+    details = models.JSONField(default=dict)
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    user_agent = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = 'User Activity Archive'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user_id} - {self.activity_type} - {self.created_at}"
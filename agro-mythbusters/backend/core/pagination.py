@@ -0,0 +1,274 @@
+"""
+Keyset (cursor) pagination.
+
+``PageNumberPagination`` runs a ``COUNT(*)`` on every request and reaches
+page N with ``OFFSET``, so deep pages get slower the further they are.
+``KeysetPagination`` instead remembers the ordering values of the last row
+seen and asks for the rows after it::
+
+    WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC
+
+which, with a composite index on the ordering columns, costs the same on
+page 10,000 as on page 1. The ordering is whatever the queryset is ordered
+by when it reaches the paginator (``OrderingFilter`` choices included) with
+the primary key appended as a tie-breaker.
+
+Requests carrying the legacy ``page`` parameter are still answered with
+page numbers and an exact ``count``. In cursor mode ``count`` is only
+included when asked for with ``?count=exact`` or ``?count=approximate``
+(a planner estimate on PostgreSQL, exact elsewhere).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_APPROXIMATE = 'approximate'
+
+
+def approximate_count(queryset):
+    """
+    Estimated row count of ``queryset``: the planner's estimate on
+    PostgreSQL, an exact ``COUNT(*)`` on other databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(position, reverse=False):
+    """The ``cursor`` parameter for the rows after (before) ``position``."""
+    payload = json.dumps(
+        {'p': [_encode_value(value) for value in position], 'r': int(reverse)},
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over the queryset's ordering plus the primary key."""
+    page_size = PageNumberPagination.page_size
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    legacy_pagination_class = PageNumberPagination
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.start_page(queryset, request)
+        if self.legacy:
+            return self.legacy.paginate_queryset(queryset, request, view)
+        self.count = self.get_count(queryset, request)
+        return self.finish_page(list(self.page_queryset(queryset)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` reading the page with the async ORM (see ``core.async_views``)."""
+        queryset = self.start_page(queryset, request)
+        if self.legacy:
+            return await sync_to_async(self.legacy.paginate_queryset)(queryset, request, view)
+        self.count = await self.aget_count(queryset, request)
+        return self.finish_page([row async for row in self.page_queryset(queryset)])
+
+    def start_page(self, queryset, request):
+        """``queryset`` in page order, after reading the page size and cursor."""
+        self.request = request
+        if self.legacy_pagination_class.page_query_param in request.query_params:
+            self.legacy = self.legacy_pagination_class()
+            return queryset
+        self.legacy = None
+
+        ordering = self.get_ordering(queryset)
+        if ordering is None:
+            raise NotFound(_('Cursor pagination is not available for this ordering.'))
+        self.ordering = ordering
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+        return queryset.order_by(*(f'-{f}' if desc else f for f, desc in ordering))
+
+    def page_queryset(self, queryset):
+        """The rows of the page, and one more to tell whether another follows."""
+        if self.position is not None:
+            queryset = queryset.filter(self.keyset_filter(self.position, self.reverse))
+        if self.reverse:
+            queryset = queryset.reverse()
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        # A page reached from a cursor always has rows on the side it came from.
+        if self.reverse:
+            self.has_previous, self.has_next = has_more, self.position is not None
+        else:
+            self.has_previous, self.has_next = self.position is not None, has_more
+        self.rows = rows
+        return rows
+
+    def get_ordering(self, queryset):
+        """``(field, descending)`` pairs ending with the primary key."""
+        fields = list(queryset.query.order_by)
+        if not fields and queryset.query.default_ordering:
+            fields = list(queryset.model._meta.ordering)
+        ordering = []
+        for field in fields:
+            if not isinstance(field, str) or '__' in field or field.startswith('?'):
+                return None
+            name, desc = field.lstrip('-'), field.startswith('-')
+            if name in ('pk', queryset.model._meta.pk.name):
+                ordering.append(('pk', desc))
+                return ordering
+            ordering.append((name, desc))
+        ordering.append(('pk', ordering[-1][1] if ordering else False))
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == COUNT_EXACT:
+            return queryset.count()
+        if mode == COUNT_APPROXIMATE:
+            return approximate_count(queryset)
+        return None
+
+    async def aget_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == COUNT_EXACT:
+            return await queryset.acount()
+        if mode == COUNT_APPROXIMATE:
+            return await sync_to_async(approximate_count)(queryset)
+        return None
+
+    def keyset_filter(self, position, reverse):
+        """Rows strictly after ``position`` (before it when ``reverse``)."""
+        condition = Q()
+        equal = Q()
+        for (field, desc), value in zip(self.ordering, position):
+            lookup = 'lt' if desc != reverse else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        # The redundant range on the leading column lets the database seek
+        # the index instead of evaluating the OR for every row.
+        (field, desc), value = self.ordering[0], position[0]
+        lookup = 'lte' if desc != reverse else 'gte'
+        return Q(**{f'{field}__{lookup}': value}) & condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = payload['p'], bool(payload.get('r'))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_cursor_link(self, row, reverse):
+        if isinstance(row, dict):
+            # A .values() row (see core.fast_serializers).
+            position = [row[field] for field, desc in self.ordering]
+        else:
+            position = [getattr(row, field) for field, desc in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(position, reverse))
+
+    def get_next_link(self):
+        if self.legacy:
+            return self.legacy.get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self.get_cursor_link(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.legacy:
+            return self.legacy.get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.get_cursor_link(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return self.legacy.get_paginated_response(data)
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            body = {'count': self.count, **body}
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Include a total count: "exact" or "approximate".',
+                'schema': {'type': 'string', 'enum': [COUNT_EXACT, COUNT_APPROXIMATE]},
+            },
+            *self.legacy_pagination_class().get_schema_operation_parameters(view),
+        ]
@@ -0,0 +1,349 @@
+"""
+Monthly partitions and retention for append-only history tables.
+
+On PostgreSQL ``core_useractivity`` and ``myths_notification`` can be range
+partitioned by month on ``created_at``. Converting a table rewrites it under
+an exclusive lock, so it is opt-in: ``manage.py partition_history`` runs
+``partition_table`` (and ``--reverse`` runs ``unpartition_table``).
+Partitions are named ``<table>_YYYY_MM``. A default partition catches rows
+outside the created months. ``ensure_partitions`` creates the coming months
+ahead of time; it runs after every ``migrate`` (see ``core.apps``) and
+before every expiry, so partitions do not depend on the retention job alone.
+Creating a partition first moves the rows of its month out of the default
+partition, which PostgreSQL would otherwise refuse, and months that only
+have rows in the default partition get a partition of their own.
+
+Expiring a month detaches its partition and then drops it, or keeps it as a
+standalone ``<table>_YYYY_MM_archived`` table. Either way the cost does not
+depend on the number of rows. Only whole months are expired.
+
+Partitioned tables need the partition key in their primary key, so it is
+``(id, created_at)`` there; ids still come from one sequence and Django
+keeps treating ``id`` as the primary key. Queries bounded on ``created_at``,
+such as keyset pages (see ``core.pagination``), only read the partitions
+that can match.
+
+Other databases have no partitions: ``expire_rows`` deletes (or moves into
+an archive model) old rows in primary key batches instead.
+
+Used by ``manage.py apply_retention`` and ``manage.py partition_history``.
+"""
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+# Models whose tables ``manage.py partition_history`` partitions.
+PARTITIONED_MODELS = ('core.UserActivity', 'myths.Notification')
+# Partitions created ahead of the current month.
+MONTHS_AHEAD = 2
+EXPIRE_BATCH_SIZE = 1000
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    years, index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_{month:%Y_%m}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def _bound(month):
+    return f"'{datetime.combine(month, datetime.min.time(), dt_timezone.utc).isoformat()}'"
+
+
+def supports_partitioning(connection):
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned(connection, table):
+    if not supports_partitioning(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(connection, table):
+    """``{month: partition name}`` of the monthly partitions attached to ``table``."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits i '
+            'JOIN pg_class parent ON parent.oid = i.inhparent '
+            'JOIN pg_class child ON child.oid = i.inhrelid '
+            'WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)',
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    pattern = re.compile(rf'^{re.escape(table)}_(\d{{4}})_(\d{{2}})$')
+    partitions = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _partition_key(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT a.attname FROM pg_partitioned_table p '
+            'JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0] '
+            'WHERE p.partrelid = %s::regclass',
+            [table],
+        )
+        return cursor.fetchone()[0]
+
+
+def _has_default_partition(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [default_partition_name(table)])
+        return cursor.fetchone()[0] is not None
+
+
+def create_partition(connection, table, month):
+    """
+    Create the partition of ``month``, moving the rows of that month out of
+    the default partition first: attaching a partition fails while the
+    default partition holds rows of its range.
+    """
+    quote = connection.ops.quote_name
+    name = partition_name(table, month)
+    bounds = f'FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})'
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if not _has_default_partition(connection, table):
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} '
+                f'FOR VALUES {bounds}'
+            )
+            return
+        default = default_partition_name(table)
+        column = quote(_partition_key(connection, table))
+        # Keeps rows of the month from landing in the default partition
+        # between the move and the attach.
+        cursor.execute(f'LOCK TABLE {quote(default)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is not None:
+            return
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(default)} '
+            f'WHERE {column} >= {_bound(month)} AND {column} < {_bound(add_months(month, 1))} '
+            f'RETURNING *) INSERT INTO {quote(name)} SELECT * FROM moved'
+        )
+        cursor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES {bounds}')
+
+
+def stranded_months(connection, table):
+    """Months with rows in the default partition of ``table``."""
+    if not _has_default_partition(connection, table):
+        return []
+    quote = connection.ops.quote_name
+    column = quote(_partition_key(connection, table))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', {column} AT TIME ZONE 'UTC') "
+            f'FROM {quote(default_partition_name(table))} WHERE {column} IS NOT NULL'
+        )
+        return sorted(month_start(row[0]) for row in cursor.fetchall())
+
+
+def ensure_partitions(connection, table, now, months_ahead=MONTHS_AHEAD):
+    """
+    Create the partitions of the current and the next ``months_ahead``
+    months, and of the months stranded in the default partition.
+    """
+    current = month_start(now)
+    existing = monthly_partitions(connection, table)
+    months = set(stranded_months(connection, table))
+    months.update(add_months(current, offset) for offset in range(months_ahead + 1))
+    created = []
+    for month in sorted(months - set(existing)):
+        create_partition(connection, table, month)
+        created.append(partition_name(table, month))
+    return created
+
+
+def ensure_all_partitions(using='default', now=None, **kwargs):
+    """
+    ``ensure_partitions`` for each partitioned table of ``PARTITIONED_MODELS``;
+    connected to ``post_migrate`` in ``core.apps``.
+    """
+    from django.apps import apps
+
+    connection = connections[using]
+    created = []
+    for label in PARTITIONED_MODELS:
+        table = apps.get_model(label)._meta.db_table
+        if is_partitioned(connection, table):
+            created += ensure_partitions(connection, table, now or timezone.now())
+    return created
+
+
+def expire_partitions(connection, table, cutoff, archive=False):
+    """
+    Detach every monthly partition that ends at or before ``cutoff`` and
+    drop it, or with ``archive`` keep it as ``<name>_archived``. Returns
+    the affected partition names.
+    """
+    quote = connection.ops.quote_name
+    expired = []
+    for month, name in sorted(monthly_partitions(connection, table).items()):
+        if add_months(month, 1) > month_start(cutoff):
+            continue
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}')
+            if archive:
+                cursor.execute(f'ALTER TABLE {quote(name)} RENAME TO {quote(name + "_archived")}')
+            else:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+        expired.append(name)
+    return expired
+
+
+def partition_table(connection, table, column='created_at', now=None):
+    """
+    Turn ``table`` into a table partitioned by month on ``column``, keeping
+    its rows, indexes, foreign keys and id sequence. PostgreSQL only.
+    """
+    quote = connection.ops.quote_name
+    now = now or timezone.now()
+    old = f'{table}_unpartitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+        cursor.execute(
+            'SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i '
+            'WHERE i.indrelid = %s::regclass AND NOT i.indisprimary',
+            [old],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [old],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min({quote(column)}) FROM {quote(old)}')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ({quote(column)})'
+        )
+        cursor.execute(
+            f'CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quote(table)} DEFAULT'
+        )
+        first = month_start(min(oldest or now, now))
+        month, last = first, add_months(month_start(now), MONTHS_AHEAD)
+        while month <= last:
+            create_partition(connection, table, month)
+            month = add_months(month, 1)
+        cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+        cursor.execute(f'DROP TABLE {quote(old)}')
+
+        cursor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        sequence = f'{table}_id_seq'
+        cursor.execute(f'CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id')
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')"
+        )
+        cursor.execute(
+            f"SELECT setval('{sequence}', COALESCE(max(id), 1), max(id) IS NOT NULL) "
+            f'FROM {quote(table)}'
+        )
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, {quote(column)})')
+        on_old = re.compile(rf' ON (?:\S+\.)?"?{re.escape(old)}"? ')
+        for definition in index_definitions:
+            cursor.execute(on_old.sub(f' ON {quote(table)} ', definition, count=1))
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+
+
+def unpartition_table(connection, table):
+    """Reverse of ``partition_table``: copy the rows back into a plain table."""
+    quote = connection.ops.quote_name
+    old = f'{table}_partitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i '
+            'WHERE i.indrelid = %s::regclass AND NOT i.indisprimary',
+            [table],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+        cursor.execute(f'ALTER SEQUENCE {quote(table + "_id_seq")} OWNED BY {quote(table)}.id')
+        cursor.execute(f'DROP TABLE {quote(old)} CASCADE')
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id)')
+        for definition in index_definitions:
+            # Indexes of a partitioned parent are created as ON ONLY.
+            definition = re.sub(r' ON ONLY ', ' ON ', definition, count=1)
+            cursor.execute(re.sub(
+                rf' ON (?:\S+\.)?"?{re.escape(table)}"? ', f' ON {quote(table)} ', definition, count=1
+            ))
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+
+
+def expire_rows(queryset, archive_model=None, batch_size=EXPIRE_BATCH_SIZE):
+    """
+    Delete the rows of ``queryset`` in primary key batches, copying them to
+    ``archive_model`` (a model with the same fields) first if given. The
+    fallback for tables without partitions. Returns the number of rows.
+    """
+    model = queryset.model
+    fields = [field.attname for field in model._meta.concrete_fields]
+    total = 0
+    while True:
+        rows = list(queryset.order_by('pk').values(*fields)[:batch_size])
+        if not rows:
+            return total
+        ids = [row['id'] for row in rows]
+        with transaction.atomic(using=queryset.db):
+            if archive_model is not None:
+                archive_model.objects.using(queryset.db).bulk_create(
+                    [archive_model(**row) for row in rows]
+                )
+            model._base_manager.using(queryset.db).filter(pk__in=ids).delete()
+        total += len(ids)
+
+
+def expire_history(model, cutoff, archive_model=None, now=None):
+    """
+    Expire the rows of ``model`` created before ``cutoff``: whole monthly
+    partitions where the table is partitioned (archived as tables when
+    ``archive_model`` is given), ``expire_rows`` otherwise. Returns
+    ``(expired partition names, expired row count)``.
+    """
+    connection = connections[router.db_for_write(model)]
+    table = model._meta.db_table
+    if is_partitioned(connection, table):
+        ensure_partitions(connection, table, now or timezone.now())
+        return expire_partitions(connection, table, cutoff, archive=archive_model is not None), 0
+    queryset = model._base_manager.using(connection.alias).filter(created_at__lt=cutoff)
+    return [], expire_rows(queryset, archive_model)
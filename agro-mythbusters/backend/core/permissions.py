@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .authentication import METRICS_SCOPE
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
     Custom permission to only allow owners of an object to edit it.
@@ -54,3 +56,11 @@ class IsOwnerOrAdmin(permissions.BasePermission):
             
         # Write permissions are only allowed to the owner of the object or admins.
         return obj.user == request.user or request.user.is_staff
+
+
+class IsMetricsScraper(permissions.BasePermission):
+    """
+    Staff users, or scrapers authenticated with the metrics token.
+    """
+    def has_permission(self, request, view):
+        return request.auth == METRICS_SCOPE or bool(request.user and request.user.is_staff)
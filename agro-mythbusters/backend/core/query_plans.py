@@ -0,0 +1,131 @@
+"""
+Query planning for viewsets with nested serializers.
+
+A query plan lists the ``select_related`` paths and ``Prefetch`` lookups a
+serializer needs so that serializing a page costs a fixed number of queries
+instead of one (or more) per row. Plans are derived by walking the serializer
+tree:
+
+* a nested single serializer (e.g. ``category = CategorySerializer()``) on a
+  forward relation becomes a ``select_related`` path;
+* a nested ``many=True`` serializer on a reverse relation becomes a
+  ``Prefetch`` whose queryset carries the child serializer's own plan;
+* ``many=True`` related fields become plain prefetches.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+
+class QueryPlan:
+    """The related lookups needed to serialize instances of one model."""
+
+    def __init__(self, select_related=(), prefetches=()):
+        self.select_related = tuple(select_related)
+        # (lookup, related model, nested QueryPlan or None) triples.
+        self.prefetches = tuple(prefetches)
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetches)
+
+    def __repr__(self):
+        lookups = [lookup for lookup, _, _ in self.prefetches]
+        return f'<QueryPlan select_related={self.select_related} prefetch={lookups}>'
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        # Prefetch objects are built per call; Django mutates them while
+        # resolving nested lookups, so they must not be shared across requests.
+        prefetches = []
+        for lookup, model, plan in self.prefetches:
+            related = model._default_manager.all()
+            prefetches.append(Prefetch(lookup, queryset=plan.apply(related) if plan else related))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+def _relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def _walk(serializer, model, prefix=''):
+    select_related, prefetches = [], []
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        relation = _relation(model, field.source)
+        if relation is None:
+            continue
+        lookup = f'{prefix}{field.source}'
+
+        if isinstance(field, serializers.ListSerializer):
+            child_plan = None
+            if isinstance(field.child, serializers.ModelSerializer):
+                child_plan = plan_for_instance(field.child)
+            prefetches.append((lookup, relation.related_model, child_plan))
+        elif isinstance(field, ManyRelatedField):
+            prefetches.append((lookup, relation.related_model, None))
+        elif isinstance(field, serializers.ModelSerializer) and (
+            relation.many_to_one or relation.one_to_one
+        ):
+            select_related.append(lookup)
+            nested_select, nested_prefetches = _walk(
+                field, relation.related_model, prefix=f'{lookup}__'
+            )
+            select_related.extend(nested_select)
+            prefetches.extend(nested_prefetches)
+
+    return select_related, prefetches
+
+
+def plan_for_instance(serializer):
+    """
+    The query plan of a ``ModelSerializer`` instance (``many`` or not),
+    e.g. one pruned by ``core.fieldsets``.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    select_related, prefetches = _walk(serializer, serializer.Meta.model)
+    return QueryPlan(select_related, prefetches)
+
+
+@lru_cache(maxsize=None)
+def plan_for_serializer(serializer_class):
+    """Derive (and cache) the query plan of a ``ModelSerializer`` class."""
+    return plan_for_instance(serializer_class())
+
+
+class QueryPlanMixin:
+    """
+    Viewset mixin applying the query plan of the action's serializer to
+    ``get_queryset()``.
+
+    Only the actions listed in ``query_plan_actions`` are planned; custom
+    actions that never serialize the object (votes, status changes) keep
+    their plain queryset. ``query_plans`` maps an action to an explicit
+    ``QueryPlan`` when the derived one is not wanted.
+    """
+    query_plan_actions = ('list', 'retrieve', 'create', 'update', 'partial_update')
+    query_plans = {}
+
+    def get_query_plan(self):
+        if self.action in self.query_plans:
+            return self.query_plans[self.action]
+        if self.action not in self.query_plan_actions:
+            return None
+        return plan_for_serializer(self.get_serializer_class())
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        plan = self.get_query_plan()
+        return plan.apply(queryset) if plan else queryset
@@ -0,0 +1,80 @@
+"""
+JSON rendering with ``orjson``, and MessagePack.
+
+``FastJSONRenderer`` is DRF's ``JSONRenderer`` with ``orjson`` (when it is
+installed) doing the encoding, producing the same bytes: compact, UTF-8,
+U+2028/U+2029 escaped, and everything ``orjson`` does not encode the way
+DRF would (datetimes included) handed to DRF's encoder. Indented output,
+non-default ``COMPACT_JSON``/``UNICODE_JSON`` settings and values ``orjson``
+refuses (e.g. integers beyond 64 bits) fall back to ``JSONRenderer``.
+
+``MessagePackRenderer`` encodes the same values as MessagePack (requires the
+``msgpack`` package) for ``Accept: application/msgpack`` or
+``?format=msgpack``. ``PrometheusRenderer`` serves ``/api/metrics/``.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or self.get_indent(accepted_media_type, renderer_context)
+            or self.encoder_class is not encoders.JSONEncoder
+            or not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON and api_settings.STRICT_JSON)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encoders.JSONEncoder().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer: these are valid JSON but not valid JavaScript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    The JSON output as MessagePack: datetimes, decimals, UUIDs and lazy
+    strings become the strings DRF's JSON encoder makes of them.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encoders.JSONEncoder().default, use_bin_type=True)
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Text in the Prometheus exposition format, as built by ``core.instrumentation``."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # Errors, e.g. {"detail": "..."} for a missing token.
+            data = ''.join(f'# {key}: {value}\n' for key, value in data.items())
+        return (data or '').encode(self.charset)
@@ -0,0 +1,19 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    ``DiscoverRunner`` with the user activity log off: its flush thread
+    cannot write to the test database while a test case holds its
+    transaction. Tests of the log turn it back on with ``override_settings``.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(USER_ACTIVITY_LOG_ENABLED=False)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
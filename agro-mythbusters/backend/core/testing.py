@@ -0,0 +1,101 @@
+"""
+Test helpers shared by the app test suites.
+"""
+import re
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+# Plan lines reading a whole table without an index, per database vendor.
+SEQUENTIAL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on "?(\w+)'),
+    'sqlite': re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$'),
+}
+
+
+def explain(sql):
+    """The query plan of ``sql`` as a list of lines."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Small test tables are cheaper to scan than to seek, so ask the
+            # planner whether an index *can* serve the query instead.
+            with transaction.atomic():
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def sequential_scans(sql, tables):
+    """The tables of ``tables`` that ``sql`` reads with a full table scan."""
+    pattern = SEQUENTIAL_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return set()
+    scanned = set()
+    for line in explain(sql):
+        match = pattern.search(line.strip())
+        if match and match.group(1) in tables:
+            scanned.add(match.group(1))
+    return scanned
+
+
+class QueryScalingAssertionsMixin:
+    """
+    Assertions that catch N+1 query patterns in API endpoints.
+
+    Mix into a ``TestCase``/``APITestCase``; requests go through
+    ``self.client``.
+    """
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return len(context.captured_queries)
+
+    def assertQueriesDoNotScale(self, url, grow, sizes=(2, 10), **params):
+        """
+        Fail when the number of queries for ``url`` depends on the amount of
+        data it returns.
+
+        ``grow(n)`` must make the endpoint return ``n`` rows (list endpoints)
+        or ``n`` nested items (detail endpoints); the query count is compared
+        across ``sizes``.
+        """
+        counts = {}
+        for size in sizes:
+            grow(size)
+            counts[size] = self.count_queries(url, **params)
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'Query count for {url} grows with result size: {counts}',
+        )
+        return counts[sizes[0]]
+
+
+class QueryPlanAssertionsMixin:
+    """
+    Assertions on the query plans of API endpoints (PostgreSQL and SQLite;
+    other databases pass unchecked).
+    """
+
+    def assertNoSequentialScans(self, url, tables, **params):
+        """
+        Fail when a SELECT issued by ``GET url`` reads one of ``tables``
+        without an index.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        offenders = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            scanned = sequential_scans(sql, tables)
+            if scanned:
+                offenders.append(f'{sorted(scanned)}: {sql}')
+        self.assertEqual(
+            offenders, [], f'GET {url} {params} scans whole tables:\n' + '\n'.join(offenders)
+        )
@@ -1,3 +1,260 @@
-from django.test import TestCase
+import gzip
+import json
+import re
+import time
+import unittest
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .activity import ActivityBuffer, activity_buffer, client_ip
+from .compression import brotli, choose_encoding, compress_stream
+from .instrumentation import RequestProfile, fingerprint, metrics, slow_requests
+from .models import UserActivity
+from .renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(APITestCase):
+    """Cursor pagination over ``(created_at, id)`` on the activity feed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='active@example.com', password='pass12345',
+            first_name='Test', last_name='Active'
+        )
+        UserActivity.objects.bulk_create([
+            UserActivity(user=cls.user, activity_type=f'activity-{i}') for i in range(45)
+        ])
+        # Identical timestamps for a block of rows exercise the id tie-breaker.
+        tied = UserActivity.objects.order_by('id').values_list('id', flat=True)[10:30]
+        UserActivity.objects.filter(id__in=list(tied)).update(created_at=timezone.now())
+        cls.expected = list(
+            UserActivity.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_forward_and_backward_walks_cover_every_row_once(self):
+        forward = self.walk('/api/activities/', 'next')
+        self.assertEqual([len(page) for page in forward], [20, 20, 5])
+        self.assertEqual(sum(forward, []), self.expected)
+
+        last_page = self.client.get('/api/activities/').data['next']
+        last_page = self.client.get(last_page).data['next']
+        backward = self.walk(last_page, 'previous')
+        self.assertEqual(sum(reversed(backward), []), self.expected)
+
+    def test_count_is_optional(self):
+        response = self.client.get('/api/activities/')
+        self.assertNotIn('count', response.data)
+        response = self.client.get('/api/activities/', {'count': 'exact', 'page_size': 5})
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_page_parameter_keeps_page_numbers(self):
+        response = self.client.get('/api/activities/', {'page': 2})
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(
+            [row['id'] for row in response.data['results']], self.expected[20:40]
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/activities/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(USER_ACTIVITY_LOG_ENABLED=True, USER_ACTIVITY_FLUSH_INTERVAL=0)
+class ActivityLogTests(APITestCase):
+    """Requests are logged as activities, written behind the request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='logged@example.com', password='pass12345',
+            first_name='Test', last_name='Logged'
+        )
+
+    def setUp(self):
+        activity_buffer.flush()
+
+    def test_authenticated_requests_are_written_behind(self):
+        self.client.get('/api/activities/')
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/activities/', HTTP_USER_AGENT='probe/1.0')
+        self.assertFalse(UserActivity.objects.exists())
+
+        self.assertEqual(activity_buffer.flush(), 1)
+        activity = UserActivity.objects.get()
+        self.assertEqual(activity.user, self.user)
+        self.assertEqual(activity.activity_type, 'user-activity-list')
+        self.assertEqual(activity.details['status'], 200)
+        self.assertEqual(activity.user_agent, 'probe/1.0')
+        self.assertEqual(activity.ip_address, '127.0.0.1')
+
+    def test_client_ip_behind_trusted_proxies(self):
+        factory = RequestFactory()
+        forwarded = {'REMOTE_ADDR': '172.18.0.5', 'HTTP_X_FORWARDED_FOR': '198.51.100.7, 10.0.0.2'}
+        self.assertEqual(client_ip(factory.get('/', **forwarded)), '172.18.0.5')
+        with override_settings(TRUSTED_PROXY_IPS=['172.16.0.0/12', '10.0.0.2']):
+            self.assertEqual(client_ip(factory.get('/', **forwarded)), '198.51.100.7')
+            self.assertEqual(client_ip(factory.get(
+                '/', REMOTE_ADDR='172.18.0.5', HTTP_X_REAL_IP='203.0.113.9'
+            )), '203.0.113.9')
+            # Headers from untrusted peers are ignored.
+            self.assertEqual(client_ip(factory.get(
+                '/', REMOTE_ADDR='192.0.2.1', HTTP_X_REAL_IP='203.0.113.9'
+            )), '192.0.2.1')
+
+    def test_full_buffer_drops_and_counts(self):
+        buffer = ActivityBuffer(capacity=2, flush_interval=0)
+        results = [buffer.add(user_id=self.user.pk, activity_type='x') for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        with self.assertLogs('core.activity', 'WARNING'):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(
+            {key: buffer.stats()[key] for key in ('buffered', 'dropped', 'written')},
+            {'buffered': 0, 'dropped': 1, 'written': 2},
+        )
+
+
+class ActivityFlushThreadTests(TransactionTestCase):
+    """The background thread writes full batches and stop() drains the rest."""
+
+    def test_thread_flushes_batches_and_stop_drains(self):
+        user = User.objects.create(email='threaded@example.com')
+        buffer = ActivityBuffer(batch_size=2, flush_interval=60)
+        for _ in range(2):
+            buffer.add(user_id=user.pk, activity_type='x')
+        deadline = time.monotonic() + 5
+        while buffer.stats()['written'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(buffer.stats()['written'], 2)
+
+        buffer.add(user_id=user.pk, activity_type='x')
+        buffer.stop()
+        self.assertFalse(buffer.thread.is_alive())
+        self.assertEqual(UserActivity.objects.count(), 3)
+
+
+class CompressionTests(SimpleTestCase):
+    """Encoding negotiation, streaming compression and MessagePack output."""
+
+    def test_choose_encoding(self):
+        encodings = ['br', 'gzip']
+        self.assertEqual(choose_encoding('gzip, deflate, br', encodings), 'br')
+        self.assertEqual(choose_encoding('br;q=0.5, gzip', encodings), 'gzip')
+        self.assertEqual(choose_encoding('*', encodings), 'br')
+        self.assertEqual(choose_encoding('gzip;q=0, *;q=0.1', ['gzip']), None)
+        self.assertEqual(choose_encoding('identity', encodings), None)
+        self.assertEqual(choose_encoding('', encodings), None)
+
+    def test_streams_are_compressed_per_chunk(self):
+        chunks = [b'{"id": %d}\n' % i * 50 for i in range(20)]
+        compressed = list(compress_stream(iter(chunks), 'gzip'))
+        self.assertGreaterEqual(len(compressed), len(chunks))
+        self.assertEqual(gzip.decompress(b''.join(compressed)), b''.join(chunks))
+        if brotli is not None:
+            compressed = list(compress_stream(iter(chunks), 'br'))
+            self.assertEqual(brotli.decompress(b''.join(compressed)), b''.join(chunks))
+
+    @unittest.skipIf(msgpack is None, 'requires msgpack')
+    def test_message_pack_matches_json_values(self):
+        data = {
+            'id': 1, 'score': Decimal('1.50'), 'tags': ('a', 'b'),
+            'created_at': datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc),
+        }
+        self.assertEqual(
+            msgpack.unpackb(MessagePackRenderer().render(data)),
+            json.loads(FastJSONRenderer().render(data)),
+        )
+
+
+class InstrumentationTests(APITestCase):
+    """Per-request profiles, Server-Timing, metrics and slow request traces."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='member@example.com', password='pass12345')
+        cls.staff = User.objects.create_user(
+            email='operator@example.com', password='pass12345', is_staff=True
+        )
+
+    def setUp(self):
+        metrics.reset()
+        slow_requests.clear()
+
+    def test_duplicate_queries_are_fingerprinted(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "name" = \'x\' LIMIT 21'),
+            'SELECT * FROM "t" WHERE "id" IN (...) AND "name" = ? LIMIT ?',
+        )
+        profile = RequestProfile()
+        with profile.capture():
+            for user in (self.user, self.staff):
+                list(UserActivity.objects.filter(user=user))
+            User.objects.count()
+        self.assertEqual(profile.query_count, 3)
+        duplicates = profile.duplicates()
+        self.assertEqual([count for count, _ in duplicates.values()], [2])
+        self.assertIn('core_useractivity', next(iter(duplicates)))
+
+    def test_server_timing_and_metrics(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/profile/')
+        timings = re.findall(r'(?:^|, )(\w+);dur=', response['Server-Timing'])
+        self.assertEqual(timings, ['db', 'app', 'render', 'total'])
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('api_requests_total{view="user-profile",method="GET",status="200"', text)
+        self.assertIn('api_request_duration_seconds_bucket{view="user-profile",le="+Inf"', text)
+        self.assertIn('# TYPE api_activity_buffered gauge', text)
+
+    async def test_async_requests_are_profiled(self):
+        response = await self.async_client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        queries = re.search(r'db;dur=[\d.]+;desc="(\d+) queries', response['Server-Timing'])
+        self.assertGreater(int(queries.group(1)), 0)
+
+    @override_settings(API_METRICS_TOKEN='scrape-me')
+    def test_metrics_token(self):
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer guessed')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(API_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_traced_for_staff(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/profile/')
+        self.assertEqual(self.client.get('/api/metrics/slow-requests/').status_code, 403)
+        self.client.force_authenticate(self.staff)
+        traces = self.client.get('/api/metrics/slow-requests/').json()['results']
+        self.assertEqual(traces[-1]['view'], 'user-profile')
+        self.assertEqual(len(traces[-1]['queries']), traces[-1]['query_count'])
+        with override_settings(API_SLOW_TRACE_LIMIT=2):
+            for _ in range(3):
+                self.client.get('/api/profile/')
+            self.assertEqual(len(slow_requests.all()), 2)
@@ -16,6 +16,10 @@ urlpatterns = [
     # User profile endpoints
     path('profile/', views.UserProfileView.as_view(), name='user-profile'),
     
+    # Instrumentation (see core/instrumentation.py)
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('metrics/slow-requests/', views.SlowRequestView.as_view(), name='slow-requests'),
+
     # Include router URLs
     path('', include(router.urls)),
 ]
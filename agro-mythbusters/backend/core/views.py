@@ -3,12 +3,17 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
+from .activity import activity_buffer
+from .authentication import MetricsTokenAuthentication
+from .instrumentation import metrics, slow_request_ms, slow_requests
 from .models import UserActivity
+from .pagination import KeysetPagination
 from .serializers import (
     UserSerializer, CustomTokenObtainPairSerializer,
     UserActivitySerializer, UserRegistrationSerializer
 )
-from .permissions import IsOwnerOrReadOnly
+from .permissions import IsMetricsScraper, IsOwnerOrReadOnly
+from .renderers import PrometheusRenderer
 
 User = get_user_model()
 
@@ -46,6 +51,7 @@ class UserActivityView(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = UserActivitySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return UserActivity.objects.filter(user=self.request.user).order_by('-created_at')
@@ -75,3 +81,38 @@ class ChangePasswordView(APIView):
             {"message": "Password updated successfully"}, 
             status=status.HTTP_200_OK
         )
+
+
+class MetricsView(APIView):
+    """
+    Request metrics of this process in the Prometheus text format (see
+    core.instrumentation), for staff or ``API_METRICS_TOKEN`` bearers.
+    """
+    authentication_classes = [
+        MetricsTokenAuthentication, *APIView.authentication_classes,
+    ]
+    permission_classes = [IsMetricsScraper]
+    renderer_classes = [PrometheusRenderer]
+    # Scrapers poll far more often than the anonymous rate allows.
+    throttle_classes = []
+
+    def get(self, request, *args, **kwargs):
+        stats = activity_buffer.stats()
+        return Response(metrics.render([
+            ('api_activity_buffered', 'gauge', 'Activities waiting to be written.', stats['buffered']),
+            ('api_activity_dropped_total', 'counter', 'Activities dropped by a full buffer.', stats['dropped']),
+            ('api_activity_written_total', 'counter', 'Activities written.', stats['written']),
+            ('api_activity_failed_total', 'counter', 'Activities lost to failed writes.', stats['failed']),
+            ('api_slow_traces', 'gauge', 'Slow request traces kept.', len(slow_requests.all())),
+        ]))
+
+
+class SlowRequestView(APIView):
+    """
+    The latest sampled slow request traces of this process, newest first,
+    with their queries and duplicated query fingerprints.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'threshold_ms': slow_request_ms(), 'results': slow_requests.all()})
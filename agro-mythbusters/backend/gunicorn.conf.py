@@ -0,0 +1,12 @@
+"""
+Gunicorn settings, read from the working directory when gunicorn starts
+(``gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker`` as
+deployed, for the async views and the notification stream, see
+``config.asgi``; or ``gunicorn config.wsgi``).
+"""
+
+
+def worker_exit(server, worker):
+    # Write the activities still buffered by this worker (see core.activity).
+    from core.activity import activity_buffer
+    activity_buffer.stop()
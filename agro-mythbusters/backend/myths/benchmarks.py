@@ -0,0 +1,287 @@
+"""
+API benchmark harness.
+
+Seeds a synthetic dataset (``seed_data --scale``), requests every GET
+endpoint registered on the API routers and records, per endpoint, the query
+count, p50/p95 latency and the response size. Reports are plain JSON so two
+runs (e.g. two commits) can be diffed and compared with ``compare_reports``.
+
+Used by ``manage.py benchmark_api``.
+"""
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, override_settings,
+    setup_test_environment, teardown_test_environment,
+)
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .synthetic import counts_for_scale
+
+REPORT_VERSION = 1
+
+# Non-router GET endpoints and interesting query variants of router ones.
+EXTRA_ENDPOINTS = [
+    ('/api/profile/', {}),
+    ('/api/myths/', {'search': 'soil'}),
+    ('/api/myths/', {'ordering': '-total_votes'}),
+    ('/api/myths/', {'page': 5}),
+    ('/api/myths/trending/', {}),
+    ('/api/myths/top/', {}),
+]
+
+
+@contextmanager
+def benchmark_database(keepdb=False, shared=False):
+    """
+    Run the enclosed block against a throwaway test database (like the test
+    runner does) so benchmarks never touch real data. ``shared`` puts an
+    SQLite one in a file instead of memory, so other processes (e.g. the
+    servers of ``myths.loadtest``) can open it; its name is
+    ``connection.settings_dict['NAME']`` meanwhile.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if shared and connection.vendor == 'sqlite' and not old_test_name:
+        test_settings['NAME'] = os.path.join(tempfile.gettempdir(), f'benchmark-{os.getpid()}.sqlite3')
+    connection.creation.create_test_db(verbosity=0, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+
+
+def seed_dataset(scale=1, seed=0, stdout=None, **counts):
+    """
+    Seed the base fixtures and a synthetic dataset via ``seed_data --scale``;
+    ``counts`` override individual row counts. Returns the row counts.
+    """
+    call_command('seed_data', scale=scale, seed=seed, stdout=stdout, **counts)
+    return counts_for_scale(scale, **counts)
+
+
+def _routers():
+    from core.urls import router as core_router
+    from myths.urls import router as myths_router
+    return [core_router, myths_router]
+
+
+def discover_endpoints(client):
+    """
+    Yield ``(key, path, params)`` for the list and a detail route of every
+    router registration, followed by ``EXTRA_ENDPOINTS``. Detail keys use an
+    ``{id}`` placeholder so reports from different runs line up.
+    """
+    for router in _routers():
+        for prefix, viewset, basename in router.registry:
+            list_path = f'/api/{prefix}/'
+            yield endpoint_key(list_path, {}), list_path, {}
+            response = client.get(list_path)
+            results = response.data.get('results', []) if response.status_code == 200 else []
+            if results and 'id' in results[0]:
+                yield (
+                    endpoint_key(f'{list_path}{{id}}/', {}),
+                    f'{list_path}{results[0]["id"]}/',
+                    {},
+                )
+    for path, params in EXTRA_ENDPOINTS:
+        yield endpoint_key(path, params), path, params
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(client, path, params, repeat):
+    """Request an endpoint ``repeat`` times and summarize the samples."""
+    timings, queries = [], []
+    response = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(path, params)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+    return {
+        'status': response.status_code,
+        'queries': max(queries),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(_percentile(timings, 95), 3),
+        'bytes': len(response.content),
+    }
+
+
+def endpoint_key(path, params):
+    query = '&'.join(f'{key}={value}' for key, value in sorted(params.items()))
+    return f'GET {path}?{query}' if query else f'GET {path}'
+
+
+def _unthrottled_settings():
+    rest_framework = dict(settings.REST_FRAMEWORK)
+    rest_framework['DEFAULT_THROTTLE_CLASSES'] = []
+    return override_settings(REST_FRAMEWORK=rest_framework)
+
+
+def run_benchmark(user, repeat=20, scale=None):
+    """Benchmark every endpoint as ``user`` and return the report dict."""
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(user)
+    endpoints = {}
+    # Broken endpoints are reported by status code; their tracebacks would
+    # otherwise be logged once per request.
+    request_logger = logging.getLogger('django.request')
+    previous_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        with _unthrottled_settings():
+            for key, path, params in list(discover_endpoints(client)):
+                # One warm-up request so lazy imports do not skew p95.
+                client.get(path, params)
+                endpoints[key] = measure(client, path, params, repeat)
+    finally:
+        request_logger.setLevel(previous_level)
+    return {
+        'version': REPORT_VERSION,
+        'created_at': timezone.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'scale': scale or {},
+        'repeat': repeat,
+        'endpoints': endpoints,
+    }
+
+
+def compare_reports(baseline, current, latency_threshold=0.25, size_threshold=0.10):
+    """
+    Compare ``current`` against ``baseline`` and return a list of regression
+    messages (empty when the run passes).
+
+    Any increase in query count is a regression; latency (p95) and payload
+    size may grow by the given relative thresholds.
+    """
+    regressions = []
+    for key, base in baseline.get('endpoints', {}).items():
+        result = current['endpoints'].get(key)
+        if result is None:
+            regressions.append(f'{key}: missing from current run')
+            continue
+        if result['status'] != base['status']:
+            regressions.append(f'{key}: status {base["status"]} -> {result["status"]}')
+        if result['queries'] > base['queries']:
+            regressions.append(f'{key}: queries {base["queries"]} -> {result["queries"]}')
+        if result['p95_ms'] > base['p95_ms'] * (1 + latency_threshold):
+            regressions.append(
+                f'{key}: p95 {base["p95_ms"]:.1f}ms -> {result["p95_ms"]:.1f}ms'
+            )
+        if result['bytes'] > base['bytes'] * (1 + size_threshold):
+            regressions.append(f'{key}: bytes {base["bytes"]} -> {result["bytes"]}')
+    return regressions
+
+
+def _best_rate(rows, func, repeat):
+    """Rows per second of the fastest of ``repeat`` calls of ``func``."""
+    best = min(_timed(func) for _ in range(repeat))
+    return round(rows / best) if best else float('inf')
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def serialization_throughput(queryset, limit=100, repeat=20):
+    """
+    Rows/sec of serializing (and rendering) ``limit`` myths of ``queryset``
+    with ``MythListSerializer`` and ``JSONRenderer`` versus
+    ``MythListValuesSerializer`` and ``FastJSONRenderer``, both including
+    their query. ``identical`` tells whether the rendered bytes match.
+    """
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+
+    from core.query_plans import plan_for_serializer
+    from core.renderers import FastJSONRenderer
+    from .serializers import MythListSerializer, MythListValuesSerializer
+
+    context = {'request': APIRequestFactory().get('/api/myths/')}
+    queryset = queryset.order_by('-created_at', '-id')
+    planned = plan_for_serializer(MythListSerializer).apply(queryset)
+    fast = MythListValuesSerializer(context=context)
+
+    def serializer_data():
+        return MythListSerializer(list(planned[:limit]), many=True, context=context).data
+
+    def values_data():
+        return fast.serialize(fast.values(queryset)[:limit])
+
+    rows = len(serializer_data())
+    return {
+        'rows': rows,
+        'serializer_rows_per_sec': _best_rate(rows, serializer_data, repeat),
+        'values_rows_per_sec': _best_rate(rows, values_data, repeat),
+        'serializer_render_rows_per_sec': _best_rate(
+            rows, lambda: JSONRenderer().render(serializer_data()), repeat
+        ),
+        'values_render_rows_per_sec': _best_rate(
+            rows, lambda: FastJSONRenderer().render(values_data()), repeat
+        ),
+        'identical': JSONRenderer().render(serializer_data()) == FastJSONRenderer().render(values_data()),
+    }
+
+
+def encoding_costs(payload, repeat=20):
+    """
+    Bytes on the wire and encode time (rendering plus compression, the
+    fastest of ``repeat``) of ``payload`` per renderer and content encoding,
+    as ``{'renderer', 'encoding', 'bytes', 'ms'}`` rows. ``br-cached`` is the
+    quality cached responses are compressed with (see ``myths.cache``).
+    """
+    from rest_framework.renderers import JSONRenderer
+
+    from core.compression import BROTLI_CACHED_QUALITY, BROTLI_QUALITY, available_encodings, compress
+    from core.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+    renderers = [('json', JSONRenderer()), ('fast json', FastJSONRenderer())]
+    if msgpack is not None:
+        renderers.append(('msgpack', MessagePackRenderer()))
+    encodings = [('identity', None, None)]
+    for encoding in reversed(available_encodings()):
+        encodings.append((encoding, encoding, BROTLI_QUALITY))
+        if encoding == 'br':
+            encodings.append(('br-cached', encoding, BROTLI_CACHED_QUALITY))
+
+    rows = []
+    for name, renderer in renderers:
+        for label, encoding, quality in encodings:
+            def encode(renderer=renderer, encoding=encoding, quality=quality):
+                content = renderer.render(payload)
+                return compress(content, encoding, quality=quality) if encoding else content
+
+            rows.append({
+                'renderer': name,
+                'encoding': label,
+                'bytes': len(encode()),
+                'ms': round(min(_timed(encode) for _ in range(repeat)) * 1000, 3),
+            })
+    return rows
@@ -0,0 +1,232 @@
+"""
+Response cache for anonymous read traffic.
+
+Rendered JSON and MessagePack responses of ``list``/``retrieve`` (and of
+their async twins, see ``core.async_views``) are stored in the Django
+cache selected by ``settings.API_CACHE_ALIAS`` (local-memory LRU by default,
+Redis when ``REDIS_URL`` is set). Keys are built from the view, the
+normalized query string and a set of *generation* counters; invalidation
+bumps a generation, which makes every key built from it unreachable without
+having to enumerate or delete entries:
+
+* ``global``        - everything (category changes, which are nested everywhere)
+* ``<name>:list``   - list responses of a viewset
+* ``<name>:<pk>``   - the detail response of one object
+
+Cached entries carry an ETag so conditional requests are answered with 304
+without touching the database. They carry no Last-Modified date: the newest
+``updated_at`` of a response, to the second, changes neither when a row it
+shows is deleted (a page row, or a comment or evidence of a myth) nor when a
+row changes twice in one second.
+Entries worth compressing also keep their body compressed with every
+encoding of ``core.compression`` (brotli at a higher quality than per
+request). Hits are served already compressed, so a hot response is
+compressed once, not on every request.
+
+With the local-memory backend every worker process has its own cache and
+invalidation only reaches the process that made the change; other workers
+serve stale entries for up to ``API_CACHE_TIMEOUT`` seconds. Use Redis when
+that matters.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from core.compression import (
+    BROTLI_CACHED_QUALITY, available_encodings, choose_encoding, compress, is_compressible, weak_etag,
+)
+
+GLOBAL_GENERATION = 'global'
+CACHED_FORMATS = ('json', 'msgpack')
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(name):
+    return f'api-cache:gen:{name}'
+
+
+def get_generations(names):
+    """Current generation of each name, initializing missing ones."""
+    cache = get_cache()
+    keys = {_generation_key(name): name for name in names}
+    found = cache.get_many(keys)
+    generations = {}
+    for key, name in keys.items():
+        if key not in found:
+            # Start from the clock rather than 1 so a generation that was
+            # evicted cannot come back at a value that old entries still use.
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+        generations[name] = found[key]
+    return generations
+
+
+def bump(*names):
+    """Invalidate every cached response depending on ``names``."""
+    cache = get_cache()
+    for name in names:
+        key = _generation_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_on_commit(*names, using=None):
+    """
+    Bump now and, inside a transaction, again once it commits: a reader
+    running between the two bumps still sees the old rows and could cache
+    them under the new generation.
+    """
+    bump(*names)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: bump(*names), using=using)
+
+
+def invalidate_myths(myth_ids, lists=True, using=None):
+    """Invalidate the myths' detail responses and, with ``lists``, myth lists."""
+    names = [f'myth:{myth_id}' for myth_id in myth_ids]
+    if lists:
+        names.append('myth:list')
+    bump_on_commit(*names, using=using)
+
+
+class CachedResponseMixin:
+    """
+    Viewset mixin caching anonymous JSON ``list``/``retrieve`` responses.
+
+    ``cache_name`` names the generations used for the viewset's keys; the
+    signal handlers in ``myths.signals`` bump them when data changes.
+    """
+    cache_name = None
+
+    def _cache_enabled(self, request):
+        return (
+            getattr(settings, 'API_CACHE_ENABLED', True)
+            and request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated
+            and getattr(request.accepted_renderer, 'format', None) in CACHED_FORMATS
+        )
+
+    def _cache_key(self, request, generation_names):
+        generations = get_generations(generation_names)
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values if value != ''
+        ))
+        raw = '|'.join([
+            self.cache_name, self.action, request.path, request.accepted_renderer.format,
+            query, *(str(generations[name]) for name in generation_names),
+        ])
+        return 'api-cache:resp:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def _cached_response(self, request, generation_names, render):
+        if not self._cache_enabled(request):
+            return render()
+
+        key, entry = self._lookup(request, generation_names)
+        status = 'HIT'
+        if entry is None:
+            response = render()
+            if response.status_code != 200:
+                return response
+            entry = self._store(request, key, response)
+            status = 'MISS'
+        return self._serve(request, entry, status)
+
+    async def _acached_response(self, request, generation_names, render):
+        """``_cached_response`` of async views; ``render`` returns a coroutine."""
+        if not self._cache_enabled(request):
+            return await render()
+
+        key, entry = await sync_to_async(self._lookup)(request, generation_names)
+        status = 'HIT'
+        if entry is None:
+            response = await render()
+            if response.status_code != 200:
+                return response
+            # Rendering and compressing are CPU-bound; keep them off the event loop.
+            entry = await sync_to_async(self._store)(request, key, response)
+            status = 'MISS'
+        return self._serve(request, entry, status)
+
+    def _lookup(self, request, generation_names):
+        """``(key, entry)`` of the request; ``entry`` is ``None`` on a miss."""
+        key = self._cache_key(request, generation_names)
+        return key, get_cache().get(key)
+
+    def _store(self, request, key, response):
+        """Render ``response``, cache it under ``key`` and return the entry."""
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        response.render()
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': '"%s"' % hashlib.md5(response.content).hexdigest(),
+            'encoded': {},
+        }
+        if is_compressible(request, response):
+            entry['encoded'] = {
+                encoding: compress(response.content, encoding, quality=BROTLI_CACHED_QUALITY)
+                for encoding in available_encodings()
+            }
+        get_cache().set(key, entry, getattr(settings, 'API_CACHE_TIMEOUT', 300))
+        return entry
+
+    def _serve(self, request, entry, status):
+        encoded = entry.get('encoded') or {}
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), list(encoded))
+        response = HttpResponse(encoded.get(encoding, entry['content']), content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        if encoded:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+            response['ETag'] = weak_etag(entry['etag'])
+        response['X-Cache'] = status
+        return get_conditional_response(request, etag=entry['etag'], response=response)
+
+    def list(self, request, *args, **kwargs):
+        parent = super()
+        return self._cached_response(
+            request, [GLOBAL_GENERATION, f'{self.cache_name}:list'],
+            lambda: parent.list(request, *args, **kwargs),
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        parent = super()
+        return await self._acached_response(
+            request, [GLOBAL_GENERATION, f'{self.cache_name}:list'],
+            lambda: parent.alist(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super()
+        return self._cached_response(
+            request, self._detail_generations(kwargs),
+            lambda: parent.retrieve(request, *args, **kwargs),
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        parent = super()
+        return await self._acached_response(
+            request, self._detail_generations(kwargs),
+            lambda: parent.aretrieve(request, *args, **kwargs),
+        )
+
+    def _detail_generations(self, kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return [GLOBAL_GENERATION, f'{self.cache_name}:{pk}']
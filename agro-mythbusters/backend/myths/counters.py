@@ -0,0 +1,123 @@
+"""
+Denormalized evidence, comment and research counters on ``Myth``.
+
+List responses show how much approved evidence (in total and per
+``Evidence.EvidenceType``), how many approved comments and how many open
+research requests a myth has. Counting those per row would join three
+tables into every list query, so the numbers are stored on the myth.
+
+Whenever evidence, a comment or a research request is saved or deleted,
+the signal handlers in ``myths.signals`` call ``refresh_myth_counters``
+(inside the writer's transaction, if it has one). It recomputes the
+affected group of counters with one UPDATE of correlated subqueries over
+the indexed ``myth`` columns, so approval changes, type changes and rows
+moved to another myth need no bookkeeping of the previous state. Bulk
+writes send no signals and call it themselves.
+
+The same UPDATE sets ``Myth.updated_at``, as recording a vote does: a
+deleted evidence row leaves no newer ``updated_at`` behind, and incremental
+exports (``myths.export.changed_since``) find it through its myth.
+
+The UPDATE counts with the snapshot of its statement, so two transactions
+adding rows to one myth would each miss the other's uncommitted row and the
+last to commit would win. ``refresh_myth_counters`` therefore first locks
+the myth rows (``FOR NO KEY UPDATE``, which does not conflict with the key
+share locks taken by inserting the rows that reference them): a second
+writer waits there for the first to commit, and its UPDATE then counts both
+rows.
+
+``reconcile_myth_counters`` (``manage.py reconcile_myth_counters``)
+recomputes the counters of every myth in batches.
+"""
+from django.db import connections, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidate_myths
+from .models import Comment, Evidence, Myth, ResearchRequest
+
+RECONCILE_BATCH_SIZE = 1000
+
+EVIDENCE_TYPE_COUNT_FIELDS = {
+    Evidence.EvidenceType.SCIENTIFIC_STUDY: 'scientific_study_count',
+    Evidence.EvidenceType.EXPERT_OPINION: 'expert_opinion_count',
+    Evidence.EvidenceType.FIELD_TRIAL: 'field_trial_count',
+    Evidence.EvidenceType.TRADITIONAL_KNOWLEDGE: 'traditional_knowledge_count',
+    Evidence.EvidenceType.OTHER: 'other_evidence_count',
+}
+OPEN_RESEARCH_STATUSES = (ResearchRequest.Status.OPEN, ResearchRequest.Status.IN_PROGRESS)
+
+
+def _count(model, **filters):
+    rows = model.objects.filter(myth=OuterRef('pk'), **filters)
+    count = rows.order_by().values('myth').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(count), Value(0))
+
+
+def evidence_counters():
+    counters = {'evidence_count': _count(Evidence, is_approved=True)}
+    for evidence_type, field in EVIDENCE_TYPE_COUNT_FIELDS.items():
+        counters[field] = _count(Evidence, is_approved=True, evidence_type=evidence_type)
+    return counters
+
+
+def comment_counters():
+    return {'comment_count': _count(Comment, is_approved=True)}
+
+
+def research_counters():
+    return {'open_research_count': _count(ResearchRequest, status__in=OPEN_RESEARCH_STATUSES)}
+
+
+COUNTERS_BY_MODEL = {
+    Evidence: evidence_counters,
+    Comment: comment_counters,
+    ResearchRequest: research_counters,
+}
+
+
+def all_counters():
+    counters = {}
+    for build in COUNTERS_BY_MODEL.values():
+        counters.update(build())
+    return counters
+
+
+def refresh_myth_counters(myth_ids, model=None, using=None):
+    """
+    Recompute the counters fed by ``model`` (all counters when ``None``) on
+    ``myth_ids`` and mark those myths updated.
+    """
+    counters = COUNTERS_BY_MODEL[model]() if model else all_counters()
+    myths = Myth.objects.using(using).filter(pk__in=myth_ids)
+    with transaction.atomic(using=using):
+        if connections[myths.db].features.has_select_for_update:
+            # In primary key order, so concurrent writers cannot deadlock.
+            list(myths.select_for_update(no_key=True).order_by('pk').values_list('pk', flat=True))
+        myths.update(**counters, updated_at=timezone.now())
+
+
+def reconcile_myth_counters(myth_ids=None):
+    """
+    Recompute every counter; only myths whose stored counters disagree are
+    rewritten and invalidated. Returns the number of corrected myths.
+    """
+    counters = all_counters()
+    myths = Myth.objects.all()
+    if myth_ids is not None:
+        myths = myths.filter(pk__in=myth_ids)
+    actual = {f'actual_{field}': expression for field, expression in counters.items()}
+    drift = Q()
+    for field in counters:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    drifted_ids = list(myths.annotate(**actual).filter(drift).values_list('pk', flat=True))
+
+    for start in range(0, len(drifted_ids), RECONCILE_BATCH_SIZE):
+        with transaction.atomic():
+            Myth.objects.filter(
+                pk__in=drifted_ids[start:start + RECONCILE_BATCH_SIZE]
+            ).update(**counters, updated_at=timezone.now())
+    if drifted_ids:
+        invalidate_myths(drifted_ids)
+    return len(drifted_ids)
@@ -0,0 +1,158 @@
+"""
+Streaming export of myths with their evidence and vote tallies.
+
+Myths are read with ``values().iterator()`` (a server-side cursor on
+PostgreSQL) and their evidence is fetched with one query per chunk, so memory
+use is bounded by ``EXPORT_CHUNK_SIZE`` whatever the size of the table.
+``export_lines`` yields the encoded output line by line for a file and
+``export_blocks`` groups them for a ``StreamingHttpResponse``.
+
+Used by ``/api/myths/export/`` and ``manage.py export_myths``.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Evidence
+
+EXPORT_CHUNK_SIZE = 2000
+# Lines are joined into blocks of about this many characters before being
+# written to the response.
+STREAM_BLOCK_SIZE = 64 * 1024
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+CONTENT_TYPES = {
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_CSV: 'text/csv',
+}
+
+MYTH_FIELDS = (
+    'id', 'title', 'slug', 'description', 'origin', 'status', 'is_featured',
+    'upvotes', 'downvotes', 'total_votes', 'created_at', 'updated_at',
+)
+EVIDENCE_FIELDS = (
+    'id', 'title', 'description', 'evidence_type', 'source_url',
+    'source_citation', 'is_approved', 'created_at', 'updated_at',
+)
+CSV_COLUMNS = MYTH_FIELDS + ('category', 'evidence')
+
+
+def parse_since(value):
+    """
+    Parse an ISO 8601 datetime (or date) into an aware datetime. Returns
+    ``None`` for an empty value and raises ``ValueError`` for a bad one.
+    """
+    if not value:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid datetime: {value!r}')
+        since = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def changed_since(queryset, since):
+    """
+    Myths updated, or with evidence updated, at or after ``since``. Adding
+    or deleting evidence updates its myth (see ``myths.counters``).
+    """
+    if since is None:
+        return queryset
+    evidence_changed = Evidence.objects.filter(myth=OuterRef('pk'), updated_at__gte=since)
+    return queryset.filter(Q(updated_at__gte=since) | Exists(evidence_changed))
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_myths(queryset, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield myth dicts, with ``category`` and an ``evidence`` list, by id."""
+    queryset = changed_since(queryset, since).order_by('pk')
+    # Pending sharded vote deltas (see myths.votes.with_pending_votes).
+    pending = {'pending_upvotes', 'pending_downvotes'} <= set(queryset.query.annotations)
+    fields = MYTH_FIELDS + ('category__name',)
+    if pending:
+        fields += ('pending_upvotes', 'pending_downvotes')
+    rows = queryset.values(*fields).iterator(chunk_size=chunk_size)
+
+    for chunk in _chunks(rows, chunk_size):
+        evidence = {}
+        related = (
+            Evidence.objects.filter(myth_id__in=[row['id'] for row in chunk])
+            .order_by('myth_id', 'pk').values('myth_id', *EVIDENCE_FIELDS)
+        )
+        for item in related:
+            evidence.setdefault(item.pop('myth_id'), []).append(item)
+
+        for row in chunk:
+            row['category'] = row.pop('category__name')
+            if pending:
+                row['upvotes'] += row.pop('pending_upvotes')
+                row['downvotes'] += row.pop('pending_downvotes')
+                row['total_votes'] = row['upvotes'] + row['downvotes']
+            row['evidence'] = evidence.get(row['id'], [])
+            yield row
+
+
+def _json(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_lines(queryset, export_format=FORMAT_NDJSON, since=None,
+                 chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the export as text lines: one JSON object per myth for NDJSON, a
+    header and one row per myth (evidence as a JSON column) for CSV.
+    """
+    myths = iter_myths(queryset, since=since, chunk_size=chunk_size)
+    if export_format == FORMAT_NDJSON:
+        for myth in myths:
+            yield _json(myth) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(CSV_COLUMNS)
+    for myth in myths:
+        myth['evidence'] = _json(myth['evidence'])
+        yield line([_csv_value(myth[column]) for column in CSV_COLUMNS])
+
+
+def export_blocks(lines, block_size=STREAM_BLOCK_SIZE):
+    """Join ``lines`` into blocks so a stream is not written line by line."""
+    block, length = [], 0
+    for line in lines:
+        block.append(line)
+        length += len(line)
+        if length >= block_size:
+            yield ''.join(block)
+            block, length = [], 0
+    if block:
+        yield ''.join(block)
@@ -0,0 +1,36 @@
+from rest_framework import filters
+
+from .search import get_search_backend
+
+
+class MythSearchFilter(filters.BaseFilterBackend):
+    """
+    Full-text search over myths backed by ``myths.search``.
+
+    Results are ordered by relevance unless the client asks for an explicit
+    ``ordering``, so this backend should run after ``OrderingFilter``.
+    """
+    search_param = filters.SearchFilter.search_param
+    ordering_param = filters.OrderingFilter.ordering_param
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+
+        backend = get_search_backend(queryset.db)
+        queryset = backend.search(queryset, query)
+        if backend.supports_ranking and not request.query_params.get(self.ordering_param):
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'A search term, matched by word prefix and ranked by relevance.',
+                'schema': {'type': 'string'},
+            },
+        ]
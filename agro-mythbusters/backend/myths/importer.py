@@ -0,0 +1,184 @@
+"""
+Bulk import of myths and their evidence from NDJSON or CSV.
+
+The input uses the layout written by ``myths.export``: one myth per NDJSON
+line or CSV row with ``title``, ``description``, ``origin``, a ``category``
+name and an ``evidence`` list (a JSON column in CSV). Other columns, such as
+the ids and counters of an export, are ignored.
+
+Rows are read lazily and handled in batches: each row is validated with the
+API serializers, categories are resolved from a map loaded once, slugs are
+reserved for the whole batch with ``SlugSequence.objects.allocate_many`` and
+myths and evidence are inserted with ``bulk_create`` in one transaction per
+batch. Invalid rows are reported with their row number and skipped; they
+never abort the rest of the import.
+
+Used by ``manage.py import_myths`` and ``/api/myths/import/``.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from .cache import invalidate_myths
+from .counters import refresh_myth_counters
+from .export import FORMAT_CSV, FORMAT_NDJSON
+from .models import Category, Evidence, Myth, SlugSequence
+from .search import get_search_backend
+from .serializers import EvidenceSerializer, MythSerializer
+from .sync import record_changes
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_FORMATS = (FORMAT_NDJSON, FORMAT_CSV)
+
+
+class ImportEvidenceSerializer(EvidenceSerializer):
+    """Evidence nested in an import row; its myth does not exist yet."""
+
+    class Meta(EvidenceSerializer.Meta):
+        fields = None
+        exclude = ('myth',)
+
+
+def read_rows(stream, import_format):
+    """
+    Yield ``(row number, data)`` pairs from a text stream. Rows that cannot
+    be decoded are yielded with a ``ValueError`` in place of the data. Input
+    that is not valid UTF-8 ends the rows with such an error, numbered as the
+    first row not read: the stream decodes in chunks, so the rows from there
+    on cannot be split.
+    """
+    number = 0
+    try:
+        for number, row in _parse_rows(stream, import_format):
+            yield number, row
+    except UnicodeDecodeError:
+        yield number + 1, ValueError('not valid UTF-8; this and the following rows were skipped')
+
+
+def _parse_rows(stream, import_format):
+    if import_format == FORMAT_CSV:
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            evidence = row.get('evidence') or '[]'
+            try:
+                row['evidence'] = json.loads(evidence)
+            except ValueError:
+                row = ValueError('evidence: not valid JSON')
+            yield number, row
+        return
+
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = ValueError('not valid JSON')
+        if not isinstance(row, (dict, ValueError)):
+            row = ValueError('expected a JSON object')
+        yield number, row
+
+
+class MythImporter:
+    """Validate and insert import rows, collecting per-row errors."""
+
+    def __init__(self, user=None, batch_size=IMPORT_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.categories = {
+            name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')
+        }
+        self.created = 0
+        self.evidence_created = 0
+        self.errors = []
+
+    def run(self, rows):
+        """Import all ``rows`` (see ``read_rows``) and return the summary."""
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            self.import_batch(batch)
+        return self.summary()
+
+    def summary(self):
+        return {
+            'created': self.created,
+            'evidence_created': self.evidence_created,
+            'errors': self.errors,
+        }
+
+    def validate(self, number, data):
+        """Return ``(myth, evidence list)`` for a valid row, else record errors."""
+        if isinstance(data, ValueError):
+            self.errors.append({'row': number, 'errors': {'non_field_errors': [str(data)]}})
+            return None
+
+        errors = {}
+        myth = MythSerializer(data=data)
+        if not myth.is_valid():
+            errors.update(myth.errors)
+
+        category_id = None
+        category = (data.get('category') or '').strip()
+        if category:
+            category_id = self.categories.get(category.lower())
+            if category_id is None:
+                errors['category'] = [f'Unknown category: {category}.']
+
+        evidence = []
+        items = data.get('evidence') or []
+        if not isinstance(items, list):
+            errors['evidence'] = ['Expected a list.']
+            items = []
+        for index, item in enumerate(items):
+            serializer = ImportEvidenceSerializer(data=item)
+            if serializer.is_valid():
+                evidence.append(Evidence(submitted_by=self.user, **serializer.validated_data))
+            else:
+                errors[f'evidence[{index}]'] = serializer.errors
+
+        if errors:
+            self.errors.append({'row': number, 'errors': errors})
+            return None
+        values = myth.validated_data
+        values.pop('category', None)
+        return Myth(category_id=category_id, submitted_by=self.user, **values), evidence
+
+    def import_batch(self, batch):
+        valid = []
+        for number, data in batch:
+            result = self.validate(number, data)
+            if result is not None:
+                valid.append((number, *result))
+        if not valid:
+            return
+
+        try:
+            with transaction.atomic():
+                myths = [myth for _, myth, _ in valid]
+                slugs = SlugSequence.objects.allocate_many([myth.title for myth in myths])
+                for myth, slug in zip(myths, slugs):
+                    myth.slug = slug
+                Myth.objects.bulk_create(myths)
+                evidence = []
+                for _, myth, items in valid:
+                    for item in items:
+                        item.myth_id = myth.pk
+                        evidence.append(item)
+                Evidence.objects.bulk_create(evidence)
+                # bulk_create sends no signals; index, count, log and
+                # invalidate here.
+                myth_ids = [myth.pk for myth in myths]
+                get_search_backend().index_myths(myth_ids)
+                record_changes(Myth, myth_ids)
+                record_changes(Evidence, [item.pk for item in evidence])
+                refresh_myth_counters(myth_ids, model=Evidence)
+                invalidate_myths(myth_ids)
+        except DatabaseError as exc:
+            self.errors.extend(
+                {'row': number, 'errors': {'non_field_errors': [f'Batch failed: {exc}']}}
+                for number, _, _ in valid
+            )
+            return
+        self.created += len(myths)
+        self.evidence_created += len(evidence)
@@ -0,0 +1,224 @@
+"""
+Batch ingestion of votes and comments recorded offline.
+
+Field apps queue what farmers do without a connection and replay it in one
+``POST /api/myths/batch/`` instead of one request per action::
+
+    {"operations": [
+        {"key": "3f2c...", "type": "vote", "myth": 12, "vote_type": "upvote"},
+        {"key": "9a41...", "type": "vote", "myth": 7, "vote_type": null},
+        {"key": "c07e...", "type": "comment", "myth": 12, "content": "..."}
+    ]}
+
+``key`` is generated by the client, once per operation. A vote sets the
+user's vote on the myth (``null`` removes it) instead of toggling it like
+``/upvote/`` does, so replaying an operation cannot flip the vote back.
+
+A batch is applied in one transaction that starts by inserting the keys
+into ``IngestedOperation`` (so it starts with its write, see
+``myths.votes``). Keys that are already there belong to operations applied
+before, e.g. by a request whose response never reached the device; those
+are answered with their stored result and not applied again. The rest is
+written with set-based queries: one locking read of the user's current
+votes, a DELETE, an UPDATE per vote type and a bulk INSERT for the votes
+(retried on top of a vote another request inserted meanwhile), a bulk
+INSERT for the comments, and vote counter deltas grouped per myth (see
+``record_counter_deltas``). Bulk writes send no signals, so the search
+index, comment counters and caches of the touched myths are refreshed once
+per batch here.
+
+Every operation gets a result, in request order: ``applied`` (with its
+result), ``duplicate`` (with the result it got the first time) or
+``invalid`` (with the validation errors; it is not recorded and can be
+sent again).
+"""
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .cache import invalidate_myths
+from .counters import refresh_myth_counters
+from .models import Comment, IngestedOperation, Myth, Vote
+from .search import get_search_backend
+from .serializers import IngestOperationSerializer
+from .sync import record_changes
+from .votes import VOTE_RECORDED, VOTE_REMOVED, VOTE_SWITCHED, record_counter_deltas
+
+STATUS_APPLIED = 'applied'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_INVALID = 'invalid'
+
+VOTE_UNCHANGED = 'unchanged'
+
+
+def max_operations():
+    return getattr(settings, 'MYTH_BATCH_MAX_OPERATIONS', 500)
+
+
+def _vote_outcome(before, after):
+    if before == after:
+        return VOTE_UNCHANGED
+    if after is None:
+        return VOTE_REMOVED
+    return VOTE_RECORDED if before is None else VOTE_SWITCHED
+
+
+def _counts(vote_type):
+    return (
+        int(vote_type == Vote.VoteType.UPVOTE),
+        int(vote_type == Vote.VoteType.DOWNVOTE),
+    )
+
+
+def current_votes(user, myth_ids):
+    """
+    ``{myth id: vote type}`` of the user's votes on ``myth_ids``, locked
+    until the transaction ends so that concurrent requests cannot change
+    them before they are rewritten.
+    """
+    votes = Vote.objects.select_for_update().filter(user=user, myth_id__in=myth_ids)
+    return dict(votes.order_by('pk').values_list('myth_id', 'vote_type'))
+
+
+def apply_votes(user, operations):
+    """
+    Apply vote operations in order; returns their results.
+
+    A vote inserted by a concurrent request between the read and the bulk
+    INSERT cannot be locked in advance; the INSERT then fails and the
+    operations are applied again on top of it, like ``cast_vote`` does.
+    """
+    try:
+        with transaction.atomic():
+            return _apply_votes(user, operations)
+    except IntegrityError:
+        return apply_votes(user, operations)
+
+
+def _apply_votes(user, operations):
+    myth_ids = {operation['myth'] for operation in operations}
+    current = current_votes(user, myth_ids)
+    final = dict(current)
+    results = []
+    for operation in operations:
+        myth_id, vote_type = operation['myth'], operation['vote_type']
+        outcome = _vote_outcome(final.get(myth_id), vote_type)
+        final[myth_id] = vote_type
+        results.append({'myth': myth_id, 'vote': outcome, 'vote_type': vote_type})
+
+    votes = Vote.objects.filter(user=user)
+    votes.filter(myth_id__in=[
+        myth_id for myth_id in current if final[myth_id] is None
+    ]).delete()
+    for vote_type in Vote.VoteType.values:
+        switched = [
+            myth_id for myth_id, before in current.items()
+            if before != vote_type and final[myth_id] == vote_type
+        ]
+        if switched:
+            votes.filter(myth_id__in=switched).update(vote_type=vote_type)
+    Vote.objects.bulk_create([
+        Vote(user=user, myth_id=myth_id, vote_type=vote_type)
+        for myth_id, vote_type in final.items()
+        if myth_id not in current and vote_type is not None
+    ])
+
+    deltas = {}
+    for myth_id in myth_ids:
+        (up_before, down_before), (up_after, down_after) = (
+            _counts(current.get(myth_id)), _counts(final[myth_id])
+        )
+        if (up_before, down_before) != (up_after, down_after):
+            deltas[myth_id] = (up_after - up_before, down_after - down_before)
+    record_counter_deltas(deltas)
+    return results
+
+
+def apply_comments(user, operations):
+    """Create the comments of comment operations; returns their results."""
+    comments = Comment.objects.bulk_create([
+        Comment(user=user, myth_id=operation['myth'], content=operation['content'])
+        for operation in operations
+    ])
+    record_changes(Comment, [comment.pk for comment in comments])
+    myth_ids = {comment.myth_id for comment in comments}
+    if myth_ids:
+        get_search_backend().index_myths(myth_ids)
+        refresh_myth_counters(myth_ids, model=Comment)
+    return [{'myth': comment.myth_id, 'comment': comment.pk} for comment in comments]
+
+
+def ingest_operations(user, operations):
+    """Apply a batch of raw operations for ``user``; returns one result per operation."""
+    results = [None] * len(operations)
+    pending = {}
+    first_index = {}
+    repeated = []
+    for index, raw in enumerate(operations):
+        serializer = IngestOperationSerializer(data=raw)
+        if not serializer.is_valid():
+            key = raw.get('key') if isinstance(raw, dict) else None
+            results[index] = {'key': key, 'status': STATUS_INVALID, 'errors': serializer.errors}
+            continue
+        operation = serializer.validated_data
+        if operation['key'] in first_index:
+            repeated.append((index, operation['key']))
+        else:
+            first_index[operation['key']] = index
+            pending[operation['key']] = (index, operation)
+
+    existing = set(Myth.objects.filter(
+        pk__in={operation['myth'] for _, operation in pending.values()}
+    ).values_list('pk', flat=True))
+    for key, (index, operation) in list(pending.items()):
+        if operation['myth'] not in existing:
+            results[index] = {
+                'key': key, 'status': STATUS_INVALID, 'errors': {'myth': ['Myth not found.']},
+            }
+            del pending[key]
+
+    batch = uuid.uuid4()
+    with transaction.atomic():
+        IngestedOperation.objects.bulk_create(
+            [IngestedOperation(user=user, key=key, batch=batch) for key in pending],
+            ignore_conflicts=True,
+        )
+        recorded = {
+            row.key: row for row in IngestedOperation.objects.filter(user=user, key__in=list(pending))
+        }
+        new = []
+        for key, (index, operation) in pending.items():
+            row = recorded[key]
+            if row.batch == batch:
+                new.append((index, operation))
+            else:
+                results[index] = {'key': key, 'status': STATUS_DUPLICATE, 'result': row.result}
+        new.sort(key=lambda item: item[0])
+
+        for operation_type, apply in (
+            (IngestOperationSerializer.TYPE_VOTE, apply_votes),
+            (IngestOperationSerializer.TYPE_COMMENT, apply_comments),
+        ):
+            selected = [(index, op) for index, op in new if op['type'] == operation_type]
+            if not selected:
+                continue
+            applied = apply(user, [operation for _, operation in selected])
+            for (index, operation), result in zip(selected, applied):
+                results[index] = {'key': operation['key'], 'status': STATUS_APPLIED, 'result': result}
+                recorded[operation['key']].result = result
+
+        if new:
+            IngestedOperation.objects.bulk_update(
+                [recorded[operation['key']] for _, operation in new], ['result']
+            )
+            invalidate_myths({operation['myth'] for _, operation in new})
+
+    # A key repeated within the batch gets the outcome of its first use.
+    for index, key in repeated:
+        first = results[first_index[key]]
+        if first['status'] == STATUS_INVALID:
+            results[index] = first
+        else:
+            results[index] = {'key': key, 'status': STATUS_DUPLICATE, 'result': first['result']}
+    return results
@@ -0,0 +1,198 @@
+"""
+Concurrency load test of the read endpoints, sync WSGI versus ASGI.
+
+``load_test_server`` starts gunicorn with a given number of workers on a
+free local port, in one of three modes:
+
+* ``wsgi``      - sync workers and sync views, the current deployment;
+* ``asgi``      - uvicorn workers with the async views of ``core.async_views``;
+* ``asgi-sync`` - uvicorn workers with the sync views, to tell the server's
+  share of the difference from the views'.
+
+``run_load`` then keeps a number of client connections busy for a while
+and reports throughput and latency percentiles. Throttles, the response
+cache and activity logging are off in the servers, so every request reads
+the database.
+
+A local SQLite database answers in microseconds, which hides what the
+async views change; ``db_latency_ms`` adds a blocking delay to every query,
+like a database across the network.
+
+This module is imported by the gunicorn workers before Django is set up,
+so it imports models only inside functions. Used by ``manage.py
+benchmark_concurrency``.
+"""
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+WSGI, ASGI, ASGI_SYNC = 'wsgi', 'asgi', 'asgi-sync'
+INTERFACES = (WSGI, ASGI, ASGI_SYNC)
+UVICORN_WORKER = 'uvicorn.workers.UvicornWorker'
+# Path the servers are polled on until they answer.
+READY_PATH = '/api/categories/'
+# Sent with every request, as by the TLS-terminating proxy in front of the
+# servers; with DEBUG off, plain HTTP requests are redirected.
+PROXY_HEADERS = {'X-Forwarded-Proto': 'https'}
+
+
+def _query_delay(seconds):
+    def delayed(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        # First in line, so that execute_wrapper() blocks still remove
+        # their own wrapper.
+        if delayed not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, delayed)
+    return install
+
+
+def load_test_application(interface, database, db_latency_ms=0):
+    """
+    The application of a load test server, called by gunicorn as
+    ``myths.loadtest:load_test_application(...)``: the WSGI or ASGI
+    application on ``database``, unthrottled, with ``db_latency_ms`` added
+    to every query.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    settings.DATABASES['default']['NAME'] = database
+    # Before DRF reads its settings, which it does once.
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+    if db_latency_ms:
+        from django.db.backends.signals import connection_created
+        connection_created.connect(_query_delay(db_latency_ms / 1000), weak=False)
+    if interface == WSGI:
+        from config.wsgi import application
+    else:
+        from config.asgi import application
+    return application
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _get(host, port, path, headers=None, timeout=60):
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request('GET', path, headers={**PROXY_HEADERS, **(headers or {})})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+@contextmanager
+def load_test_server(interface, database, workers=3, db_latency_ms=0, timeout=30):
+    """Run a load test server (see the module docstring); yields its base URL."""
+    if interface not in INTERFACES:
+        raise ValueError(f'Unknown interface {interface!r}; use one of {", ".join(INTERFACES)}.')
+    port = _free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+        '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+    ]
+    if interface != WSGI:
+        command += ['--worker-class', UVICORN_WORKER]
+    command.append(
+        f'myths.loadtest:load_test_application({interface!r}, {str(database)!r}, {db_latency_ms!r})'
+    )
+    env = {
+        **os.environ,
+        'DEBUG': 'False',
+        'API_ASYNC_VIEWS': 'True' if interface == ASGI else 'False',
+        'API_CACHE_ENABLED': 'False',
+        'USER_ACTIVITY_LOG_ENABLED': 'False',
+    }
+    process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'The {interface} server exited with {process.returncode}.')
+            try:
+                if _get('127.0.0.1', port, READY_PATH, timeout=5) == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'The {interface} server did not start in {timeout}s.')
+            time.sleep(0.2)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def run_load(base_url, requests, concurrency=32, duration=10.0):
+    """
+    Send ``(path, headers)`` ``requests`` in turn from ``concurrency``
+    threads, each over a keep-alive connection of its own, for ``duration``
+    seconds. Returns the request count, throughput, latency percentiles and
+    status counts.
+    """
+    url = urlsplit(base_url)
+    lock = threading.Lock()
+    timings, statuses = [], Counter()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+        own_timings, own_statuses = [], Counter()
+        index = offset
+        while time.perf_counter() < deadline:
+            path, headers = requests[index % len(requests)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers={**PROXY_HEADERS, **headers})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = 'error'
+            own_timings.append((time.perf_counter() - started) * 1000)
+            own_statuses[status] += 1
+        connection.close()
+        with lock:
+            timings.extend(own_timings)
+            statuses.update(own_statuses)
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    percentiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return {
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'requests_per_sec': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentiles[49], 2) if timings else None,
+        'p95_ms': round(percentiles[94], 2) if timings else None,
+        'p99_ms': round(percentiles[98], 2) if timings else None,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import UserActivity, UserActivityArchive
+from core.partitions import expire_history, expire_rows
+from myths.models import IngestedOperation, Notification, SyncChange
+from myths.notifications import compact_read_notifications, reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Compact old read notifications and expire activities, notifications, '
+        'batch idempotency keys and sync tombstones past their retention period'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activity-days', type=int,
+                            default=settings.USER_ACTIVITY_RETENTION_DAYS,
+                            help='Archive activities older than this many days.')
+        parser.add_argument('--notification-days', type=int,
+                            default=settings.NOTIFICATION_RETENTION_DAYS,
+                            help='Delete notifications older than this many days.')
+        parser.add_argument('--compact-after-days', type=int,
+                            default=settings.NOTIFICATION_COMPACT_AFTER_DAYS,
+                            help='Compact read notifications older than this many days.')
+        parser.add_argument('--idempotency-days', type=int,
+                            default=settings.MYTH_BATCH_KEY_RETENTION_DAYS,
+                            help='Delete batch idempotency keys older than this many days.')
+        parser.add_argument('--sync-tombstone-days', type=int,
+                            default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+                            help='Delete sync tombstones older than this many days.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        compacted = compact_read_notifications(timedelta(days=options['compact_after_days']))
+        self.stdout.write(f'Compacted {compacted} read notifications.')
+
+        expired = [
+            ('activities', UserActivity, options['activity_days'], UserActivityArchive),
+            ('notifications', Notification, options['notification_days'], None),
+        ]
+        for label, model, days, archive_model in expired:
+            partitions, rows = expire_history(
+                model, now - timedelta(days=days), archive_model=archive_model, now=now
+            )
+            action = 'Archived' if archive_model else 'Expired'
+            if partitions:
+                self.stdout.write(f'{action} {label} partitions: {", ".join(partitions)}.')
+            else:
+                self.stdout.write(f'{action} {rows} {label}.')
+            if model is Notification and partitions:
+                # Dropped partitions may have held unread notifications.
+                reconcile_unread_counts()
+        keys = expire_rows(IngestedOperation.objects.filter(
+            created_at__lt=now - timedelta(days=options['idempotency_days'])
+        ))
+        self.stdout.write(f'Expired {keys} batch idempotency keys.')
+        tombstones = expire_rows(SyncChange.objects.filter(
+            deleted=True, created_at__lt=now - timedelta(days=options['sync_tombstone_days'])
+        ))
+        self.stdout.write(f'Expired {tombstones} sync tombstones.')
+        self.stdout.write(self.style.SUCCESS('Retention applied.'))
@@ -0,0 +1,79 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from myths.benchmarks import benchmark_database, compare_reports, run_benchmark, seed_dataset
+from myths.synthetic import SCALE_PROFILE
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API GET endpoint (query count, p50/p95 latency, payload '
+        'size) against a synthetic dataset in a throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help='Synthetic dataset scale passed to seed_data --scale.')
+        for name in SCALE_PROFILE:
+            parser.add_argument(f'--{name}', type=int,
+                                help=f'Override the number of synthetic {name}.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Requests per endpoint.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed for the synthetic dataset.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--baseline', help='Compare against this JSON report.')
+        parser.add_argument('--latency-threshold', type=float, default=0.25,
+                            help='Allowed relative p95 latency growth (default 0.25).')
+        parser.add_argument('--size-threshold', type=float, default=0.10,
+                            help='Allowed relative payload growth (default 0.10).')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Reuse and keep the benchmark database (skips seeding '
+                                 'when it already holds data).')
+
+    def handle(self, *args, **options):
+        with benchmark_database(keepdb=options['keepdb']):
+            report = self.run(options)
+
+        for key, result in sorted(report['endpoints'].items()):
+            self.stdout.write(
+                f'{key:<55} {result["status"]:>3} {result["queries"]:>4}q '
+                f'p50 {result["p50_ms"]:>8.2f}ms p95 {result["p95_ms"]:>8.2f}ms '
+                f'{result["bytes"]:>9}B'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+            regressions = compare_reports(
+                baseline, report,
+                latency_threshold=options['latency_threshold'],
+                size_threshold=options['size_threshold'],
+            )
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(f'{len(regressions)} regressions against the baseline.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def run(self, options):
+        counts = {name: options[name] for name in SCALE_PROFILE}
+        if not User.objects.filter(email='bench-admin@example.com').exists():
+            counts = seed_dataset(
+                options['scale'], seed=options['seed'], stdout=self.stdout, **counts
+            )
+            User.objects.create_superuser(
+                email='bench-admin@example.com', password=None,
+                first_name='Bench', last_name='Admin', is_researcher=True,
+            )
+        user = User.objects.get(email='bench-admin@example.com')
+        self.stdout.write('Benchmarking endpoints...')
+        return run_benchmark(user, repeat=options['repeat'], scale=counts)
@@ -0,0 +1,109 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework_simplejwt.tokens import AccessToken
+
+from myths.benchmarks import benchmark_database, seed_dataset
+from myths.loadtest import INTERFACES, WSGI, load_test_server, run_load
+from myths.models import Myth, Notification
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the myth, category and notification reads with concurrent '
+        'clients, served by sync WSGI workers and by ASGI workers with the same '
+        'worker count, against a synthetic dataset in a throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help='Synthetic dataset scale passed to seed_data --scale.')
+        parser.add_argument('--workers', type=int, default=3,
+                            help='Server worker processes, the same for every interface.')
+        parser.add_argument('--interfaces', default=f'{WSGI},asgi',
+                            help=f'Comma-separated servers to compare: {", ".join(INTERFACES)}.')
+        parser.add_argument('--concurrency', default='8,32',
+                            help='Comma-separated numbers of concurrent clients.')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds of load per interface and concurrency.')
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Delay added to every query, like a database across the network.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        interfaces = [name.strip() for name in options['interfaces'].split(',') if name.strip()]
+        unknown = set(interfaces) - set(INTERFACES)
+        if unknown:
+            raise CommandError(f'Unknown interfaces: {", ".join(sorted(unknown))}.')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency takes comma-separated integers.')
+
+        with benchmark_database(shared=True):
+            self.stdout.write('Seeding the dataset...')
+            seed_dataset(options['scale'], stdout=StringIO())
+            requests = self.requests()
+            database = connection.settings_dict['NAME']
+            # The servers open the database themselves.
+            connection.close()
+            results = []
+            for interface in interfaces:
+                with load_test_server(
+                    interface, database, workers=options['workers'],
+                    db_latency_ms=options['db_latency_ms'],
+                ) as base_url:
+                    for level in levels:
+                        self.stdout.write(f'{interface}: {level} concurrent clients...')
+                        run_load(base_url, requests, concurrency=level, duration=1)  # warm-up
+                        result = run_load(
+                            base_url, requests, concurrency=level, duration=options['duration']
+                        )
+                        results.append({'interface': interface, **result})
+
+        self.stdout.write('')
+        baselines = {}
+        for result in results:
+            baseline = baselines.setdefault(result['concurrency'], result['requests_per_sec'])
+            self.stdout.write(
+                f'{result["interface"]:<10} {result["concurrency"]:>4} clients '
+                f'{result["requests_per_sec"]:>9.1f} req/s ({result["requests_per_sec"] / baseline:.2f}x) '
+                f'p50 {result["p50_ms"]:>8.2f}ms p95 {result["p95_ms"]:>8.2f}ms '
+                f'p99 {result["p99_ms"]:>8.2f}ms {result["statuses"]}'
+            )
+
+        if options['output']:
+            report = {
+                'workers': options['workers'],
+                'db_latency_ms': options['db_latency_ms'],
+                'duration': options['duration'],
+                'endpoints': [path for path, _ in requests],
+                'results': results,
+            }
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    def requests(self):
+        """``(path, headers)`` of the endpoints, requested in turn."""
+        myth = Myth.objects.annotate(comments_total=Count('comments')).order_by(
+            '-comments_total', 'pk'
+        ).first()
+        reader = Notification.objects.values('user').annotate(total=Count('id')).order_by(
+            '-total'
+        ).first()
+        if myth is None or reader is None:
+            raise CommandError('The dataset has no myths or notifications; raise --scale.')
+        token = AccessToken.for_user(User.objects.get(pk=reader['user']))
+        return [
+            ('/api/myths/', {}),
+            (f'/api/myths/{myth.pk}/', {}),
+            ('/api/categories/', {}),
+            ('/api/notifications/', {'Authorization': f'Bearer {token}'}),
+        ]
@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from core.pagination import KeysetPagination, encode_cursor
+from myths.benchmarks import (
+    _unthrottled_settings, benchmark_database, measure, seed_dataset,
+)
+from myths.models import Myth
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare page-number and keyset pagination of the myth list on the '
+        'first and a deep page'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000,
+                            help='Deep page to fetch.')
+        parser.add_argument('--myths', type=int,
+                            help='Myths to seed (default: enough for --page).')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Requests per measurement.')
+        parser.add_argument('--tolerance', type=float, default=2.0,
+                            help='Allowed ratio of deep to first page keyset p50.')
+
+    def handle(self, *args, **options):
+        page, size = options['page'], KeysetPagination.page_size
+        myths = options['myths'] or page * size
+        if myths < page * size:
+            raise CommandError(f'--myths must be at least {page * size} to reach --page.')
+
+        with benchmark_database():
+            self.stdout.write(f'Seeding {myths} myths...')
+            seed_dataset(0, users=10, myths=myths, stdout=StringIO())
+            client = APIClient()
+            client.force_authenticate(User.objects.filter(is_superuser=False).first())
+
+            # The row just before the deep page positions its cursor.
+            last_seen = Myth.objects.order_by('-created_at', '-id').values_list(
+                'created_at', 'id'
+            )[(page - 1) * size - 1]
+            variants = [
+                ('offset  page 1', {'page': 1}),
+                (f'offset  page {page}', {'page': page}),
+                ('keyset  page 1', {}),
+                (f'keyset  page {page}', {'cursor': encode_cursor(last_seen)}),
+            ]
+            results = {}
+            with _unthrottled_settings(), override_settings(API_CACHE_ENABLED=False):
+                for label, params in variants:
+                    client.get('/api/myths/', params)
+                    results[label] = measure(client, '/api/myths/', params, options['repeat'])
+
+        for label, result in results.items():
+            self.stdout.write(
+                f'{label}: p50 {result["p50_ms"]:.2f}ms, p95 {result["p95_ms"]:.2f}ms, '
+                f'{result["queries"]} queries'
+            )
+        first, deep = (results[label]['p50_ms'] for label, _ in variants[2:])
+        if any(result['status'] != 200 for result in results.values()):
+            raise CommandError('A pagination request failed.')
+        if deep > first * options['tolerance']:
+            raise CommandError(
+                f'Keyset page {page} is {deep / first:.1f}x slower than page 1.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Keyset page {page} costs {deep / first:.2f}x page 1.'
+        ))
@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from rest_framework.test import APIRequestFactory
+
+from myths.benchmarks import benchmark_database, encoding_costs, seed_dataset
+from myths.models import Myth
+from myths.serializers import MythListValuesSerializer, MythSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare bytes on the wire and encode time of a myth list page and a '
+        'myth detail per renderer (JSON, MessagePack) and content encoding'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--myths', type=int, default=2000,
+                            help='Myths to seed.')
+        parser.add_argument('--rows', type=int, default=100,
+                            help='Myths in the list payload.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Encodings per measurement; the fastest counts.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f'Seeding {options["myths"]} myths...')
+            seed_dataset(0, users=50, myths=options['myths'], stdout=StringIO())
+            context = {'request': APIRequestFactory().get('/api/myths/')}
+            fast = MythListValuesSerializer(context=context)
+            busiest = Myth.objects.annotate(comments_total=Count('comments')).order_by(
+                '-comments_total', 'pk'
+            ).first()
+            payloads = [
+                (f'myth list ({options["rows"]} rows)',
+                 fast.serialize(fast.values(Myth.objects.order_by('-created_at', '-id'))[:options['rows']])),
+                (f'myth detail (#{busiest.pk})', MythSerializer(busiest, context=context).data),
+            ]
+            results = [
+                (label, encoding_costs(payload, repeat=options['repeat']))
+                for label, payload in payloads
+            ]
+
+        for label, rows in results:
+            self.stdout.write(f'\n{label}')
+            baseline = rows[0]['bytes']
+            for row in rows:
+                self.stdout.write(
+                    f'  {row["renderer"]:<10} {row["encoding"]:<9} {row["bytes"]:>10,} bytes '
+                    f'({row["bytes"] / baseline:6.1%})  {row["ms"]:8.3f} ms'
+                )
+        self.stdout.write(self.style.SUCCESS('Done.'))
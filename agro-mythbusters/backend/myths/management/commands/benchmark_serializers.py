@@ -0,0 +1,43 @@
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myths.benchmarks import benchmark_database, seed_dataset, serialization_throughput
+from myths.models import Myth
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the myth list serializer and its .values() '
+        'counterpart, with and without JSON rendering'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--myths', type=int, default=2000,
+                            help='Myths to seed.')
+        parser.add_argument('--rows', type=int, default=100,
+                            help='Rows serialized per call.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Calls per measurement; the fastest counts.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f'Seeding {options["myths"]} myths...')
+            seed_dataset(0, users=50, myths=options['myths'], stdout=StringIO())
+            result = serialization_throughput(
+                Myth.objects.all(), limit=options['rows'], repeat=options['repeat']
+            )
+
+        for label, key in [
+            ('serializer        ', 'serializer_rows_per_sec'),
+            ('values            ', 'values_rows_per_sec'),
+            ('serializer + JSON ', 'serializer_render_rows_per_sec'),
+            ('values + fast JSON', 'values_render_rows_per_sec'),
+        ]:
+            self.stdout.write(f'{label}: {result[key]:,} rows/sec')
+        if not result['identical']:
+            raise CommandError('The two serializers rendered different output.')
+        speedup = result['values_render_rows_per_sec'] / result['serializer_render_rows_per_sec']
+        self.stdout.write(self.style.SUCCESS(
+            f'Identical output over {result["rows"]} rows, {speedup:.1f}x the rows/sec.'
+        ))
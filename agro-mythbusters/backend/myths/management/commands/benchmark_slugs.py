@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from myths.benchmarks import benchmark_database
+from myths.models import Myth
+
+
+class Command(BaseCommand):
+    help = (
+        'Create many myths with the same title and show that the cost of '
+        'allocating a unique slug does not grow with the number of duplicates'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duplicates', type=int, default=1000,
+                            help='Number of myths sharing one title.')
+        parser.add_argument('--window', type=int, default=100,
+                            help='Number of creates averaged at the start and end.')
+
+    def handle(self, *args, **options):
+        duplicates, window = options['duplicates'], options['window']
+        if duplicates < 2 * window:
+            raise CommandError('--duplicates must be at least twice --window.')
+
+        with benchmark_database():
+            samples = []
+            for _ in range(duplicates):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    myth = Myth.objects.create(title='Maize needs daily watering', description='.')
+                    elapsed = time.perf_counter() - started
+                samples.append((elapsed * 1000, len(context.captured_queries)))
+
+        first, last = samples[:window], samples[-window:]
+        for label, sample in (('first', first), ('last', last)):
+            self.stdout.write(
+                f'{label} {window} creates: '
+                f'{sum(ms for ms, _ in sample) / window:.3f}ms avg, '
+                f'{max(queries for _, queries in sample)} queries max'
+            )
+        self.stdout.write(f'last slug: {myth.slug}')
+
+        if max(q for _, q in last) > max(q for _, q in first[1:]):
+            raise CommandError('Slug allocation cost grows with the number of duplicates.')
+        self.stdout.write(self.style.SUCCESS('Slug allocation cost is constant.'))
@@ -0,0 +1,98 @@
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from myths.models import Myth, Vote
+from myths.votes import cast_vote, flush_vote_counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent votes at a single myth and verify that the stored '
+        'vote counters match the recorded votes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=2000,
+                            help='Number of distinct users voting.')
+        parser.add_argument('--threads', type=int, default=16,
+                            help='Number of concurrent worker threads.')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed for the vote sequence.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the benchmark myth and users afterwards.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        run = uuid.uuid4().hex[:8]
+        password = make_password(None)
+
+        users = User.objects.bulk_create([
+            User(
+                email=f'bench-vote-{run}-{i}@example.com',
+                first_name='Bench', last_name=str(i), password=password,
+            )
+            for i in range(options['voters'])
+        ])
+        if not all(user.pk for user in users):
+            users = list(User.objects.filter(email__startswith=f'bench-vote-{run}-'))
+        myth = Myth.objects.create(
+            title=f'Vote benchmark {run}', description='Concurrency benchmark myth.'
+        )
+
+        # Each voter casts one to three votes in sequence, which covers
+        # recording, switching and toggling a vote off.
+        choices = [Vote.VoteType.UPVOTE, Vote.VoteType.DOWNVOTE]
+        plans = [
+            (user, [rng.choice(choices) for _ in range(rng.randint(1, 3))])
+            for user in users
+        ]
+        total_ops = sum(len(votes) for _, votes in plans)
+
+        def run_worker(worker_plans):
+            try:
+                for user, votes in worker_plans:
+                    for vote_type in votes:
+                        cast_vote(myth.pk, user, vote_type)
+            finally:
+                connection.close()
+
+        self.stdout.write(
+            f'Casting {total_ops} votes from {len(users)} users '
+            f'on {options["threads"]} threads...'
+        )
+        started = time.perf_counter()
+        threads = options['threads']
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in pool.map(run_worker, [plans[i::threads] for i in range(threads)]):
+                pass
+        elapsed = time.perf_counter() - started
+
+        try:
+            flush_vote_counters([myth.pk])
+            myth.refresh_from_db()
+            upvotes = Vote.objects.filter(myth=myth, vote_type=Vote.VoteType.UPVOTE).count()
+            downvotes = Vote.objects.filter(myth=myth, vote_type=Vote.VoteType.DOWNVOTE).count()
+            self.stdout.write(
+                f'{total_ops / elapsed:.0f} votes/s ({elapsed:.2f}s); '
+                f'counters up={myth.upvotes} down={myth.downvotes} total={myth.total_votes}, '
+                f'votes up={upvotes} down={downvotes}'
+            )
+            if (myth.upvotes, myth.downvotes, myth.total_votes) != (
+                upvotes, downvotes, upvotes + downvotes
+            ):
+                raise CommandError('Vote counters do not match the recorded votes.')
+        finally:
+            if not options['keep']:
+                myth.delete()
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        self.stdout.write(self.style.SUCCESS('Vote counters are consistent.'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myths.export import (
+    CONTENT_TYPES, EXPORT_CHUNK_SIZE, FORMAT_NDJSON, export_lines, parse_since,
+)
+from myths.models import Myth
+from myths.votes import with_pending_votes
+
+
+class Command(BaseCommand):
+    help = 'Export all myths with their evidence and vote tallies as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='export_format', default=FORMAT_NDJSON,
+                            choices=list(CONTENT_TYPES), help='Output format.')
+        parser.add_argument('--since',
+                            help='Only myths changed at or after this ISO 8601 datetime.')
+        parser.add_argument('--output', help='Write to this file instead of stdout.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Myths read from the database per round trip.')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        lines = export_lines(
+            with_pending_votes(Myth.objects.all()), options['export_format'],
+            since=since, chunk_size=options['chunk_size'],
+        )
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        written = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line)
+                written += 1
+        # CSV output starts with a header line.
+        count = written if options['export_format'] == FORMAT_NDJSON else written - 1
+        self.stdout.write(self.style.SUCCESS(f'Exported {count} myths to {options["output"]}.'))
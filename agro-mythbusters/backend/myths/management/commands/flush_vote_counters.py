@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myths.votes import flush_vote_counters
+
+
+class Command(BaseCommand):
+    help = 'Fold pending vote counter shards into the myth vote counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep flushing every --interval seconds until interrupted.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between flushes in --loop mode.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_vote_counters()
+            if flushed or options['verbosity'] > 1:
+                self.stdout.write(f'Flushed vote counters for {flushed} myths.')
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
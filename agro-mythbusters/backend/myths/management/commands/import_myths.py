@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from myths.export import FORMAT_CSV, FORMAT_NDJSON
+from myths.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, MythImporter, read_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import myths with their evidence from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--format', dest='import_format', choices=IMPORT_FORMATS,
+                            help='Input format (default: from the file extension, else NDJSON).')
+        parser.add_argument('--user', help='Email of the user recorded as submitter.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Rows validated and inserted per transaction.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['import_format']
+        if import_format is None:
+            is_csv = os.path.splitext(path)[1].lower() == f'.{FORMAT_CSV}'
+            import_format = FORMAT_CSV if is_csv else FORMAT_NDJSON
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f'No user with email {options["user"]}.')
+
+        importer = MythImporter(user=user, batch_size=options['batch_size'])
+        if path == '-':
+            summary = importer.run(read_rows(sys.stdin, import_format))
+        else:
+            try:
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    summary = importer.run(read_rows(stream, import_format))
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in summary['errors']:
+            self.stderr.write(f'row {error["row"]}: {json.dumps(error["errors"])}')
+        message = (
+            f'Imported {summary["created"]} myths with '
+            f'{summary["evidence_created"]} evidence; {len(summary["errors"])} rows failed.'
+        )
+        style = self.style.WARNING if summary['errors'] else self.style.SUCCESS
+        self.stdout.write(style(message))
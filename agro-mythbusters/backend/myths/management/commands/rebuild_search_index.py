@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from myths.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all myths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias whose search index should be rebuilt.',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        if not backend.supports_ranking:
+            self.stdout.write(self.style.WARNING(
+                'This database has no full-text index; searches use plain matching.'
+            ))
+            return
+
+        self.stdout.write('Rebuilding search index...')
+        with transaction.atomic(using=options['database']):
+            count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} myths.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from myths.counters import reconcile_myth_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute myth evidence, comment and research counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--myth',
+            type=int,
+            action='append',
+            dest='myth_ids',
+            help='Only reconcile this myth id (may be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling myth counters...')
+        corrected = reconcile_myth_counters(options['myth_ids'])
+        if corrected:
+            self.stdout.write(self.style.WARNING(f'Corrected {corrected} myths.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All myth counters are consistent.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from myths.notifications import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute unread notification counters from the notifications'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling unread notification counters...')
+        updated = reconcile_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {updated} counters.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from myths.votes import reconcile_vote_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute myth vote counters from the recorded votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--myth',
+            type=int,
+            action='append',
+            dest='myth_ids',
+            help='Only reconcile this myth id (may be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling vote counters...')
+        corrected = reconcile_vote_counts(options['myth_ids'])
+        if corrected:
+            self.stdout.write(self.style.WARNING(f'Corrected {corrected} myths.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All vote counters are consistent.'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myths.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the trending myth scores from recent votes and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep refreshing every --interval seconds until interrupted.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Seconds between refreshes in --loop mode.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            ranked = refresh_rankings()
+            if options['verbosity'] > 1 or not options['loop']:
+                self.stdout.write(f'Ranked {ranked} trending myths.')
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myths.notifications import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Fan queued notification jobs out to the followers of their myths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for jobs every --interval seconds until interrupted.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds between polls in --loop mode when the queue is empty.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            jobs, notifications = run_pending_jobs()
+            if jobs or options['verbosity'] > 1:
+                self.stdout.write(f'Processed {jobs} jobs, created {notifications} notifications.')
+            if not options['loop']:
+                break
+            close_old_connections()
+            if not jobs:
+                time.sleep(options['interval'])
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from myths.models import Category, Myth
+from myths.synthetic import SCALE_PROFILE, SyntheticDataGenerator, counts_for_scale
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -8,6 +9,36 @@ User = get_user_model()
 class Command(BaseCommand):
     help = 'Seed database with initial categories and sample myths'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=0,
+            help=(
+                'Also bulk-generate a synthetic dataset; each unit adds '
+                + ', '.join(f'{count} {name}' for name, count in SCALE_PROFILE.items())
+                + '.'
+            ),
+        )
+        for name in SCALE_PROFILE:
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                help=f'Override the number of synthetic {name}.',
+            )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the synthetic dataset (runs are reproducible).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert in --scale mode.',
+        )
+
     def handle(self, *args, **kwargs):
         self.stdout.write('Seeding database...')
 
@@ -144,4 +175,21 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(f'Myth already exists: {myth.title}')
 
+        counts = counts_for_scale(
+            kwargs['scale'], **{name: kwargs[name] for name in SCALE_PROFILE}
+        )
+        if any(counts.values()):
+            self.stdout.write(f'Generating synthetic dataset (seed {kwargs["seed"]}): {counts}')
+            SyntheticDataGenerator(
+                counts,
+                seed=kwargs['seed'],
+                batch_size=kwargs['batch_size'],
+                progress=self.report_progress,
+            ).generate()
+
         self.stdout.write(self.style.SUCCESS('Database seeding completed!'))
+
+    def report_progress(self, label, done, total):
+        ending = '\n' if done >= total else '\r'
+        self.stdout.write(f'  {label}: {done}/{total}', ending=ending)
+        self.stdout.flush()
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from myths.search import get_search_backend
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE myths_myth_search ('
+            ' myth_id bigint PRIMARY KEY REFERENCES myths_myth (id)'
+            ' ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+            ' document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX myths_myth_search_document_gin '
+            'ON myths_myth_search USING GIN (document)'
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE myths_myth_fts USING fts5('
+            'title, description, origin, evidence, comments, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    else:
+        return
+    get_search_backend(connection.alias).rebuild()
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS myths_myth_search')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS myths_myth_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
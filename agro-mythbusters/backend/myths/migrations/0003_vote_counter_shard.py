@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='shard')),
+                ('upvotes', models.IntegerField(default=0, verbose_name='upvotes')),
+                ('downvotes', models.IntegerField(default=0, verbose_name='downvotes')),
+                ('myth', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_counter_shards', to='myths.myth', verbose_name='myth')),
+            ],
+            options={
+                'verbose_name': 'vote counter shard',
+                'verbose_name_plural': 'vote counter shards',
+                'unique_together': {('myth', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0003_vote_counter_shard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base', models.CharField(max_length=300, unique=True, verbose_name='base slug')),
+                ('last', models.PositiveIntegerField(default=0, verbose_name='last suffix')),
+            ],
+            options={
+                'verbose_name': 'slug sequence',
+                'verbose_name_plural': 'slug sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0004_slug_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='myths_comme_created_f1875d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['myth', '-created_at', '-id'], name='myths_comme_myth_id_bda4e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='myth',
+            index=models.Index(fields=['-created_at', '-id'], name='myths_myth_created_6a41a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='myth',
+            index=models.Index(fields=['-updated_at', '-id'], name='myths_myth_updated_d2bd86_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='myth',
+            index=models.Index(fields=['-total_votes', '-id'], name='myths_myth_total_v_144e85_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='myths_notif_user_id_97da26_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MythRanking',
+            fields=[
+                ('myth', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='myths.myth', verbose_name='myth')),
+                ('score', models.FloatField(verbose_name='score')),
+                ('refreshed_at', models.DateTimeField(verbose_name='refreshed at')),
+            ],
+            options={
+                'verbose_name': 'myth ranking',
+                'verbose_name_plural': 'myth rankings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='myth',
+            index=models.Index(fields=['category', '-total_votes', '-id'], name='myths_myth_categor_e4823d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['created_at'], name='myths_vote_created_04ea81_idx'),
+        ),
+        migrations.AddField(
+            model_name='mythranking',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='myths.category', verbose_name='category'),
+        ),
+        migrations.AddIndex(
+            model_name='mythranking',
+            index=models.Index(fields=['-score', '-myth'], name='myths_mythr_score_8a8973_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mythranking',
+            index=models.Index(fields=['category', '-score', '-myth'], name='myths_mythr_categor_1fd54e_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('myths', '0006_myth_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('myth_update', 'Myth Update'), ('new_comment', 'New Comment'), ('evidence_added', 'New Evidence'), ('research_update', 'Research Update'), ('status_change', 'Status Change')], max_length=20, verbose_name='notification type')),
+                ('title', models.CharField(max_length=255, verbose_name='title')),
+                ('message', models.TextField(verbose_name='message')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('last_recipient_id', models.BigIntegerField(default=0, verbose_name='last recipient id')),
+                ('notified', models.PositiveIntegerField(default=0, verbose_name='notified')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='locked until')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('exclude_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='excluded user')),
+                ('myth', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_jobs', to='myths.myth', verbose_name='myth')),
+            ],
+            options={
+                'verbose_name': 'notification job',
+                'verbose_name_plural': 'notification jobs',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='myths_notif_status_dacebd_idx')],
+            },
+        ),
+    ]
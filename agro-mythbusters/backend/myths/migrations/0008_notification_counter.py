@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_activity_keyset_index'),
+        ('myths', '0007_notification_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+                ('unread', models.IntegerField(default=0, verbose_name='unread')),
+            ],
+            options={
+                'verbose_name': 'notification counter',
+                'verbose_name_plural': 'notification counters',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0008_notification_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['myth', 'is_approved', '-created_at', '-id'], name='myths_comme_myth_id_76cf43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidence',
+            index=models.Index(fields=['-created_at'], name='myths_evide_created_086e5a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidence',
+            index=models.Index(fields=['myth', 'is_approved', '-created_at'], name='myths_evide_myth_id_2d3a74_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at', '-id'], name='myths_notif_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researchrequest',
+            index=models.Index(fields=['-created_at'], name='myths_resea_created_4bcf43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researchrequest',
+            index=models.Index(fields=['status', '-created_at'], name='myths_resea_status_476517_idx'),
+        ),
+    ]
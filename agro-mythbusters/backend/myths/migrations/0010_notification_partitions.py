@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('myths', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('myth_update', 'Myth Update'), ('new_comment', 'New Comment'), ('evidence_added', 'New Evidence'), ('research_update', 'Research Update'), ('status_change', 'Status Change')], max_length=20, verbose_name='notification type')),
+                ('month', models.DateField(verbose_name='month')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+                ('first_created_at', models.DateTimeField(verbose_name='first created at')),
+                ('last_created_at', models.DateTimeField(verbose_name='last created at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'notification summary',
+                'verbose_name_plural': 'notification summaries',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationsummary',
+            constraint=models.UniqueConstraint(fields=('user', 'notification_type', 'month'), name='myths_notif_summary_unique'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:01
+
+from django.db import migrations, models
+
+
+EVIDENCE_TYPE_COUNT_FIELDS = {
+    'scientific_study': 'scientific_study_count',
+    'expert_opinion': 'expert_opinion_count',
+    'field_trial': 'field_trial_count',
+    'traditional_knowledge': 'traditional_knowledge_count',
+    'other': 'other_evidence_count',
+}
+
+
+def backfill_counters(apps, schema_editor):
+    from django.db.models import Count, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+
+    Myth = apps.get_model('myths', 'Myth')
+
+    def count(model_name, **filters):
+        rows = apps.get_model('myths', model_name).objects.filter(myth=OuterRef('pk'), **filters)
+        total = rows.order_by().values('myth').annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(total), Value(0))
+
+    counters = {
+        'evidence_count': count('Evidence', is_approved=True),
+        'comment_count': count('Comment', is_approved=True),
+        'open_research_count': count('ResearchRequest', status__in=['open', 'in_progress']),
+    }
+    for evidence_type, field in EVIDENCE_TYPE_COUNT_FIELDS.items():
+        counters[field] = count('Evidence', is_approved=True, evidence_type=evidence_type)
+    Myth.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0010_notification_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myth',
+            name='comment_count',
+            field=models.IntegerField(default=0, verbose_name='comment count'),
+        ),
+        migrations.AddField(
+            model_name='myth',
+            name='evidence_count',
+            field=models.IntegerField(default=0, verbose_name='evidence count'),
+        ),
+        migrations.AddField(
+            model_name='myth',
+            name='expert_opinion_count',
+            field=models.IntegerField(default=0, verbose_name='expert opinion count'),
+        ),
+        migrations.AddField(
+            model_name='myth',
+            name='field_trial_count',
+            field=models.IntegerField(default=0, verbose_name='field trial count'),
+        ),
+        migrations.AddField(
+            model_name='myth',
+            name='open_research_count',
+            field=models.IntegerField(default=0, verbose_name='open research count'),
+        ),
+        migrations.AddField(
+            model_name='myth',
+            name='other_evidence_count',
+            field=models.IntegerField(default=0, verbose_name='other evidence count'),
+        ),
+        migrations.AddField(
+            model_name='myth',
+            name='scientific_study_count',
+            field=models.IntegerField(default=0, verbose_name='scientific study count'),
+        ),
+        migrations.AddField(
+            model_name='myth',
+            name='traditional_knowledge_count',
+            field=models.IntegerField(default=0, verbose_name='traditional knowledge count'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
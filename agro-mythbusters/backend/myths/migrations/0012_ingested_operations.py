@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('myths', '0011_myth_related_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, verbose_name='idempotency key')),
+                ('batch', models.UUIDField(verbose_name='batch')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='result')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'ingested operation',
+                'verbose_name_plural': 'ingested operations',
+                'indexes': [models.Index(fields=['created_at'], name='myths_inges_created_d85fb4_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ingestedoperation',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='myths_ingested_op_unique'),
+        ),
+    ]
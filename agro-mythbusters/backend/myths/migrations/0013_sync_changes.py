@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:15
+
+from django.db import migrations, models
+
+# Parents first, so a client's first sync never sees an unknown reference.
+SYNCED_MODELS = ('Category', 'Myth', 'Evidence', 'Comment')
+BATCH_SIZE = 1000
+
+
+def backfill_changes(apps, schema_editor):
+    SyncChange = apps.get_model('myths', 'SyncChange')
+    for model_name in SYNCED_MODELS:
+        model = apps.get_model('myths', model_name)
+        ids = model.objects.order_by('pk').values_list('pk', flat=True).iterator()
+        batch = []
+        for pk in ids:
+            batch.append(SyncChange(kind=model._meta.model_name, object_id=pk))
+            if len(batch) == BATCH_SIZE:
+                SyncChange.objects.bulk_create(batch)
+                batch = []
+        SyncChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myths', '0012_ingested_operations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='kind')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('deleted', models.BooleanField(default=False, verbose_name='deleted')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+            ],
+            options={
+                'verbose_name': 'sync change',
+                'verbose_name_plural': 'sync changes',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['deleted', 'created_at'], name='myths_syncc_deleted_e9b4bf_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='syncchange',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='myths_sync_change_unique'),
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
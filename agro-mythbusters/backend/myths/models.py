@@ -1,4 +1,7 @@
-from django.db import models
+import re
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
@@ -6,6 +9,8 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 
 User = get_user_model()
 
+SLUG_SAVE_ATTEMPTS = 5
+
 
 class Category(models.Model):
     """Categories for organizing myths (e.g., Crops, Livestock, Soil, etc.)"""
@@ -24,6 +29,78 @@ class Category(models.Model):
         return self.name
 
 
+class SlugSequenceManager(models.Manager):
+    """Allocates unique myth slugs from per-base-slug counters."""
+
+    def _reserve(self, base, count):
+        """Reserve ``count`` consecutive suffixes for ``base``; returns the first."""
+        with transaction.atomic():
+            if self.filter(base=base).update(last=F('last') + count):
+                last = self.filter(base=base).values_list('last', flat=True).get()
+                return last - count + 1
+            first = self._first_unused(base)
+            try:
+                with transaction.atomic():
+                    self.create(base=base, last=first + count - 1)
+            except IntegrityError:
+                # Another allocation created the counter concurrently.
+                return self._reserve(base, count)
+            return first
+
+    def _first_unused(self, base):
+        """
+        First suffix not taken by existing myths. Only needed the first time a
+        base is seen, e.g. for myths created before slugs were allocated here.
+        """
+        pattern = re.compile(rf'^{re.escape(base)}(?:-(\d+))?$')
+        slugs = Myth.objects.filter(slug__startswith=base).values_list('slug', flat=True)
+        suffixes = [
+            int(match.group(1) or 0)
+            for match in map(pattern.match, slugs) if match
+        ]
+        return max(suffixes) + 1 if suffixes else 0
+
+    def allocate(self, title):
+        """Return a unique slug for ``title``: ``base``, ``base-1``, ``base-2``..."""
+        return self.allocate_many([title])[0]
+
+    def allocate_many(self, titles):
+        """Allocate unique slugs for many titles with one reservation per base."""
+        bases = [slug_base(title) for title in titles]
+        counts = {}
+        for base in bases:
+            counts[base] = counts.get(base, 0) + 1
+        next_suffix = {base: self._reserve(base, count) for base, count in counts.items()}
+
+        slugs = []
+        for base in bases:
+            suffix = next_suffix[base]
+            next_suffix[base] += 1
+            slugs.append(f'{base}-{suffix}' if suffix else base)
+        return slugs
+
+
+def slug_base(title):
+    """The slug a title maps to before any de-duplicating suffix."""
+    # Leave room for a "-<n>" suffix within the slug field's max_length.
+    return slugify(title)[:280].strip('-') or 'myth'
+
+
+class SlugSequence(models.Model):
+    """Last slug suffix handed out for a base slug (see ``Myth.save``)."""
+    base = models.CharField(_('base slug'), max_length=300, unique=True)
+    last = models.PositiveIntegerField(_('last suffix'), default=0)
+
+    objects = SlugSequenceManager()
+
+    class Meta:
+        verbose_name = _('slug sequence')
+        verbose_name_plural = _('slug sequences')
+
+    def __str__(self):
+        return f"{self.base} ({self.last})"
+
+
 class Myth(models.Model):
     """A belief or practice that needs validation."""
     class Status(models.TextChoices):
@@ -62,6 +139,16 @@ class Myth(models.Model):
     total_votes = models.IntegerField(_('total votes'), default=0)
     upvotes = models.IntegerField(_('upvotes'), default=0)
     downvotes = models.IntegerField(_('downvotes'), default=0)
+    # Approved evidence and comments and open research requests, kept up to
+    # date by myths.counters.
+    evidence_count = models.IntegerField(_('evidence count'), default=0)
+    scientific_study_count = models.IntegerField(_('scientific study count'), default=0)
+    expert_opinion_count = models.IntegerField(_('expert opinion count'), default=0)
+    field_trial_count = models.IntegerField(_('field trial count'), default=0)
+    traditional_knowledge_count = models.IntegerField(_('traditional knowledge count'), default=0)
+    other_evidence_count = models.IntegerField(_('other evidence count'), default=0)
+    comment_count = models.IntegerField(_('comment count'), default=0)
+    open_research_count = models.IntegerField(_('open research count'), default=0)
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
 
@@ -72,20 +159,32 @@ class Myth(models.Model):
         indexes = [
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['category', 'status']),
+            # Keyset pagination over the API ordering choices.
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['-updated_at', '-id']),
+            models.Index(fields=['-total_votes', '-id']),
+            models.Index(fields=['category', '-total_votes', '-id']),
         ]
 
     def __str__(self):
         return self.title
     
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
-            # Ensure slug is unique
-            counter = 1
-            while Myth.objects.filter(slug=self.slug).exists():
-                self.slug = f"{slugify(self.title)}-{counter}"
-                counter += 1
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        # The allocator hands out each suffix once, but a slug set by hand
+        # may still be taken; retry with the next suffix in that case.
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            self.slug = SlugSequence.objects.allocate(self.title)
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug_taken = Myth.objects.filter(slug=self.slug).exists()
+                self.slug = ''
+                if not slug_taken or attempt == SLUG_SAVE_ATTEMPTS - 1:
+                    raise
 
 
 class Evidence(models.Model):
@@ -128,6 +227,10 @@ class Evidence(models.Model):
         verbose_name = _('evidence')
         verbose_name_plural = _('evidences')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['myth', 'is_approved', '-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.get_evidence_type_display()}"
@@ -156,6 +259,11 @@ class Comment(models.Model):
         verbose_name = _('comment')
         verbose_name_plural = _('comments')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['myth', '-created_at', '-id']),
+            models.Index(fields=['myth', 'is_approved', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.email} on {self.myth.title}"
@@ -191,11 +299,77 @@ class Vote(models.Model):
         verbose_name_plural = _('votes')
         unique_together = ('myth', 'user')
         ordering = ['-created_at']
+        indexes = [
+            # Trending windows (see myths.rankings).
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.email} {self.get_vote_type_display()}d {self.myth.title}"
 
 
+class VoteCounterShard(models.Model):
+    """
+    Pending vote counter deltas for a myth, used by the sharded counter mode.
+
+    Votes spread their deltas over a few shard rows per myth instead of all
+    updating the myth row; a flush job folds the shards into ``Myth``.
+    """
+    myth = models.ForeignKey(
+        Myth, 
+        on_delete=models.CASCADE, 
+        related_name='vote_counter_shards',
+        verbose_name=_('myth')
+    )
+    shard = models.PositiveSmallIntegerField(_('shard'))
+    upvotes = models.IntegerField(_('upvotes'), default=0)
+    downvotes = models.IntegerField(_('downvotes'), default=0)
+
+    class Meta:
+        verbose_name = _('vote counter shard')
+        verbose_name_plural = _('vote counter shards')
+        unique_together = ('myth', 'shard')
+
+    def __str__(self):
+        return f"{self.myth_id}#{self.shard}: +{self.upvotes}/-{self.downvotes}"
+
+
+class MythRanking(models.Model):
+    """
+    Materialized trending score of a myth with recent activity, rewritten by
+    ``myths.rankings.refresh_rankings``.
+    """
+    myth = models.OneToOneField(
+        Myth,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+        verbose_name=_('myth')
+    )
+    # Copied from the myth so per-category leaderboards need no join.
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('category')
+    )
+    score = models.FloatField(_('score'))
+    refreshed_at = models.DateTimeField(_('refreshed at'))
+
+    class Meta:
+        verbose_name = _('myth ranking')
+        verbose_name_plural = _('myth rankings')
+        indexes = [
+            models.Index(fields=['-score', '-myth']),
+            models.Index(fields=['category', '-score', '-myth']),
+        ]
+
+    def __str__(self):
+        return f"{self.myth_id}: {self.score}"
+
+
 class ResearchRequest(models.Model):
     """Requests for research on specific myths."""
     class Status(models.TextChoices):
@@ -240,6 +414,10 @@ class ResearchRequest(models.Model):
         verbose_name = _('research request')
         verbose_name_plural = _('research requests')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['status', '-created_at']),
+        ]
 
     def __str__(self):
         return f"Research on {self.myth.title} - {self.get_status_display()}"
@@ -282,6 +460,192 @@ class Notification(models.Model):
         verbose_name = _('notification')
         verbose_name_plural = _('notifications')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+            # Unread notifications only; partial on PostgreSQL and SQLite,
+            # which is what keeps it small next to the full history.
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                condition=models.Q(is_read=False),
+                name='myths_notif_unread_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.notification_type} - {self.user.email}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of unread notifications of a user, kept up to date by
+    ``myths.notifications`` so it can be read without counting.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name=_('user')
+    )
+    unread = models.IntegerField(_('unread'), default=0)
+
+    class Meta:
+        verbose_name = _('notification counter')
+        verbose_name_plural = _('notification counters')
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class NotificationSummary(models.Model):
+    """
+    Read notifications past ``NOTIFICATION_COMPACT_AFTER_DAYS``, compacted
+    into one row per user, type and month (see ``myths.notifications``).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('user')
+    )
+    notification_type = models.CharField(
+        _('notification type'),
+        max_length=20,
+        choices=Notification.NotificationType.choices
+    )
+    month = models.DateField(_('month'))
+    count = models.PositiveIntegerField(_('count'), default=0)
+    first_created_at = models.DateTimeField(_('first created at'))
+    last_created_at = models.DateTimeField(_('last created at'))
+
+    class Meta:
+        verbose_name = _('notification summary')
+        verbose_name_plural = _('notification summaries')
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'notification_type', 'month'],
+                name='myths_notif_summary_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} {self.notification_type} in {self.month:%Y-%m}"
+
+
+class NotificationJob(models.Model):
+    """
+    A queued notification fan-out: one notification for every user following
+    a myth, written in batches by ``manage.py run_notification_worker``.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        RUNNING = 'running', _('Running')
+        DONE = 'done', _('Done')
+        FAILED = 'failed', _('Failed')
+
+    myth = models.ForeignKey(
+        Myth,
+        on_delete=models.CASCADE,
+        related_name='notification_jobs',
+        verbose_name=_('myth')
+    )
+    notification_type = models.CharField(
+        _('notification type'),
+        max_length=20,
+        choices=Notification.NotificationType.choices
+    )
+    title = models.CharField(_('title'), max_length=255)
+    message = models.TextField(_('message'))
+    exclude_user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('excluded user')
+    )
+    status = models.CharField(
+        _('status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    # Recipients are processed in id order; the job resumes after this id.
+    last_recipient_id = models.BigIntegerField(_('last recipient id'), default=0)
+    notified = models.PositiveIntegerField(_('notified'), default=0)
+    error = models.TextField(_('error'), blank=True)
+    locked_until = models.DateTimeField(_('locked until'), null=True, blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('finished at'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('notification job')
+        verbose_name_plural = _('notification jobs')
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} for myth {self.myth_id} ({self.status})"
+
+
+class IngestedOperation(models.Model):
+    """
+    An operation of a batch ingested by ``/api/myths/batch/``, keyed by the
+    client's idempotency key so replayed batches are not applied twice (see
+    ``myths.ingest``).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('user')
+    )
+    key = models.CharField(_('idempotency key'), max_length=64)
+    # The request that inserted the row; rows of other requests are replays.
+    batch = models.UUIDField(_('batch'))
+    result = models.JSONField(_('result'), null=True, blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('ingested operation')
+        verbose_name_plural = _('ingested operations')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='myths_ingested_op_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+
+class SyncChange(models.Model):
+    """
+    The last change of a synced category, myth, evidence or comment (see
+    ``myths.sync``). A row's entry is replaced whenever the row changes, so
+    entry ids follow the order rows last changed in.
+    """
+    kind = models.CharField(_('kind'), max_length=20)
+    object_id = models.BigIntegerField(_('object id'))
+    deleted = models.BooleanField(_('deleted'), default=False)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('sync change')
+        verbose_name_plural = _('sync changes')
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='myths_sync_change_unique'),
+        ]
+        indexes = [
+            # Tombstone retention.
+            models.Index(fields=['deleted', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}{' (deleted)' if self.deleted else ''}"
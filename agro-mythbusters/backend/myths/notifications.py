@@ -0,0 +1,282 @@
+"""
+Notification fan-out.
+
+Events that concern everybody following a myth (its voters, commenters and
+submitter) are not fanned out in the request: ``enqueue_fanout`` only writes
+a ``NotificationJob`` row, in the request's transaction, so the triggering
+endpoint costs the same whatever the number of followers. Another pending
+job of the same type for the same myth is reused instead, so a burst of
+events produces one fan-out.
+
+``run_pending_jobs`` (``manage.py run_notification_worker``) claims jobs and
+walks the recipients in id order, ``NOTIFICATION_FANOUT_BATCH_SIZE`` at a
+time, writing each batch with ``bulk_create`` in its own transaction
+together with the job's progress, so a worker that dies resumes where it
+stopped. Users who already got a notification of the same type for the same
+myth within ``NOTIFICATION_DEDUP_WINDOW`` are skipped.
+
+No broker is involved: several workers can run side by side, a job is
+claimed with a conditional UPDATE and its lease is extended per batch.
+
+Unread counts live in ``NotificationCounter`` and are adjusted in place
+whenever notifications are created, read or deleted, so
+``/api/notifications/unread-count/`` and the notification stream read one
+row instead of counting. A user's row is created from an exact count the
+first time it is read, under a lock that keeps notifications for the user
+from being added meanwhile; ``reconcile_unread_counts`` (``manage.py
+reconcile_unread_counts``) recomputes the rows should they ever drift.
+
+``compact_read_notifications`` (run by ``manage.py apply_retention``)
+replaces old read notifications with ``NotificationSummary`` counts.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Count, DateField, F, Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    Comment, Myth, Notification, NotificationCounter, NotificationJob, NotificationSummary, Vote,
+)
+
+User = get_user_model()
+
+# A running job whose lease expired is assumed abandoned and claimed again.
+JOB_LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 5
+COMPACT_BATCH_SIZE = 1000
+
+
+def batch_size():
+    return getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 1000)
+
+
+def dedup_window():
+    return getattr(settings, 'NOTIFICATION_DEDUP_WINDOW', timedelta(minutes=10))
+
+
+def enqueue_fanout(myth, notification_type, title, message, exclude_user=None):
+    """Queue a notification to every follower of ``myth``."""
+    exclude_user_id = getattr(exclude_user, 'pk', None)
+    # Update first so the transaction starts with its write (see myths.votes).
+    coalesced = NotificationJob.objects.filter(
+        myth=myth, notification_type=notification_type,
+        exclude_user_id=exclude_user_id, status=NotificationJob.Status.PENDING,
+    ).update(title=title, message=message)
+    if coalesced:
+        return None
+    return NotificationJob.objects.create(
+        myth=myth, notification_type=notification_type,
+        title=title, message=message, exclude_user_id=exclude_user_id,
+    )
+
+
+def recipients(job):
+    """Ids of the users to notify for ``job``, in ascending order."""
+    myth_id = job.myth_id
+    users = User.objects.filter(
+        Q(pk__in=Vote.objects.filter(myth_id=myth_id).values('user_id'))
+        | Q(pk__in=Comment.objects.filter(myth_id=myth_id).values('user_id'))
+        | Q(pk__in=Myth.objects.filter(pk=myth_id).values('submitted_by_id'))
+    )
+    if job.exclude_user_id:
+        users = users.exclude(pk=job.exclude_user_id)
+    return users.order_by('pk').values_list('pk', flat=True)
+
+
+def _claimable(now):
+    return Q(status=NotificationJob.Status.PENDING) | Q(
+        status=NotificationJob.Status.RUNNING, locked_until__lt=now
+    )
+
+
+def claim_job():
+    """Claim the oldest runnable job, or return ``None``."""
+    now = timezone.now()
+    candidates = NotificationJob.objects.filter(_claimable(now)).values_list('pk', flat=True)
+    for pk in candidates[:10]:
+        claimed = NotificationJob.objects.filter(_claimable(now), pk=pk).update(
+            status=NotificationJob.Status.RUNNING,
+            locked_until=now + JOB_LEASE,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return NotificationJob.objects.get(pk=pk)
+    return None
+
+
+def process_job(job):
+    """Fan ``job`` out batch by batch. Returns the number of notifications."""
+    users = recipients(job)
+    size = batch_size()
+    created = 0
+    while True:
+        batch = list(users.filter(pk__gt=job.last_recipient_id)[:size])
+        if not batch:
+            break
+        now = timezone.now()
+        with transaction.atomic():
+            job.last_recipient_id = batch[-1]
+            job.locked_until = now + JOB_LEASE
+            job.save(update_fields=['last_recipient_id', 'locked_until'])
+
+            recent = set(Notification.objects.filter(
+                related_myth_id=job.myth_id,
+                notification_type=job.notification_type,
+                created_at__gte=now - dedup_window(),
+                user_id__in=batch,
+            ).values_list('user_id', flat=True))
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id, related_myth_id=job.myth_id,
+                    notification_type=job.notification_type,
+                    title=job.title, message=job.message,
+                )
+                for user_id in batch if user_id not in recent
+            ])
+            NotificationJob.objects.filter(pk=job.pk).update(
+                notified=F('notified') + len(notifications)
+            )
+            adjust_unread([n.user_id for n in notifications], 1)
+        created += len(notifications)
+
+    job.status = NotificationJob.Status.DONE
+    job.finished_at = timezone.now()
+    job.locked_until = None
+    job.save(update_fields=['status', 'finished_at', 'locked_until'])
+    return created
+
+
+def run_pending_jobs(limit=None):
+    """
+    Process runnable jobs until none is left (or ``limit`` were handled).
+    Returns ``(jobs, notifications)`` counts.
+    """
+    jobs = notifications = 0
+    while limit is None or jobs < limit:
+        job = claim_job()
+        if job is None:
+            break
+        jobs += 1
+        try:
+            notifications += process_job(job)
+        except Exception as exc:
+            failed = job.attempts >= MAX_ATTEMPTS
+            NotificationJob.objects.filter(pk=job.pk).update(
+                status=NotificationJob.Status.FAILED if failed else NotificationJob.Status.PENDING,
+                error=str(exc),
+                locked_until=None,
+            )
+    return jobs, notifications
+
+
+def _unread_total():
+    """Unread notifications of the counter's user, as a subquery."""
+    unread = (
+        Notification.objects.filter(user_id=OuterRef('user_id'), is_read=False)
+        .order_by().values('user_id').annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(Subquery(unread), 0)
+
+
+def get_unread_count(user_id):
+    """The user's unread notification count, read from its counter."""
+    counter = NotificationCounter.objects.filter(user_id=user_id)
+    unread = counter.values_list('unread', flat=True).first()
+    if unread is None:
+        with transaction.atomic():
+            # Starts with a write (see myths.votes).
+            NotificationCounter.objects.bulk_create(
+                [NotificationCounter(user_id=user_id)], ignore_conflicts=True
+            )
+            # Writers skip users without a counter, so no notification may
+            # be added between the count and the commit. Inserting one takes
+            # a key share lock on its user row, which FOR UPDATE waits for
+            # (and holds off until the count is committed).
+            if connections[counter.db].features.has_select_for_update:
+                list(User.objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+            counter.update(unread=_unread_total())
+            unread = counter.values_list('unread', flat=True).get()
+    return max(unread, 0)
+
+
+def adjust_unread(user_ids, delta):
+    """
+    Add ``delta`` to the counters of the (distinct) ``user_ids``. Users
+    without a counter are skipped: theirs starts from a count.
+    """
+    if user_ids and delta:
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + delta)
+
+
+def mark_read(user_id, notification_ids=None):
+    """
+    Mark the user's notifications (all of them by default) as read and
+    return how many were unread.
+    """
+    notifications = Notification.objects.filter(user_id=user_id, is_read=False)
+    if notification_ids is not None:
+        notifications = notifications.filter(pk__in=notification_ids)
+    # Only rows this UPDATE flipped are subtracted, so concurrent calls and
+    # notifications created meanwhile keep the counter exact.
+    updated = notifications.update(is_read=True)
+    adjust_unread([user_id], -updated)
+    return updated
+
+
+def reconcile_unread_counts():
+    """Recompute every counter from the notifications. Returns the row count."""
+    return NotificationCounter.objects.update(unread=_unread_total())
+
+
+def compact_read_notifications(older_than, batch_size=COMPACT_BATCH_SIZE):
+    """
+    Fold read notifications created more than ``older_than`` ago into
+    per-user, type and month ``NotificationSummary`` rows and delete them.
+    Returns the number of notifications compacted.
+    """
+    cutoff = timezone.now() - older_than
+    old_read = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+    compacted = 0
+    while True:
+        ids = list(old_read.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return compacted
+        groups = list(
+            Notification.objects.filter(pk__in=ids)
+            .annotate(month=TruncMonth('created_at', output_field=DateField()))
+            .order_by().values('user_id', 'notification_type', 'month')
+            .annotate(count=Count('pk'), first=Min('created_at'), last=Max('created_at'))
+        )
+        with transaction.atomic():
+            Notification.objects.filter(pk__in=ids).delete()
+            existing = {
+                (summary.user_id, summary.notification_type, summary.month): summary
+                for summary in NotificationSummary.objects.filter(
+                    user_id__in={group['user_id'] for group in groups},
+                    month__in={group['month'] for group in groups},
+                )
+            }
+            created, updated = [], []
+            for group in groups:
+                key = (group['user_id'], group['notification_type'], group['month'])
+                summary = existing.get(key)
+                if summary is None:
+                    created.append(NotificationSummary(
+                        user_id=group['user_id'], notification_type=group['notification_type'],
+                        month=group['month'], count=group['count'],
+                        first_created_at=group['first'], last_created_at=group['last'],
+                    ))
+                    continue
+                summary.count += group['count']
+                summary.first_created_at = min(summary.first_created_at, group['first'])
+                summary.last_created_at = max(summary.last_created_at, group['last'])
+                updated.append(summary)
+            NotificationSummary.objects.bulk_create(created)
+            NotificationSummary.objects.bulk_update(
+                updated, ['count', 'first_created_at', 'last_created_at']
+            )
+        compacted += len(ids)
@@ -0,0 +1,173 @@
+"""
+Trending and top myth leaderboards.
+
+The trending score is a step-decayed activity count: every vote and comment
+counts in each window of ``TRENDING_WINDOWS`` it falls into, weighted by the
+window, so recent activity weighs most and activity older than the longest
+window no longer counts. ``refresh_rankings`` recomputes the scores from the
+votes and comments inside that window only - the cost follows recent
+activity, not the size of the tables - and writes them to ``MythRanking``.
+
+Per-category top-N lists of both leaderboards are kept in process memory, so
+serving them costs one query for the myths themselves. They are reloaded
+after ``LIST_TTL``: ``refresh_rankings`` usually runs in another process
+(``manage.py refresh_rankings``), and the generation it bumps only reaches
+web workers sharing its cache (Redis, not the local-memory default). A
+bump that does reach them reloads the lists right away.
+
+Used by ``/api/myths/trending/``, ``/api/myths/top/`` and
+``manage.py refresh_rankings``.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache import bump, get_generations
+from .models import Comment, Myth, MythRanking, Vote
+
+# (window, weight) pairs; an event counts once in every window it falls in.
+TRENDING_WINDOWS = (
+    (timedelta(days=1), 4.0),
+    (timedelta(days=7), 2.0),
+    (timedelta(days=30), 1.0),
+)
+COMMENT_WEIGHT = 2.0
+# Lists are reloaded this often, for votes changing all-time totals and for
+# refreshes in processes whose generation bump is not seen here.
+LIST_TTL = 60
+
+TRENDING = 'trending'
+TOP = 'top'
+
+
+def top_n():
+    return getattr(settings, 'MYTH_RANKING_TOP_N', 50)
+
+
+def _window_counts(model, since_by_window):
+    """
+    ``{(myth_id, category_id): [count per window]}`` for events in the
+    longest window.
+    """
+    oldest = min(since_by_window)
+    annotations = {
+        f'window_{index}': Count('pk', filter=Q(created_at__gte=since))
+        for index, since in enumerate(since_by_window)
+    }
+    rows = (
+        model.objects.filter(created_at__gte=oldest)
+        .order_by().values('myth_id', 'myth__category_id').annotate(**annotations)
+    )
+    return {
+        (row['myth_id'], row['myth__category_id']):
+            [row[f'window_{index}'] for index in range(len(since_by_window))]
+        for row in rows
+    }
+
+
+def compute_trending_scores(now=None):
+    """
+    Trending score of every myth with votes or comments in the windows, as
+    ``{(myth_id, category_id): score}``.
+    """
+    now = now or timezone.now()
+    since_by_window = [now - window for window, _ in TRENDING_WINDOWS]
+    weights = [weight for _, weight in TRENDING_WINDOWS]
+    votes = _window_counts(Vote, since_by_window)
+    comments = _window_counts(Comment, since_by_window)
+
+    scores = {}
+    for key in votes.keys() | comments.keys():
+        vote_counts = votes.get(key, [0] * len(weights))
+        comment_counts = comments.get(key, [0] * len(weights))
+        scores[key] = sum(
+            weight * (vote_count + COMMENT_WEIGHT * comment_count)
+            for weight, vote_count, comment_count in zip(weights, vote_counts, comment_counts)
+        )
+    return scores
+
+
+def refresh_rankings(now=None):
+    """
+    Rewrite ``MythRanking`` from the current scores and drop myths that fell
+    out of every window. Returns the number of ranked myths.
+    """
+    now = now or timezone.now()
+    rankings = [
+        MythRanking(myth_id=myth_id, category_id=category_id, score=score, refreshed_at=now)
+        for (myth_id, category_id), score in compute_trending_scores(now).items()
+    ]
+    with transaction.atomic():
+        MythRanking.objects.bulk_create(
+            rankings, batch_size=1000,
+            update_conflicts=True, unique_fields=['myth'],
+            update_fields=['category', 'score', 'refreshed_at'],
+        )
+        # Rows not rewritten above have no activity left in any window.
+        MythRanking.objects.filter(refreshed_at__lt=now).delete()
+    # Tells the processes sharing the cache to reload their in-memory lists.
+    bump(TRENDING)
+    return len(rankings)
+
+
+class LeaderboardLists:
+    """
+    Per-process cache of top-N myth id lists, keyed by leaderboard and
+    category (``None`` for all categories).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.lists = {}
+
+    def _load(self, kind, category_id):
+        if kind == TRENDING:
+            rows = MythRanking.objects.order_by('-score', '-myth_id')
+            if category_id is not None:
+                rows = rows.filter(category_id=category_id)
+            return list(rows.values_list('myth_id', flat=True)[:top_n()])
+        rows = Myth.objects.order_by('-total_votes', '-id')
+        if category_id is not None:
+            rows = rows.filter(category_id=category_id)
+        return list(rows.values_list('pk', flat=True)[:top_n()])
+
+    def get(self, kind, category_id=None):
+        generation = get_generations([TRENDING])[TRENDING]
+        key = (kind, category_id)
+        with self.lock:
+            if generation != self.generation:
+                self.generation, self.lists = generation, {}
+            cached = self.lists.get(key)
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[1]
+
+        ids = self._load(kind, category_id)
+        with self.lock:
+            self.lists[key] = (time.monotonic() + LIST_TTL, ids)
+        return ids
+
+    def clear(self):
+        with self.lock:
+            self.generation, self.lists = None, {}
+
+
+leaderboards = LeaderboardLists()
+
+
+def leaderboard(queryset, kind, category_id=None, limit=None):
+    """
+    The myths of a leaderboard from ``queryset``, in leaderboard order.
+    ``queryset`` may also be a ``.values()`` query selecting ``pk``.
+    """
+    ids = leaderboards.get(kind, category_id)[:limit or top_n()]
+    myths = {
+        myth['pk'] if isinstance(myth, dict) else myth.pk: myth
+        for myth in queryset.filter(pk__in=ids)
+    }
+    return [myths[pk] for pk in ids if pk in myths]
@@ -0,0 +1,262 @@
+"""
+Full-text search index for myths.
+
+Each myth is indexed together with its approved evidence and comments so a
+single lookup can answer a search query. The storage depends on the
+database vendor:
+
+* PostgreSQL keeps a ``tsvector`` document per myth in ``myths_myth_search``
+  behind a GIN index and ranks with ``ts_rank``.
+* SQLite keeps an FTS5 virtual table ``myths_myth_fts`` (rowid = myth id)
+  and ranks with ``bm25``.
+* Any other database falls back to ``icontains`` matching without ranking.
+
+The index is kept up to date by the signal handlers in ``myths.signals`` and
+can be rebuilt from scratch with ``manage.py rebuild_search_index``.
+"""
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+POSTGRES_TABLE = 'myths_myth_search'
+SQLITE_TABLE = 'myths_myth_fts'
+
+# Search terms are reduced to plain word tokens, which keeps user input out of
+# the query syntax of either engine.
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_TOKENS = 8
+
+
+def tokenize(query):
+    """Split a search query into lower-cased word tokens."""
+    return _TOKEN_RE.findall((query or '').lower())[:MAX_QUERY_TOKENS]
+
+
+class BaseSearchBackend:
+    """Interface shared by the vendor specific search backends."""
+    supports_ranking = False
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index_myths(self, myth_ids):
+        """(Re)build the index entries for the given myths."""
+
+    def remove_myths(self, myth_ids):
+        """Drop the index entries for the given myths."""
+
+    def rebuild(self):
+        """Rebuild the whole index and return the number of indexed myths."""
+        return 0
+
+    def search(self, queryset, query):
+        """
+        Restrict ``queryset`` to myths matching ``query`` and annotate each row
+        with a ``search_rank`` (higher is more relevant).
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        condition = Q()
+        for token in tokens:
+            condition &= (
+                Q(title__icontains=token) |
+                Q(description__icontains=token) |
+                Q(origin__icontains=token)
+            )
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """``tsvector``/GIN backed index with weighted ranking."""
+    supports_ranking = True
+
+    # Title weighs more than the description, which weighs more than the
+    # origin; evidence and comment text only contributes the lowest weight.
+    DOCUMENT_SQL = """
+        SELECT m.id,
+            setweight(to_tsvector(%(config)s, coalesce(m.title, '')), 'A') ||
+            setweight(to_tsvector(%(config)s, coalesce(m.description, '')), 'B') ||
+            setweight(to_tsvector(%(config)s, coalesce(m.origin, '')), 'C') ||
+            setweight(to_tsvector(%(config)s, coalesce((
+                SELECT string_agg(e.title || ' ' || e.description, ' ')
+                FROM myths_evidence e
+                WHERE e.myth_id = m.id AND e.is_approved
+            ), '')), 'D') ||
+            setweight(to_tsvector(%(config)s, coalesce((
+                SELECT string_agg(c.content, ' ')
+                FROM myths_comment c
+                WHERE c.myth_id = m.id AND c.is_approved
+            ), '')), 'D')
+        FROM myths_myth m
+    """
+
+    @property
+    def config(self):
+        # Stemming configurations such as 'english' reduce document words
+        # ('fertilizers' -> 'fertil') and would then miss prefix queries
+        # ('fertiliz:*'), hence the unstemmed default.
+        return getattr(settings, 'MYTH_SEARCH_CONFIG', 'simple')
+
+    def _document_sql(self):
+        return self.DOCUMENT_SQL.replace('%(config)s', '%s::regconfig')
+
+    def _document_params(self):
+        return [self.config] * 5
+
+    def index_myths(self, myth_ids):
+        myth_ids = list(myth_ids)
+        if not myth_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {POSTGRES_TABLE} (myth_id, document)
+                {self._document_sql()}
+                WHERE m.id = ANY(%s)
+                ON CONFLICT (myth_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                self._document_params() + [myth_ids],
+            )
+
+    def remove_myths(self, myth_ids):
+        myth_ids = list(myth_ids)
+        if not myth_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {POSTGRES_TABLE} WHERE myth_id = ANY(%s)', [myth_ids]
+            )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (myth_id, document) {self._document_sql()}',
+                self._document_params(),
+            )
+            return cursor.rowcount
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        # Every token must match; the ``:*`` suffix turns each token into a
+        # prefix match so partially typed words still hit.
+        ts_query = ' & '.join(f'{token}:*' for token in tokens)
+        params = [self.config, ts_query]
+        matches = RawSQL(
+            f'SELECT myth_id FROM {POSTGRES_TABLE} '
+            f'WHERE document @@ to_tsquery(%s::regconfig, %s)',
+            params,
+        )
+        # ts_rank() returns a float4, which a keyset cursor carries as the
+        # nearest float8 and then no longer equals; a float8 round-trips.
+        rank = RawSQL(
+            f'SELECT ts_rank(document, to_tsquery(%s::regconfig, %s))::float8 '
+            f'FROM {POSTGRES_TABLE} WHERE myth_id = myths_myth.id',
+            params,
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 backed index ranked with ``bm25``."""
+    supports_ranking = True
+
+    # Column weights for bm25(), in table column order.
+    BM25_WEIGHTS = (10.0, 4.0, 2.0, 1.0, 1.0)
+
+    DOCUMENT_SQL = """
+        SELECT m.id, m.title, m.description, m.origin,
+            coalesce((
+                SELECT group_concat(e.title || ' ' || e.description, ' ')
+                FROM myths_evidence e
+                WHERE e.myth_id = m.id AND e.is_approved
+            ), ''),
+            coalesce((
+                SELECT group_concat(c.content, ' ')
+                FROM myths_comment c
+                WHERE c.myth_id = m.id AND c.is_approved
+            ), '')
+        FROM myths_myth m
+    """
+
+    INSERT_SQL = (
+        f'INSERT INTO {SQLITE_TABLE} '
+        f'(rowid, title, description, origin, evidence, comments) '
+    )
+
+    # Keeps the number of bound parameters per statement well below SQLite's
+    # variable limit when whole imports are indexed at once.
+    BATCH_SIZE = 500
+
+    def _batches(self, myth_ids):
+        myth_ids = list(myth_ids)
+        for start in range(0, len(myth_ids), self.BATCH_SIZE):
+            batch = myth_ids[start:start + self.BATCH_SIZE]
+            yield batch, ', '.join(['%s'] * len(batch))
+
+    def index_myths(self, myth_ids):
+        with self.connection.cursor() as cursor:
+            for batch, placeholders in self._batches(myth_ids):
+                cursor.execute(
+                    f'DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})', batch
+                )
+                cursor.execute(
+                    f'{self.INSERT_SQL} {self.DOCUMENT_SQL} WHERE m.id IN ({placeholders})',
+                    batch,
+                )
+
+    def remove_myths(self, myth_ids):
+        with self.connection.cursor() as cursor:
+            for batch, placeholders in self._batches(myth_ids):
+                cursor.execute(
+                    f'DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})', batch
+                )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+            cursor.execute(f'{self.INSERT_SQL} {self.DOCUMENT_SQL}')
+            count = cursor.rowcount
+            cursor.execute(f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}) VALUES ('optimize')")
+            return count
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        # Quoted tokens followed by ``*`` are prefix queries, implicitly AND-ed.
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        weights = ', '.join(str(weight) for weight in self.BM25_WEIGHTS)
+        matches = RawSQL(
+            f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s',
+            [match],
+        )
+        # bm25() is negative with better matches being smaller, so flip it.
+        rank = RawSQL(
+            f'SELECT -bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE} '
+            f'WHERE {SQLITE_TABLE} MATCH %s AND rowid = myths_myth.id',
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend(using=None):
+    """Return the search backend for the database alias ``using``."""
+    conn = connections[using or DEFAULT_DB_ALIAS]
+    return BACKENDS.get(conn.vendor, BaseSearchBackend)(conn)
@@ -3,7 +3,10 @@ from .models import (
     Category, Myth, Evidence, Comment, 
     Vote, ResearchRequest, Notification
 )
+from core.fast_serializers import ValuesSerializer
+from core.fieldsets import NestedPageField
 from core.serializers import UserSerializer
+from .counters import EVIDENCE_TYPE_COUNT_FIELDS
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,6 +39,25 @@ class VoteSerializer(serializers.ModelSerializer):
         read_only_fields = ('user', 'created_at')
 
 
+class IngestOperationSerializer(serializers.Serializer):
+    """One operation of a ``/api/myths/batch/`` request (see myths.ingest)."""
+    TYPE_VOTE = 'vote'
+    TYPE_COMMENT = 'comment'
+
+    key = serializers.CharField(max_length=64)
+    type = serializers.ChoiceField(choices=[TYPE_VOTE, TYPE_COMMENT])
+    myth = serializers.IntegerField()
+    # The user's vote after the operation; null removes it.
+    vote_type = serializers.ChoiceField(choices=Vote.VoteType.choices, allow_null=True, required=False)
+    content = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        required = 'vote_type' if attrs['type'] == self.TYPE_VOTE else 'content'
+        if required not in attrs:
+            raise serializers.ValidationError({required: 'This field is required.'})
+        return attrs
+
+
 class ResearchRequestSerializer(serializers.ModelSerializer):
     requested_by = UserSerializer(read_only=True)
     assigned_to = UserSerializer(read_only=True)
@@ -53,7 +75,33 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ('is_read', 'created_at')
 
 
-class MythSerializer(serializers.ModelSerializer):
+class PendingVotesMixin:
+    """
+    Adds vote deltas that are still waiting in counter shards (see
+    ``myths.votes.with_pending_votes``) to the serialized vote counters.
+    """
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        return add_pending_votes(
+            data,
+            getattr(instance, 'pending_upvotes', 0),
+            getattr(instance, 'pending_downvotes', 0),
+        )
+
+
+def add_pending_votes(data, pending_upvotes, pending_downvotes):
+    # Counters pruned by ?fields= (see core.fieldsets) are left out.
+    for key, delta in (
+        ('upvotes', pending_upvotes),
+        ('downvotes', pending_downvotes),
+        ('total_votes', pending_upvotes + pending_downvotes),
+    ):
+        if delta and key in data:
+            data[key] += delta
+    return data
+
+
+class MythSerializer(PendingVotesMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), 
@@ -62,10 +110,10 @@ class MythSerializer(serializers.ModelSerializer):
         required=False
     )
     submitted_by = UserSerializer(read_only=True)
-    evidence = EvidenceSerializer(many=True, read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
-    votes = VoteSerializer(many=True, read_only=True)
-    research_requests = ResearchRequestSerializer(many=True, read_only=True)
+    evidence = NestedPageField(EvidenceSerializer(), 'myth-evidence', source='evidences')
+    comments = NestedPageField(CommentSerializer(), 'myth-comments')
+    votes = NestedPageField(VoteSerializer(), 'myth-votes')
+    research_requests = NestedPageField(ResearchRequestSerializer(), 'myth-research-requests')
     
     class Meta:
         model = Myth
@@ -87,14 +135,43 @@ class MythSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class MythListSerializer(serializers.ModelSerializer):
+class MythListSerializer(PendingVotesMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     submitted_by = UserSerializer()
+    evidence_by_type = serializers.SerializerMethodField()
+    method_field_columns = {'evidence_by_type': tuple(EVIDENCE_TYPE_COUNT_FIELDS.values())}
     
     class Meta:
         model = Myth
         fields = [
             'id', 'title', 'slug', 'description', 'origin', 'category',
             'submitted_by', 'status', 'is_featured', 'total_votes', 
-            'upvotes', 'downvotes', 'created_at'
+            'upvotes', 'downvotes', 'created_at', 'evidence_count',
+            'evidence_by_type', 'comment_count', 'open_research_count'
         ]
+
+    def get_evidence_by_type(self, obj) -> dict:
+        """Approved evidence per evidence type, from the myth's counters."""
+        return {
+            evidence_type: getattr(obj, field)
+            for evidence_type, field in EVIDENCE_TYPE_COUNT_FIELDS.items()
+        }
+
+
+class MythListValuesSerializer(ValuesSerializer):
+    """``MythListSerializer`` output from ``.values()`` rows (see core.fast_serializers)."""
+    serializer_class = MythListSerializer
+    optional_columns = ('pending_upvotes', 'pending_downvotes')
+
+    def get_evidence_by_type(self, values):
+        return {
+            evidence_type: values[field]
+            for evidence_type, field in EVIDENCE_TYPE_COUNT_FIELDS.items()
+        }
+
+    def to_representation(self, values, shared):
+        return add_pending_votes(
+            super().to_representation(values, shared),
+            values.get('pending_upvotes', 0),
+            values.get('pending_downvotes', 0),
+        )
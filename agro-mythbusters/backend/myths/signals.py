@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import GLOBAL_GENERATION, bump_on_commit, invalidate_myths
+from .counters import refresh_myth_counters
+from .models import Category, Comment, Evidence, Myth, Notification, ResearchRequest
+from .notifications import adjust_unread, enqueue_fanout
+from .search import get_search_backend
+from .sync import record_changes
+
+
+@receiver(post_save, sender=Myth)
+def index_myth(sender, instance, using, raw=False, **kwargs):
+    """Keep the search index in step with the myth's own text."""
+    if raw:
+        return
+    get_search_backend(using).index_myths([instance.pk])
+
+
+@receiver(post_delete, sender=Myth)
+def unindex_myth(sender, instance, using, **kwargs):
+    get_search_backend(using).remove_myths([instance.pk])
+
+
+@receiver(post_save, sender=Evidence)
+@receiver(post_delete, sender=Evidence)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def reindex_related_myth(sender, instance, using, raw=False, **kwargs):
+    """Evidence and comment text is part of the myth's search document."""
+    if raw or not instance.myth_id:
+        return
+    get_search_backend(using).index_myths([instance.myth_id])
+
+
+@receiver(post_save, sender=Myth)
+@receiver(post_delete, sender=Myth)
+def invalidate_cached_myth(sender, instance, using, **kwargs):
+    invalidate_myths([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Evidence)
+@receiver(post_delete, sender=Evidence)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=ResearchRequest)
+@receiver(post_delete, sender=ResearchRequest)
+def invalidate_cached_related_myth(sender, instance, using, **kwargs):
+    myth_ids = {instance.myth_id, getattr(instance, '_counted_myth_id', None)} - {None}
+    if not myth_ids:
+        return
+    # Lists show their counters (see myths.counters), and evidence and
+    # comment text also decides which myths a list search returns.
+    invalidate_myths(myth_ids, using=using)
+
+
+@receiver(pre_save, sender=Evidence)
+@receiver(pre_save, sender=Comment)
+@receiver(pre_save, sender=ResearchRequest)
+def remember_counted_myth(sender, instance, raw=False, **kwargs):
+    """Rows moved to another myth must be uncounted on the old one."""
+    if raw or instance.pk is None:
+        return
+    instance._counted_myth_id = (
+        sender._base_manager.filter(pk=instance.pk).values_list('myth_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Evidence)
+@receiver(post_delete, sender=Evidence)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=ResearchRequest)
+@receiver(post_delete, sender=ResearchRequest)
+def refresh_related_myth_counters(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    myth_ids = {instance.myth_id, getattr(instance, '_counted_myth_id', None)} - {None}
+    if myth_ids:
+        refresh_myth_counters(myth_ids, model=sender, using=using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cached_category(sender, instance, using, **kwargs):
+    # Categories are nested in every myth response.
+    bump_on_commit(GLOBAL_GENERATION, using=using)
+
+
+@receiver(post_save, sender=Evidence)
+def notify_evidence_added(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    enqueue_fanout(
+        instance.myth,
+        Notification.NotificationType.EVIDENCE_ADDED,
+        title=f'New evidence: {instance.title}'[:255],
+        message=f'New evidence was added to "{instance.myth.title}".',
+        exclude_user=instance.submitted_by,
+    )
+
+
+@receiver(post_save, sender=Notification)
+def count_created_notification(sender, instance, created, raw=False, **kwargs):
+    # Bulk-created notifications (the fan-out) adjust the counters themselves.
+    if created and not raw and not instance.is_read:
+        adjust_unread([instance.user_id], 1)
+
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread([instance.user_id], -1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Myth)
+@receiver(post_save, sender=Evidence)
+@receiver(post_save, sender=Comment)
+def record_sync_change(sender, instance, using, **kwargs):
+    record_changes(sender, [instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Myth)
+@receiver(post_delete, sender=Evidence)
+@receiver(post_delete, sender=Comment)
+def record_sync_tombstone(sender, instance, using, **kwargs):
+    record_changes(sender, [instance.pk], deleted=True, using=using)
+
+
+@receiver(pre_delete, sender=Category)
+def record_uncategorized_myths(sender, instance, using, **kwargs):
+    # SET_NULL is a queryset update, which sends no signals.
+    record_changes(Myth, Myth.objects.using(using).filter(category=instance)
+                   .values_list('pk', flat=True), using=using)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def record_orphaned_submissions(sender, instance, using, **kwargs):
+    # Myths and evidence keep their rows with submitted_by set to NULL.
+    for model in (Myth, Evidence):
+        record_changes(model, model.objects.using(using).filter(submitted_by=instance)
+                       .values_list('pk', flat=True), using=using)
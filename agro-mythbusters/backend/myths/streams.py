@@ -0,0 +1,172 @@
+"""
+Server-sent event stream of a user's notifications.
+
+``GET /api/notifications/stream/`` keeps the connection open and pushes
+
+* ``event: notification`` - every notification created after the stream
+  started (or after the ``Last-Event-ID`` the browser sends when it
+  reconnects), serialized like ``/api/notifications/``;
+* ``event: unread`` - the unread count, initially and whenever it changes,
+
+so clients no longer poll the notification list. The view is async and
+only served by ``config.asgi`` (the deployment runs gunicorn with uvicorn
+workers), where an open stream costs no worker thread between polls. Under
+WSGI it would hold a sync worker for the whole stream, so it answers 501
+there. Each tick reads the user's counter row and seeks the notification
+index past the last id sent; nothing is counted.
+
+Streams end after ``NOTIFICATION_STREAM_TIMEOUT`` seconds - Django 4.2 does
+not notice disconnected ASGI clients while streaming - and ``EventSource``
+reconnects on its own, resuming from the last event id.
+
+``EventSource`` cannot send an ``Authorization`` header, and a token in the
+query string ends up in proxy access logs, so clients first ``POST
+/api/notifications/stream-ticket/`` and open the stream with the
+``?ticket=`` it returns: a signed ticket for the user that only opens a
+stream and expires after ``NOTIFICATION_STREAM_TICKET_MAX_AGE`` seconds.
+Until then it is accepted again, so the browser's own reconnects (which
+repeat the URL) go through on any worker. Once it has expired the stream
+answers 401 and ``EventSource`` gives up; the client then fetches a new
+ticket and opens a new ``EventSource`` with ``?ticket=<new>&last_event_id=``
+set to the last id it received. A session login works as well.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import Notification
+from .notifications import get_unread_count
+from .serializers import NotificationSerializer
+
+# Notifications sent per tick; the rest follow on the next ones.
+STREAM_BATCH_SIZE = 50
+HEARTBEAT_INTERVAL = 15
+RETRY_MS = 3000
+TICKET_SALT = 'myths.streams.ticket'
+
+
+def poll_interval():
+    return getattr(settings, 'NOTIFICATION_STREAM_POLL_INTERVAL', 2.0)
+
+
+def stream_timeout():
+    return getattr(settings, 'NOTIFICATION_STREAM_TIMEOUT', 300)
+
+
+def ticket_max_age():
+    return getattr(settings, 'NOTIFICATION_STREAM_TICKET_MAX_AGE', 3600)
+
+
+def issue_ticket(user):
+    """A stream ticket for ``user``; see the module docstring."""
+    return signing.dumps({'user': user.pk}, salt=TICKET_SALT)
+
+
+def redeem_ticket(ticket):
+    """The active user of an unexpired ``ticket``, or None."""
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT, max_age=ticket_max_age())
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=payload['user'], is_active=True).first()
+
+
+def _authenticate(request):
+    ticket = request.GET.get('ticket')
+    if ticket:
+        return redeem_ticket(ticket)
+    authentication = JWTAuthentication()
+    try:
+        result = authentication.authenticate(request)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    if result is not None:
+        return result[0]
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+def _last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _poll(user_id, last_id):
+    """``(notifications, last_id, unread)`` since ``last_id``."""
+    notifications = Notification.objects.filter(user_id=user_id)
+    if last_id is None:
+        # A new stream starts from now rather than replaying the history.
+        last_id = notifications.order_by('-id').values_list('pk', flat=True).first() or 0
+        page = []
+    else:
+        page = list(notifications.filter(pk__gt=last_id).order_by('id')[:STREAM_BATCH_SIZE])
+    data = NotificationSerializer(page, many=True).data
+    if page:
+        last_id = page[-1].pk
+    return data, last_id, get_unread_count(user_id)
+
+
+def _event(name, data, event_id=None):
+    lines = [f'event: {name}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def notification_events(user_id, last_id=None):
+    """Yield the stream's events until ``stream_timeout`` has passed."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + stream_timeout()
+    yield f'retry: {RETRY_MS}\n\n'
+    unread = None
+    quiet_since = loop.time()
+    while True:
+        notifications, last_id, count = await sync_to_async(_poll)(user_id, last_id)
+        for notification in notifications:
+            yield _event('notification', notification, event_id=notification['id'])
+        changed = bool(notifications) or count != unread
+        if count != unread:
+            unread = count
+            yield _event('unread', {'unread': count})
+        if changed:
+            quiet_since = loop.time()
+        elif loop.time() - quiet_since >= HEARTBEAT_INTERVAL:
+            # Keeps proxies from closing an idle connection.
+            quiet_since = loop.time()
+            yield ': keep-alive\n\n'
+        if loop.time() >= deadline:
+            return
+        await asyncio.sleep(poll_interval())
+
+
+async def notification_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'The notification stream is only served over ASGI.'}, status=501
+        )
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+    response = StreamingHttpResponse(
+        notification_events(user.pk, _last_event_id(request)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Disables response buffering in nginx.
+    response['X-Accel-Buffering'] = 'no'
+    return response
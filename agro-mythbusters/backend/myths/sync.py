@@ -0,0 +1,205 @@
+"""
+Delta sync for offline clients.
+
+Every create, update and delete of a category, myth, evidence or comment
+replaces that row's ``SyncChange`` entry (``record_changes``, called by
+``myths.signals`` and by the bulk writers that bypass signals), so the
+change log holds one entry per row, ordered by when the row last changed,
+and an entry's id is a position in that order. A sync token is the position
+a client has reached; ``sync_page`` returns the entries after it with the
+current columns of changed rows and a tombstone for deleted ones, reading
+a primary key range of the log and one query per kind of row.
+
+Without a token every row is returned, so a new client builds its copy
+through the same endpoint. A row may reference one that only arrives
+later in the same sync.
+
+Ids are allocated when rows are written, not when their transactions
+commit, so a lower id can commit after a higher one has been served, and a
+client whose token is past it would skip it. On PostgreSQL ``sync_page``
+therefore only serves entries written before the oldest transaction still
+in progress that has written anything started (``oldest_write_started``):
+every entry such a transaction may still commit is newer than that. As
+the entries are stamped by the application's clock and transactions by
+the database's, ``SYNC_SETTLE_SECONDS`` is subtracted from both bounds to
+absorb the skew between them. A long writer holds back the whole log until
+it ends. SQLite runs one write transaction at a time, so ids commit in
+order there and only the settle delay applies.
+
+Stamps need not follow ids (app servers' clocks differ, and a stamp is
+taken before the insert), so a page is always a prefix of the log: it
+stops before the first entry after the token that is not settled yet,
+even if higher ids are.
+
+Tombstones are deleted after ``SYNC_TOMBSTONE_RETENTION_DAYS`` (``manage.py
+apply_retention``). A token issued before that may have missed deletes and
+is refused with ``SyncTokenExpired``; the client syncs again without one.
+
+Only the vote counters of ``Myth`` are synced, not the evidence, comment and
+research counters (clients count the synced rows). In sharded counter mode
+votes reach the myth, and the log, when the shards are flushed.
+"""
+import base64
+import binascii
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Category, Comment, Evidence, Myth, SyncChange
+
+RECORD_BATCH_SIZE = 1000
+
+# Columns sent for each synced model.
+SYNCED_FIELDS = {
+    Category: ('id', 'name', 'description', 'icon', 'created_at', 'updated_at'),
+    Myth: (
+        'id', 'title', 'slug', 'description', 'origin', 'category_id', 'submitted_by_id',
+        'status', 'is_featured', 'upvotes', 'downvotes', 'total_votes', 'created_at', 'updated_at',
+    ),
+    Evidence: (
+        'id', 'myth_id', 'title', 'description', 'evidence_type', 'source_url',
+        'source_citation', 'submitted_by_id', 'is_approved', 'created_at', 'updated_at',
+    ),
+    Comment: ('id', 'myth_id', 'user_id', 'content', 'is_approved', 'created_at', 'updated_at'),
+}
+MODELS_BY_KIND = {model._meta.model_name: model for model in SYNCED_FIELDS}
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+class SyncTokenExpired(InvalidSyncToken):
+    pass
+
+
+def page_size():
+    return getattr(settings, 'SYNC_PAGE_SIZE', 500)
+
+
+def settle_delay():
+    return timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+def oldest_write_started(using=None):
+    """
+    When the oldest transaction in progress that has written started, on
+    PostgreSQL; None when there is none, or on other databases.
+    """
+    connection = connections[using or router.db_for_read(SyncChange)]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        # backend_xid is only assigned once a transaction writes.
+        cursor.execute(
+            'SELECT min(xact_start) FROM pg_stat_activity '
+            'WHERE backend_xid IS NOT NULL AND datname = current_database() '
+            'AND pid <> pg_backend_pid()'
+        )
+        return cursor.fetchone()[0]
+
+
+def record_changes(model, object_ids, deleted=False, using=None):
+    """Move the entries of ``model`` rows ``object_ids`` to the end of the log."""
+    kind = model._meta.model_name
+    object_ids = list(dict.fromkeys(object_ids))
+    changes = SyncChange.objects.using(using)
+    for start in range(0, len(object_ids), RECORD_BATCH_SIZE):
+        batch = object_ids[start:start + RECORD_BATCH_SIZE]
+        changes.filter(kind=kind, object_id__in=batch).delete()
+        # A concurrent change of the same row may insert first; its entry
+        # is just as recent, and sync_page checks whether the row exists.
+        changes.bulk_create(
+            [SyncChange(kind=kind, object_id=pk, deleted=deleted) for pk in batch],
+            ignore_conflicts=True,
+        )
+
+
+def backfill_changes(using=None):
+    """Add entries for rows that have none; returns how many were added."""
+    added = 0
+    for model in SYNCED_FIELDS:
+        logged = SyncChange.objects.using(using).filter(kind=model._meta.model_name)
+        missing = list(
+            model.objects.using(using).exclude(pk__in=logged.values('object_id'))
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        record_changes(model, missing, using=using)
+        added += len(missing)
+    return added
+
+
+def encode_token(change_id, issued_at):
+    payload = json.dumps({'c': change_id, 't': int(issued_at.timestamp())}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_token(token):
+    """``(change id, issued at)`` of a token; raises ``InvalidSyncToken``."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return int(payload['c']), datetime.fromtimestamp(int(payload['t']), tz=dt_timezone.utc)
+    except (binascii.Error, KeyError, OSError, OverflowError, TypeError, ValueError):
+        raise InvalidSyncToken('Invalid sync token.')
+
+
+def _load_rows(entries):
+    """``{(kind, id): columns}`` of the existing rows of ``entries``."""
+    ids = defaultdict(list)
+    for _, kind, object_id, deleted in entries:
+        if not deleted and kind in MODELS_BY_KIND:
+            ids[kind].append(object_id)
+    rows = {}
+    for kind, object_ids in ids.items():
+        model = MODELS_BY_KIND[kind]
+        for values in model.objects.filter(pk__in=object_ids).values(*SYNCED_FIELDS[model]):
+            rows[kind, values.pop('id')] = values
+    return rows
+
+
+def sync_page(token=None, size=None, now=None):
+    """
+    The changes after ``token`` (every row without one), oldest first and
+    at most ``size`` of them, as ``(changes, token, more)``. A change is
+    ``{"type", "id", "deleted": false, "data": {...}}`` or a tombstone
+    ``{"type", "id", "deleted": true}``; ``token`` is where the next
+    request continues and ``more`` whether changes are left after it.
+    """
+    now = now or timezone.now()
+    after = 0
+    if token:
+        after, issued_at = decode_token(token)
+        if issued_at < now - tombstone_retention():
+            raise SyncTokenExpired('Sync token expired; sync again without one.')
+    size = size or page_size()
+    settled = now - settle_delay()
+    writing_since = oldest_write_started()
+    if writing_since is not None:
+        settled = min(settled, writing_since - settle_delay())
+    log = SyncChange.objects.filter(pk__gt=after)
+    unsettled = log.filter(created_at__gt=settled).aggregate(first=Min('pk'))['first']
+    if unsettled is not None:
+        log = log.filter(pk__lt=unsettled)
+    entries = list(
+        log.order_by('pk').values_list('pk', 'kind', 'object_id', 'deleted')[:size + 1]
+    )
+    more = len(entries) > size
+    entries = entries[:size]
+    rows = _load_rows(entries)
+    changes = []
+    for _, kind, object_id, _ in entries:
+        data = rows.get((kind, object_id))
+        if data is None:
+            changes.append({'type': kind, 'id': object_id, 'deleted': True})
+        else:
+            changes.append({'type': kind, 'id': object_id, 'deleted': False, 'data': data})
+    return changes, encode_token(entries[-1][0] if entries else after, now), more
@@ -0,0 +1,240 @@
+"""
+Deterministic synthetic data for load tests and benchmarks.
+
+Rows are generated lazily and inserted with ``bulk_create`` in batches, so
+memory stays flat even for millions of rows; only the primary keys of users
+and myths are kept around. Generation is driven by a seed: the same seed and
+scale on an empty database produce the same data.
+
+Votes are planned per myth with a RNG derived from the seed and the myth's
+index, which lets the myth be inserted with its final vote counters and the
+matching ``Vote`` rows be regenerated later from the same plan.
+
+Primary keys of inserted users and myths are taken from ``bulk_create``,
+which returns them on PostgreSQL and SQLite 3.35+.
+
+Used by ``manage.py seed_data --scale``.
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.text import slugify
+
+from .cache import GLOBAL_GENERATION, bump
+from .counters import refresh_myth_counters
+from .models import Category, Comment, Evidence, Myth, Notification, Vote
+from .rankings import refresh_rankings
+from .search import get_search_backend
+from .sync import backfill_changes
+
+User = get_user_model()
+
+# Row counts generated per unit of ``--scale``; scale 100 yields 100k myths,
+# 1M votes and 500k comments.
+SCALE_PROFILE = {
+    'users': 100,
+    'myths': 1000,
+    'evidence': 2000,
+    'comments': 5000,
+    'votes': 10000,
+    'notifications': 2000,
+}
+
+SYNTHETIC_EMAIL_PREFIX = 'synthetic-'
+SYNTHETIC_SLUG_PREFIX = 'synthetic-'
+
+WORDS = (
+    'soil crop yield fertilizer organic compost rotation pest water irrigation '
+    'maize cassava livestock manure seed drought tilling mulch nitrogen harvest '
+    'sorghum beans poultry grazing terraces weeds rainfall pesticide hybrid'
+).split()
+
+
+def counts_for_scale(scale, **overrides):
+    """Row counts for ``scale``; explicit ``overrides`` win when not None."""
+    counts = {name: int(round(base * scale)) for name, base in SCALE_PROFILE.items()}
+    if scale > 0:
+        counts['users'] = max(counts['users'], 1)
+        counts['myths'] = max(counts['myths'], 1)
+    counts.update({name: value for name, value in overrides.items() if value is not None})
+    return counts
+
+
+class SyntheticDataGenerator:
+    """Generate and insert a synthetic dataset of the given row ``counts``."""
+
+    def __init__(self, counts, seed=0, batch_size=5000, progress=None):
+        self.counts = counts
+        self.seed = seed
+        self.batch_size = batch_size
+        self.progress = progress or (lambda label, done, total: None)
+        self.rng = random.Random(seed)
+        self.user_ids = []
+        self.myth_ids = []
+        self.vote_total = 0
+
+    def text(self, words):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words))
+
+    def _insert(self, label, model, rows, total, keep_pks=False):
+        """
+        Insert ``rows`` in batches, reporting progress. Returns the inserted
+        primary keys when ``keep_pks`` is set.
+        """
+        pks, batch, done = [], [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                done += self._insert_batch(model, batch, pks if keep_pks else None)
+                batch = []
+                self.progress(label, done, total)
+        if batch or not done:
+            done += self._insert_batch(model, batch, pks if keep_pks else None)
+            self.progress(label, done, total)
+        return pks
+
+    def _insert_batch(self, model, batch, pks):
+        with transaction.atomic():
+            created = model.objects.bulk_create(batch)
+        if pks is not None:
+            pks.extend(obj.pk for obj in created)
+        return len(created)
+
+    def _offset(self, model, **lookup):
+        # Appending to an earlier synthetic run continues its numbering so
+        # emails and slugs stay unique.
+        return model.objects.filter(**lookup).count()
+
+    def vote_plan(self, myth_index):
+        """The ``(user index, vote type)`` pairs voted on a myth."""
+        rng = random.Random(f'{self.seed}:votes:{myth_index}')
+        average = self.counts['votes'] / max(self.counts['myths'], 1)
+        count = min(rng.randint(0, int(2 * average)), len(self.user_ids))
+        return [
+            (user_index, rng.choice(Vote.VoteType.values))
+            for user_index in rng.sample(range(len(self.user_ids)), count)
+        ]
+
+    def users(self):
+        offset = self._offset(User, email__startswith=SYNTHETIC_EMAIL_PREFIX)
+        password = make_password(None)
+        total = self.counts['users']
+        rows = (
+            User(
+                email=f'{SYNTHETIC_EMAIL_PREFIX}{offset + i}@example.com',
+                first_name=self.rng.choice(WORDS).title(),
+                last_name=f'Farmer {offset + i}',
+                password=password,
+                is_farmer=self.rng.random() < 0.8,
+                is_researcher=self.rng.random() < 0.05,
+            )
+            for i in range(total)
+        )
+        self.user_ids = self._insert('users', User, rows, total, keep_pks=True)
+
+    def myths(self):
+        offset = self._offset(Myth, slug__startswith=SYNTHETIC_SLUG_PREFIX)
+        category_ids = list(Category.objects.values_list('pk', flat=True)) or [None]
+        total = self.counts['myths']
+
+        def rows():
+            for i in range(total):
+                title = self.text(5).capitalize()
+                votes = self.vote_plan(i)
+                self.vote_total += len(votes)
+                upvotes = sum(1 for _, vote_type in votes if vote_type == Vote.VoteType.UPVOTE)
+                yield Myth(
+                    title=title,
+                    # The running index makes the slug unique without the
+                    # per-row lookups Myth.save() would do.
+                    slug=f'{SYNTHETIC_SLUG_PREFIX}{offset + i}-{slugify(title)}',
+                    description=self.text(60),
+                    origin=self.text(3),
+                    category_id=self.rng.choice(category_ids),
+                    submitted_by_id=self.rng.choice(self.user_ids),
+                    status=self.rng.choice(Myth.Status.values),
+                    is_featured=self.rng.random() < 0.01,
+                    upvotes=upvotes,
+                    downvotes=len(votes) - upvotes,
+                    total_votes=len(votes),
+                )
+
+        self.myth_ids = self._insert('myths', Myth, rows(), total, keep_pks=True)
+
+    def votes(self):
+        rows = (
+            Vote(myth_id=myth_id, user_id=self.user_ids[user_index], vote_type=vote_type)
+            for index, myth_id in enumerate(self.myth_ids)
+            for user_index, vote_type in self.vote_plan(index)
+        )
+        self._insert('votes', Vote, rows, self.vote_total)
+
+    def evidence(self):
+        total = self.counts['evidence']
+        rows = (
+            Evidence(
+                myth_id=self.rng.choice(self.myth_ids),
+                title=self.text(5).capitalize(),
+                description=self.text(40),
+                evidence_type=self.rng.choice(Evidence.EvidenceType.values),
+                source_citation=self.text(6),
+                submitted_by_id=self.rng.choice(self.user_ids),
+                is_approved=self.rng.random() < 0.7,
+            )
+            for _ in range(total)
+        )
+        self._insert('evidence', Evidence, rows, total)
+
+    def comments(self):
+        total = self.counts['comments']
+        rows = (
+            Comment(
+                myth_id=self.rng.choice(self.myth_ids),
+                user_id=self.rng.choice(self.user_ids),
+                content=self.text(20),
+                is_approved=self.rng.random() < 0.95,
+            )
+            for _ in range(total)
+        )
+        self._insert('comments', Comment, rows, total)
+
+    def notifications(self):
+        total = self.counts['notifications']
+        rows = (
+            Notification(
+                user_id=self.rng.choice(self.user_ids),
+                related_myth_id=self.rng.choice(self.myth_ids),
+                notification_type=self.rng.choice(Notification.NotificationType.values),
+                title=self.text(4).capitalize(),
+                message=self.text(15),
+                is_read=self.rng.random() < 0.5,
+            )
+            for _ in range(total)
+        )
+        self._insert('notifications', Notification, rows, total)
+
+    def generate(self):
+        """
+        Insert the whole dataset and refresh the search index, the myth
+        counters, the trending rankings and the response cache.
+        """
+        self.users()
+        if not self.user_ids:
+            return
+        self.myths()
+        if not self.myth_ids:
+            return
+        self.votes()
+        self.evidence()
+        self.comments()
+        self.notifications()
+        # bulk_create bypasses the signals that maintain the index, the myth
+        # counters and the sync log, and invalidate cached responses.
+        get_search_backend().rebuild()
+        backfill_changes()
+        for start in range(0, len(self.myth_ids), self.batch_size):
+            refresh_myth_counters(self.myth_ids[start:start + self.batch_size])
+        refresh_rankings()
+        bump(GLOBAL_GENERATION)
@@ -1,3 +1,1848 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import UserActivity, UserActivityArchive
+from core.compression import brotli
+from core.fieldsets import NESTED_PAGE_SIZE
+from core.partitions import (
+    create_partition, ensure_all_partitions, expire_history, is_partitioned, month_start,
+    partition_table, stranded_months,
+)
+from core.renderers import FastJSONRenderer, msgpack
+from core.testing import QueryPlanAssertionsMixin, QueryScalingAssertionsMixin
+
+from .models import (
+    Category, Comment, Evidence, IngestedOperation, Myth, MythRanking, Notification,
+    NotificationCounter, NotificationJob, NotificationSummary, ResearchRequest, SlugSequence,
+    SyncChange, Vote, VoteCounterShard,
+)
+from . import ingest, rankings, sync
+from .benchmarks import _unthrottled_settings, compare_reports, run_benchmark, seed_dataset
+from .cache import get_cache
+from .counters import reconcile_myth_counters, refresh_myth_counters
+from .loadtest import run_load
+from .notifications import enqueue_fanout, reconcile_unread_counts, run_pending_jobs
+from .rankings import leaderboards, refresh_rankings
+from .search import get_search_backend, tokenize
+from .serializers import MythListValuesSerializer
+from .streams import issue_ticket, redeem_ticket
+from .sync import encode_token
+from .views import CategoryViewSet, MythViewSet, NotificationViewSet
+from .votes import (
+    apply_counter_delta, cast_vote, flush_vote_counters, reconcile_vote_counts,
+)
+
+User = get_user_model()
+
+
+class SearchIndexTests(APITestCase):
+    """Full-text search over myths and their evidence/comments."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='farmer@example.com', password='pass12345',
+            first_name='Test', last_name='Farmer'
+        )
+        cls.category = Category.objects.create(name='Fertilizers')
+        cls.title_match = Myth.objects.create(
+            title='Fertilizers always increase yield',
+            description='More is better.',
+            category=cls.category,
+        )
+        cls.body_match = Myth.objects.create(
+            title='Soil needs tilling',
+            description='Some say tilling beats fertilizers for soil health.',
+        )
+        cls.unrelated = Myth.objects.create(
+            title='Monoculture is efficient',
+            description='Growing one crop everywhere.',
+        )
+
+    def search(self, query, **params):
+        response = self.client.get('/api/myths/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_tokenize_strips_query_syntax(self):
+        self.assertEqual(tokenize('"fert*" OR -soil:'), ['fert', 'or', 'soil'])
+
+    def test_prefix_match_ranks_title_first(self):
+        self.assertEqual(
+            self.search('fertiliz'), [self.title_match.id, self.body_match.id]
+        )
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('soil tilling'), [self.body_match.id])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(
+            self.search('fertiliz', ordering='created_at'),
+            [self.title_match.id, self.body_match.id],
+        )
+        self.assertEqual(
+            self.search('fertiliz', ordering='-created_at'),
+            [self.body_match.id, self.title_match.id],
+        )
+
+    def test_index_follows_evidence_and_comments(self):
+        evidence = Evidence.objects.create(
+            myth=self.unrelated, title='Rotation trial',
+            description='Biodiversity improved.', is_approved=True,
+        )
+        Comment.objects.create(myth=self.unrelated, user=self.user, content='Pollinators vanished')
+        self.assertEqual(self.search('biodiversity'), [self.unrelated.id])
+        self.assertEqual(self.search('pollinator'), [self.unrelated.id])
+
+        evidence.delete()
+        self.assertEqual(self.search('biodiversity'), [])
+
+    def test_unapproved_evidence_is_not_indexed(self):
+        Evidence.objects.create(
+            myth=self.unrelated, title='Pending study', description='Mycorrhiza',
+        )
+        self.assertEqual(self.search('mycorrhiza'), [])
+
+    def test_index_follows_myth_updates_and_deletes(self):
+        self.unrelated.title = 'Monoculture boosts pests'
+        self.unrelated.save()
+        self.assertEqual(self.search('pests'), [self.unrelated.id])
+
+        self.unrelated.delete()
+        self.assertEqual(self.search('pests'), [])
+
+
+class RebuildSearchIndexCommandTests(TestCase):
+
+    def test_rebuild_indexes_existing_myths(self):
+        myth = Myth.objects.create(title='Irrigation myth', description='Water')
+        get_search_backend().remove_myths([myth.id])
+        self.assertFalse(get_search_backend().search(Myth.objects.all(), 'irrigation').exists())
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertTrue(get_search_backend().search(Myth.objects.all(), 'irrigation').exists())
+
+
+class VoteCountingTests(APITestCase):
+    """Vote toggling through the API keeps the myth counters in step."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='voter@example.com', password='pass12345',
+            first_name='Test', last_name='Voter'
+        )
+        cls.myth = Myth.objects.create(title='Vote on me', description='Votes.')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def vote(self, vote_type):
+        response = self.client.post(f'/api/myths/{self.myth.id}/{vote_type}/')
+        self.assertEqual(response.status_code, 200)
+        self.myth.refresh_from_db()
+        return response.data['status']
+
+    def assertCounters(self, upvotes, downvotes):
+        self.assertEqual(
+            (self.myth.upvotes, self.myth.downvotes, self.myth.total_votes),
+            (upvotes, downvotes, upvotes + downvotes),
+        )
+
+    def test_record_switch_and_remove(self):
+        self.assertEqual(self.vote('upvote'), 'vote recorded')
+        self.assertCounters(1, 0)
+
+        self.assertEqual(self.vote('downvote'), 'vote recorded')
+        self.assertCounters(0, 1)
+        self.assertEqual(Vote.objects.get().vote_type, Vote.VoteType.DOWNVOTE)
+
+        self.assertEqual(self.vote('downvote'), 'vote removed')
+        self.assertCounters(0, 0)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_vote_does_not_resave_myth(self):
+        # One UPDATE of the counters, no slug lookup or full row rewrite;
+        # the other queries move the myth's sync log entry (myths.sync).
+        with CaptureQueriesContext(connection) as context:
+            apply_counter_delta(self.myth.id, upvotes=1)
+        myth_queries = [q['sql'] for q in context if 'myths_syncchange' not in q['sql']]
+        self.assertEqual(len(myth_queries), 1)
+        self.assertTrue(myth_queries[0].startswith('UPDATE'))
+
+    def test_reconcile_vote_counts(self):
+        Vote.objects.create(myth=self.myth, user=self.user, vote_type=Vote.VoteType.UPVOTE)
+        Myth.objects.filter(pk=self.myth.pk).update(upvotes=7, total_votes=9)
+        untouched = Myth.objects.create(title='Consistent', description='No votes.')
+
+        self.assertEqual(reconcile_vote_counts(), 1)
+        self.myth.refresh_from_db()
+        self.assertCounters(1, 0)
+        self.assertEqual(reconcile_vote_counts([untouched.id]), 0)
+
+
+@override_settings(MYTH_VOTE_COUNTER_MODE='sharded', MYTH_VOTE_COUNTER_SHARDS=4)
+class ShardedVoteCounterTests(APITestCase):
+    """Write-behind counters stay consistent for readers before and after a flush."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.voters = [
+            User.objects.create_user(
+                email=f'voter{i}@example.com', password='pass12345',
+                first_name='Test', last_name=f'Voter {i}'
+            )
+            for i in range(5)
+        ]
+        cls.myth = Myth.objects.create(title='Featured myth', description='Viral.')
+
+    def vote(self, user, vote_type):
+        self.client.force_authenticate(user)
+        response = self.client.post(f'/api/myths/{self.myth.id}/{vote_type}/')
+        self.assertEqual(response.status_code, 200)
+
+    def api_counters(self):
+        self.client.force_authenticate(None)
+        data = self.client.get(f'/api/myths/{self.myth.id}/').json()
+        listed = self.client.get('/api/myths/').json()['results'][0]
+        self.assertEqual(
+            [listed[key] for key in ('upvotes', 'downvotes', 'total_votes')],
+            [data[key] for key in ('upvotes', 'downvotes', 'total_votes')],
+        )
+        return data['upvotes'], data['downvotes'], data['total_votes']
+
+    def test_votes_are_buffered_until_flushed(self):
+        for voter in self.voters[:4]:
+            self.vote(voter, 'upvote')
+        self.vote(self.voters[4], 'downvote')
+        self.vote(self.voters[0], 'downvote')
+
+        self.myth.refresh_from_db()
+        self.assertEqual(self.myth.total_votes, 0)
+        self.assertTrue(VoteCounterShard.objects.exists())
+        self.assertEqual(self.api_counters(), (3, 2, 5))
+
+        self.assertEqual(flush_vote_counters(), 1)
+        self.assertFalse(VoteCounterShard.objects.exists())
+        self.myth.refresh_from_db()
+        self.assertEqual((self.myth.upvotes, self.myth.downvotes, self.myth.total_votes), (3, 2, 5))
+        self.assertEqual(self.api_counters(), (3, 2, 5))
+
+    def test_reconcile_flushes_pending_shards(self):
+        self.vote(self.voters[0], 'upvote')
+        self.assertEqual(reconcile_vote_counts(), 0)
+        self.assertFalse(VoteCounterShard.objects.exists())
+        self.assertEqual(self.api_counters(), (1, 0, 1))
+
+
+class QueryPlanTests(QueryScalingAssertionsMixin, APITestCase):
+    """List and detail endpoints issue a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='staff@example.com', password='pass12345',
+            first_name='Staff', last_name='User', is_staff=True
+        )
+        cls.category = Category.objects.create(name='Soil')
+        cls.myth = Myth.objects.create(
+            title='Detail myth', description='Nested.', category=cls.category,
+            submitted_by=cls.staff,
+        )
+
+    def users(self, count):
+        existing = User.objects.count()
+        return [
+            User.objects.create(
+                email=f'user{existing + i}@example.com', first_name='User', last_name=str(i)
+            )
+            for i in range(count)
+        ]
+
+    def grow(self, create):
+        def grow_to(size):
+            for user in self.users(size):
+                create(user)
+        return grow_to
+
+    def test_myth_list(self):
+        self.assertQueriesDoNotScale('/api/myths/', self.grow(
+            lambda user: Myth.objects.create(
+                title='Listed', description='Row.', category=Category.objects.create(
+                    name=f'Category {user.pk}'
+                ), submitted_by=user,
+            )
+        ))
+
+    def test_myth_detail(self):
+        def engage(user):
+            Comment.objects.create(myth=self.myth, user=user, content='Nested comment')
+            Vote.objects.create(myth=self.myth, user=user, vote_type=Vote.VoteType.UPVOTE)
+            ResearchRequest.objects.create(myth=self.myth, requested_by=user, assigned_to=user)
+
+        self.assertQueriesDoNotScale(f'/api/myths/{self.myth.id}/', self.grow(engage))
+
+    def test_evidence_list(self):
+        self.assertQueriesDoNotScale('/api/evidence/', self.grow(
+            lambda user: Evidence.objects.create(
+                myth=self.myth, title='Study', description='Data.', submitted_by=user,
+            )
+        ))
+
+    def test_comment_list(self):
+        self.assertQueriesDoNotScale('/api/comments/', self.grow(
+            lambda user: Comment.objects.create(myth=self.myth, user=user, content='Hi')
+        ))
+
+    def test_research_request_list(self):
+        self.client.force_authenticate(self.staff)
+        self.assertQueriesDoNotScale('/api/research-requests/', self.grow(
+            lambda user: ResearchRequest.objects.create(
+                myth=self.myth, requested_by=user, assigned_to=user,
+            )
+        ))
+
+
+class BenchmarkHarnessTests(TestCase):
+    """The API benchmark harness seeds data and reports every endpoint."""
+
+    def test_run_benchmark_covers_router_endpoints(self):
+        scale = seed_dataset(0.01, users=5, stdout=StringIO())
+        self.assertEqual(Myth.objects.filter(slug__startswith='synthetic-').count(), 10)
+        self.assertTrue(Vote.objects.exists())
+        self.assertEqual(reconcile_vote_counts(), 0)
+
+        admin = User.objects.create_superuser(
+            email='admin@example.com', password=None, first_name='A', last_name='B'
+        )
+        report = run_benchmark(admin, repeat=2, scale=scale)
+        endpoints = report['endpoints']
+        self.assertIn('GET /api/myths/', endpoints)
+        self.assertIn('GET /api/myths/{id}/', endpoints)
+        self.assertIn('GET /api/activities/', endpoints)
+        self.assertEqual(endpoints['GET /api/myths/']['status'], 200)
+        self.assertEqual(compare_reports(report, report), [])
+
+    def test_compare_reports_thresholds(self):
+        baseline = {'endpoints': {
+            'GET /api/myths/': {'status': 200, 'queries': 2, 'p95_ms': 10.0, 'bytes': 1000},
+            'GET /api/gone/': {'status': 200, 'queries': 1, 'p95_ms': 1.0, 'bytes': 10},
+        }}
+        current = {'endpoints': {
+            'GET /api/myths/': {'status': 200, 'queries': 3, 'p95_ms': 12.0, 'bytes': 1500},
+        }}
+        regressions = compare_reports(baseline, current, latency_threshold=0.25)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(any('queries 2 -> 3' in regression for regression in regressions))
+        self.assertTrue(any('bytes' in regression for regression in regressions))
+        self.assertTrue(any('missing' in regression for regression in regressions))
+
+    def test_run_load_counts_requests(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                status = 200 if self.headers['X-Forwarded-Proto'] == 'https' else 400
+                self.send_response(404 if self.path == '/missing/' else status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            result = run_load(
+                f'http://127.0.0.1:{server.server_port}', [('/ok/', {}), ('/missing/', {})],
+                concurrency=2, duration=0.2,
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertGreater(result['requests'], 2)
+        self.assertEqual(set(result['statuses']), {'200', '404'})
+        self.assertEqual(sum(result['statuses'].values()), result['requests'])
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+
+class IndexUsageTests(QueryPlanAssertionsMixin, APITestCase):
+    """Hot API queries are served from indexes, never by scanning a table."""
+    maxDiff = None
+
+    HOT_TABLES = {
+        'myths_myth', 'myths_evidence', 'myths_comment', 'myths_vote',
+        'myths_researchrequest', 'myths_notification', 'core_useractivity',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(0.01, users=5, stdout=StringIO())
+        cls.user = User.objects.filter(email__startswith='synthetic').first()
+        cls.user.is_staff = True
+        cls.user.save()
+        cls.myth = Myth.objects.first()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def hot_endpoints(self):
+        myth = self.myth.pk
+        return [
+            ('/api/myths/', {}),
+            ('/api/myths/', {'status': 'debunked', 'ordering': '-total_votes'}),
+            ('/api/myths/', {'search': 'soil'}),
+            (f'/api/myths/{myth}/', {}),
+            ('/api/myths/trending/', {}),
+            ('/api/myths/top/', {}),
+            ('/api/evidence/', {}),
+            ('/api/evidence/', {'myth': myth, 'is_approved': 'true'}),
+            ('/api/comments/', {}),
+            ('/api/comments/', {'myth': myth, 'is_approved': 'true'}),
+            ('/api/research-requests/', {}),
+            ('/api/research-requests/', {'status': 'open'}),
+            ('/api/notifications/', {}),
+            ('/api/notifications/', {'is_read': 'false'}),
+            ('/api/notifications/unread-count/', {}),
+            ('/api/activities/', {}),
+        ]
+
+    def test_hot_queries_use_indexes(self):
+        with _unthrottled_settings():
+            for path, params in self.hot_endpoints():
+                with self.subTest(path=path, **params):
+                    self.assertNoSequentialScans(path, self.HOT_TABLES, **params)
+
+
+class SlugAllocationTests(TestCase):
+    """Unique slugs are allocated without scanning existing duplicates."""
+
+    def create(self, title='Cassava tolerates drought'):
+        return Myth.objects.create(title=title, description='.')
+
+    def test_duplicate_titles_get_numbered_slugs(self):
+        slugs = [self.create().slug for _ in range(3)]
+        self.assertEqual(slugs, [
+            'cassava-tolerates-drought',
+            'cassava-tolerates-drought-1',
+            'cassava-tolerates-drought-2',
+        ])
+
+    def test_allocation_cost_is_constant(self):
+        self.create()
+        with CaptureQueriesContext(connection) as second:
+            self.create()
+        for _ in range(200):
+            self.create()
+        with CaptureQueriesContext(connection) as later:
+            myth = self.create()
+        self.assertEqual(myth.slug, 'cassava-tolerates-drought-202')
+        self.assertEqual(len(later), len(second))
+
+    def test_continues_after_existing_slugs(self):
+        # Myths created before the sequence table existed.
+        Myth.objects.bulk_create([
+            Myth(title='Old myth', slug='old-myth', description='.'),
+            Myth(title='Old myth', slug='old-myth-4', description='.'),
+        ])
+        self.assertEqual(self.create('Old myth').slug, 'old-myth-5')
+
+    def test_retries_when_slug_is_taken(self):
+        self.create('Taken')
+        Myth.objects.create(title='Manual', slug='taken-1', description='.')
+        self.assertEqual(self.create('Taken').slug, 'taken-2')
+
+    def test_allocate_many_reserves_per_base(self):
+        self.create('Bulk title')
+        slugs = SlugSequence.objects.allocate_many(['Bulk title', 'Other', 'Bulk title'])
+        self.assertEqual(slugs, ['bulk-title-1', 'other', 'bulk-title-2'])
+
+
+class ResponseCacheTests(APITestCase):
+    """Anonymous myth reads are cached until the underlying data changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', password='pass12345',
+            first_name='Test', last_name='Reader'
+        )
+        cls.category = Category.objects.create(name='Livestock')
+        cls.myth = Myth.objects.create(
+            title='Cows need salt licks', description='Always.', category=cls.category
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.detail = f'/api/myths/{self.myth.id}/'
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get('/api/myths/', {'status': 'pending', 'page': 1})
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/myths/', {'page': 1, 'status': 'pending'})
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+
+    def test_authenticated_reads_bypass_cache(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.detail)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.detail)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(self.detail, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_responses_are_validated_by_etag_only(self):
+        comment = Comment.objects.create(myth=self.myth, user=self.user, content='Gone soon')
+        for url in ('/api/myths/', self.detail):
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response)
+        # Removes a row from both responses without a newer updated_at.
+        comment.delete()
+        for url in ('/api/myths/', self.detail):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Gone soon', response.content.decode())
+
+    def assertInvalidated(self, url, change):
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        change()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_myth_changes_invalidate(self):
+        def rename():
+            self.myth.title = 'Cows need minerals'
+            self.myth.save()
+        self.assertInvalidated('/api/myths/', rename)
+        self.assertInvalidated(self.detail, rename)
+        self.assertIn('minerals', self.client.get(self.detail).json()['title'])
+
+    def test_related_changes_invalidate(self):
+        self.assertInvalidated(self.detail, lambda: Comment.objects.create(
+            myth=self.myth, user=self.user, content='Mine do fine without.'
+        ))
+        self.assertInvalidated('/api/myths/', lambda: cast_vote(
+            self.myth.id, self.user, Vote.VoteType.UPVOTE
+        ))
+        self.assertEqual(self.client.get(self.detail).json()['upvotes'], 1)
+
+    def test_category_changes_invalidate(self):
+        def rename():
+            self.category.name = 'Cattle'
+            self.category.save()
+        self.assertInvalidated(self.detail, rename)
+        self.assertInvalidated('/api/categories/', rename)
+
+
+class MythKeysetPaginationTests(APITestCase):
+    """Cursor pagination follows the myth list ordering choices."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Myth.objects.bulk_create([
+            Myth(title=f'Myth {i}', slug=f'myth-{i}', description='.', total_votes=i % 3)
+            for i in range(25)
+        ])
+
+    def test_cursor_walk_by_vote_total(self):
+        expected = list(
+            Myth.objects.order_by('-total_votes', '-id').values_list('id', flat=True)
+        )
+        seen, url = [], '/api/myths/'
+        params = {'ordering': '-total_votes', 'page_size': 7}
+        while url:
+            data = self.client.get(url, params).json()
+            seen.extend(row['id'] for row in data['results'])
+            url, params = data['next'], None
+        self.assertEqual(seen, expected)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'ranks with ts_rank')
+    def test_cursor_walk_by_search_rank(self):
+        # Ranks tie in pairs, so the cursor has to match its rank exactly.
+        for i in range(12):
+            Myth.objects.create(
+                title='Compost tea', description=' '.join(['compost'] * (i // 2 + 1)) + ' brew'
+            )
+        seen, url = [], '/api/myths/'
+        params = {'search': 'compost', 'page_size': 3}
+        while url:
+            data = self.client.get(url, params).json()
+            seen.extend(row['id'] for row in data['results'])
+            url, params = data['next'], None
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len(set(seen)), 12)
+
+
+class MythExportTests(APITestCase):
+    """Streaming NDJSON/CSV export of myths with evidence."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='partner@example.com', password='pass12345',
+            first_name='Research', last_name='Partner'
+        )
+        category = Category.objects.create(name='Pests')
+        cls.myths = [
+            Myth.objects.create(title=f'Pest myth {i}', description='.', category=category)
+            for i in range(3)
+        ]
+        cls.evidence = Evidence.objects.create(
+            myth=cls.myths[1], title='Trial', description='Field trial results.',
+            evidence_type=Evidence.EvidenceType.FIELD_TRIAL,
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get('/api/myths/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_streams_every_myth_with_evidence(self):
+        with self.assertNumQueries(2):
+            rows = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [myth.id for myth in self.myths])
+        self.assertEqual(rows[0]['category'], 'Pests')
+        self.assertEqual(rows[0]['evidence'], [])
+        self.assertEqual(rows[1]['evidence'][0]['title'], 'Trial')
+
+    def test_csv_export(self):
+        rows = list(csv.DictReader(StringIO(self.export(export_format='csv'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(json.loads(rows[1]['evidence'])[0]['id'], self.evidence.id)
+
+    def test_incremental_export_includes_evidence_changes(self):
+        since = timezone.now()
+        Myth.objects.filter(pk=self.myths[0].pk).update(title='Edited')
+        self.myths[2].save()
+        self.evidence.save()
+        rows = self.export(since=since.isoformat()).splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in rows], [self.myths[1].id, self.myths[2].id]
+        )
+
+    def test_incremental_export_includes_deleted_evidence(self):
+        since = timezone.now()
+        self.evidence.delete()
+        rows = self.export(since=since.isoformat()).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in rows], [self.myths[1].id])
+        self.assertEqual(json.loads(rows[0])['evidence'], [])
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/myths/export/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/myths/export/', {'export_format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'myths.ndjson')
+            out = StringIO()
+            call_command('export_myths', output=path, stdout=out)
+            with open(path, encoding='utf-8') as exported:
+                self.assertEqual(len(exported.readlines()), 3)
+        self.assertIn('Exported 3 myths', out.getvalue())
+
+
+class MythImportTests(APITestCase):
+    """Bulk import of myths and evidence with per-row error reporting."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='officer@example.com', password='pass12345',
+            first_name='Extension', last_name='Officer', is_staff=True
+        )
+        Category.objects.create(name='Soil Health')
+
+    def setUp(self):
+        self.client.force_authenticate(self.staff)
+
+    def ndjson(self, *rows):
+        return ''.join(json.dumps(row) + '\n' for row in rows)
+
+    def test_valid_rows_are_imported_and_errors_reported(self):
+        body = self.ndjson(
+            {'title': 'Ash sweetens soil', 'description': 'Wood ash raises pH.',
+             'category': 'soil health',
+             'evidence': [{'title': 'Liming study', 'description': 'pH rose.',
+                           'evidence_type': 'scientific_study'}]},
+            {'title': '', 'description': 'Missing title.'},
+            {'title': 'Unknown', 'description': '.', 'category': 'Nope'},
+            {'title': 'Ash sweetens soil', 'description': 'Again.',
+             'evidence': [{'title': 'Bad type', 'description': '.', 'evidence_type': 'rumour'}]},
+        ) + '{broken\n'
+        response = self.client.generic(
+            'POST', '/api/myths/import/', body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['evidence_created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5])
+        self.assertIn('evidence[0]', response.data['errors'][2]['errors'])
+
+        myth = Myth.objects.get()
+        self.assertEqual(myth.slug, 'ash-sweetens-soil')
+        self.assertEqual(myth.category.name, 'Soil Health')
+        self.assertEqual(myth.submitted_by, self.staff)
+        self.assertEqual(myth.evidences.get().title, 'Liming study')
+        self.assertEqual(
+            list(get_search_backend().search(Myth.objects.all(), 'sweetens')), [myth]
+        )
+
+    def test_import_reads_export_output(self):
+        myth = Myth.objects.create(title='Round trip', description='Exported.')
+        Evidence.objects.create(myth=myth, title='Study', description='.')
+        exported = b''.join(self.client.get(
+            '/api/myths/export/', {'export_format': 'csv'}
+        ).streaming_content)
+        upload = SimpleUploadedFile('myths.csv', exported, content_type='text/csv')
+        response = self.client.post(
+            '/api/myths/import/?import_format=csv', {'file': upload}, format='multipart'
+        )
+        self.assertEqual(response.data['created'], 1, response.data)
+        copy = Myth.objects.exclude(pk=myth.pk).get()
+        self.assertEqual(copy.slug, 'round-trip-1')
+        self.assertEqual(copy.evidences.get().title, 'Study')
+
+    def test_undecodable_input_is_a_row_error(self):
+        response = self.client.generic(
+            'POST', '/api/myths/import/', b'\xff\xfe{}\n', content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+        self.assertIn('UTF-8', response.data['errors'][0]['errors']['non_field_errors'][0])
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(
+            email='farmer2@example.com', password='pass12345',
+            first_name='Test', last_name='Farmer'
+        ))
+        response = self.client.generic(
+            'POST', '/api/myths/import/', '', content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_command_batches_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'myths.ndjson')
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write(self.ndjson(*(
+                    {'title': f'Batch myth {i % 3}', 'description': '.'} for i in range(7)
+                )))
+            out, err = StringIO(), StringIO()
+            call_command('import_myths', path, batch_size=3, stdout=out, stderr=err)
+        self.assertIn('Imported 7 myths', out.getvalue())
+        self.assertEqual(Myth.objects.filter(slug__startswith='batch-myth-0').count(), 3)
+
+
+class LeaderboardTests(APITestCase):
+    """Trending scores are materialized and served from in-memory lists."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crops = Category.objects.create(name='Crops')
+        cls.users = [
+            User.objects.create(email=f'ranker{i}@example.com', first_name='R', last_name=str(i))
+            for i in range(3)
+        ]
+        cls.old, cls.fresh, cls.quiet = (
+            Myth.objects.create(title=title, description='.', category=category)
+            for title, category in (('Old', cls.crops), ('Fresh', None), ('Quiet', cls.crops))
+        )
+
+    def setUp(self):
+        leaderboards.clear()
+        self.now = timezone.now()
+        for user in self.users:
+            cast_vote(self.old.id, user, Vote.VoteType.UPVOTE)
+        cast_vote(self.fresh.id, self.users[0], Vote.VoteType.UPVOTE)
+        Comment.objects.create(myth=self.fresh, user=self.users[1], content='Yes.')
+        # Votes on "Old" were cast three days ago.
+        Vote.objects.filter(myth=self.old).update(created_at=self.now - timedelta(days=3))
+
+    def ids(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()]
+
+    def test_trending_scores_decay_by_window(self):
+        self.assertEqual(refresh_rankings(self.now), 2)
+        scores = dict(MythRanking.objects.values_list('myth_id', 'score'))
+        # Fresh: a vote and a comment in every window; Old: three votes in 7d/30d.
+        self.assertEqual(scores, {self.fresh.id: 7.0 * 3, self.old.id: 3 * 3.0})
+        self.assertEqual(self.ids('/api/myths/trending/'), [self.fresh.id, self.old.id])
+        self.assertEqual(
+            self.ids('/api/myths/trending/', category=self.crops.id), [self.old.id]
+        )
+
+        refresh_rankings(self.now + timedelta(days=40))
+        self.assertFalse(MythRanking.objects.exists())
+        self.assertEqual(self.ids('/api/myths/trending/'), [])
+
+    def test_lists_are_served_from_memory_between_refreshes(self):
+        refresh_rankings(self.now)
+        self.ids('/api/myths/trending/')
+        with self.assertNumQueries(1):
+            self.ids('/api/myths/trending/')
+
+    def test_lists_expire_when_the_refresh_runs_elsewhere(self):
+        self.assertEqual(self.ids('/api/myths/trending/'), [])
+        # manage.py refresh_rankings, whose bump does not reach a local-memory cache.
+        with mock.patch.object(rankings, 'bump'):
+            refresh_rankings(self.now)
+        self.assertEqual(self.ids('/api/myths/trending/'), [])
+        later = time.monotonic() + rankings.LIST_TTL + 1
+        with mock.patch.object(rankings.time, 'monotonic', return_value=later):
+            self.assertEqual(self.ids('/api/myths/trending/'), [self.fresh.id, self.old.id])
+
+    def test_top_by_total_votes_per_category(self):
+        self.assertEqual(
+            self.ids('/api/myths/top/', category=self.crops.id), [self.old.id, self.quiet.id]
+        )
+        self.assertEqual(self.ids('/api/myths/top/', limit=1), [self.old.id])
+        response = self.client.get('/api/myths/top/', {'category': 'crops'})
+        self.assertEqual(response.status_code, 400)
+        for limit in (0, -1):
+            response = self.client.get('/api/myths/top/', {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(NOTIFICATION_FANOUT_BATCH_SIZE=2)
+class NotificationFanoutTests(APITestCase):
+    """Myth events are queued and fanned out to followers by the worker."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = User.objects.create_user(
+            email='researcher@example.com', password='pass12345',
+            first_name='Test', last_name='Researcher', is_researcher=True
+        )
+        cls.followers = [
+            User.objects.create(email=f'follower{i}@example.com', first_name='F', last_name=str(i))
+            for i in range(5)
+        ]
+        cls.myth = Myth.objects.create(
+            title='Burning fields kills pests', description='.', submitted_by=cls.followers[0]
+        )
+        for user in cls.followers[1:4]:
+            Vote.objects.create(myth=cls.myth, user=user, vote_type=Vote.VoteType.UPVOTE)
+        Comment.objects.create(myth=cls.myth, user=cls.followers[3], content='Agreed.')
+        Comment.objects.create(myth=cls.myth, user=cls.researcher, content='Checking.')
+
+    def complete_research(self):
+        research = ResearchRequest.objects.create(
+            myth=self.myth, requested_by=self.followers[0], assigned_to=self.researcher
+        )
+        self.client.force_authenticate(self.researcher)
+        response = self.client.post(
+            f'/api/research-requests/{research.id}/complete/', {'findings': 'Debunked'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def notified(self, notification_type=Notification.NotificationType.STATUS_CHANGE):
+        return sorted(Notification.objects.filter(
+            notification_type=notification_type
+        ).values_list('user__email', flat=True))
+
+    def test_completion_is_queued_and_fanned_out(self):
+        self.complete_research()
+        self.assertEqual(NotificationJob.objects.get().status, NotificationJob.Status.PENDING)
+        self.assertFalse(Notification.objects.exists())
+
+        self.assertEqual(run_pending_jobs(), (1, 4))
+        # Submitter, voters and commenters, but not the researcher who acted.
+        self.assertEqual(self.notified(), [f'follower{i}@example.com' for i in range(4)])
+        job = NotificationJob.objects.get()
+        self.assertEqual((job.status, job.notified), (NotificationJob.Status.DONE, 4))
+
+    def test_pending_jobs_coalesce_and_recent_notifications_dedupe(self):
+        self.complete_research()
+        self.complete_research()
+        self.assertEqual(NotificationJob.objects.count(), 1)
+        run_pending_jobs()
+        self.complete_research()
+        self.assertEqual(run_pending_jobs(), (1, 0))
+        self.assertEqual(len(self.notified()), 4)
+
+    def test_enqueue_cost_does_not_depend_on_followers(self):
+        with CaptureQueriesContext(connection) as few:
+            enqueue_fanout(self.myth, Notification.NotificationType.MYTH_UPDATE, 'T', 'M')
+        NotificationJob.objects.all().delete()
+        Vote.objects.bulk_create([
+            Vote(myth=self.myth, user=user, vote_type=Vote.VoteType.DOWNVOTE)
+            for user in [User.objects.create(email=f'extra{i}@example.com') for i in range(20)]
+        ])
+        with CaptureQueriesContext(connection) as many:
+            enqueue_fanout(self.myth, Notification.NotificationType.MYTH_UPDATE, 'T', 'M')
+        self.assertEqual(len(many), len(few))
+
+    def test_evidence_notifies_followers(self):
+        Evidence.objects.create(
+            myth=self.myth, title='Burn trial', description='.', submitted_by=self.followers[1]
+        )
+        call_command('run_notification_worker', stdout=StringIO())
+        self.assertEqual(
+            len(self.notified(Notification.NotificationType.EVIDENCE_ADDED)), 4
+        )
+
+
+class UnreadNotificationCountTests(APITestCase):
+    """Unread counters follow notifications without counting them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', password='pass12345',
+            first_name='Test', last_name='Reader'
+        )
+        cls.commenter = User.objects.create(email='commenter@example.com')
+        cls.myth = Myth.objects.create(
+            title='Rain follows the plough', description='.', submitted_by=cls.user
+        )
+        Comment.objects.create(myth=cls.myth, user=cls.commenter, content='Hm.')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(
+            user=self.user, notification_type=Notification.NotificationType.MYTH_UPDATE,
+            title='Update', message='.', related_myth=self.myth, **kwargs
+        )
+
+    def unread(self):
+        response = self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['unread']
+
+    def test_counter_follows_create_read_and_delete(self):
+        first = self.notify()
+        self.notify(is_read=True)
+        self.assertEqual(self.unread(), 1)
+
+        second = self.notify()
+        enqueue_fanout(self.myth, Notification.NotificationType.STATUS_CHANGE, 'T', 'M')
+        run_pending_jobs()
+        self.assertEqual(self.unread(), 3)
+
+        self.client.post(f'/api/notifications/{first.id}/mark-read/')
+        self.client.post(f'/api/notifications/{first.id}/mark-read/')
+        self.assertEqual(self.unread(), 2)
+        second.delete()
+        self.assertEqual(self.unread(), 1)
+        self.client.post('/api/notifications/mark-all-read/')
+        self.assertEqual(self.unread(), 0)
+        self.notify()
+        self.assertEqual(self.unread(), 1)
+
+    def test_reading_the_count_does_not_count(self):
+        self.unread()
+        with CaptureQueriesContext(connection) as few:
+            self.unread()
+        Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='myth_update', title='T', message='.')
+            for _ in range(50)
+        ])
+        with CaptureQueriesContext(connection) as many:
+            self.unread()
+        self.assertEqual(len(many), len(few))
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in many))
+
+    def test_notification_created_with_the_counter_is_counted(self):
+        self.notify()
+        create_counter = NotificationCounter.objects.bulk_create
+
+        def concurrent_notification(*args, **kwargs):
+            # Its writer finds no counter row to adjust yet.
+            self.notify()
+            return create_counter(*args, **kwargs)
+
+        with mock.patch.object(
+            NotificationCounter.objects, 'bulk_create', side_effect=concurrent_notification
+        ):
+            self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.unread(), 2)
+
+    def test_reconcile_repairs_drift(self):
+        self.notify()
+        self.unread()
+        NotificationCounter.objects.update(unread=7)
+        self.assertEqual(reconcile_unread_counts(), 1)
+        self.assertEqual(self.unread(), 1)
+
+
+@override_settings(NOTIFICATION_STREAM_TIMEOUT=0)
+class NotificationStreamTests(TestCase):
+    """The event stream pushes notifications and the unread count."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='listener@example.com')
+        cls.old = Notification.objects.create(
+            user=cls.user, notification_type='myth_update', title='Old', message='.'
+        )
+        cls.new = Notification.objects.create(
+            user=cls.user, notification_type='myth_update', title='New', message='.'
+        )
+        cls.token = str(AccessToken.for_user(cls.user))
+
+    async def stream(self, ticket=None, headers=None, **params):
+        params['ticket'] = ticket or issue_ticket(self.user)
+        response = await self.async_client.get(
+            '/api/notifications/stream/', params, headers=headers or {}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = [chunk async for chunk in response.streaming_content]
+        return b''.join(chunks).decode()
+
+    async def test_new_stream_sends_only_the_unread_count(self):
+        body = await self.stream()
+        self.assertIn('event: unread\ndata: {"unread": 2}', body)
+        self.assertNotIn('event: notification', body)
+
+    async def test_reconnect_resumes_after_last_event_id(self):
+        ticket = issue_ticket(self.user)
+        await self.stream(ticket)
+        # EventSource reconnects to the same URL once the stream times out.
+        body = await self.stream(ticket, headers={'Last-Event-ID': str(self.old.id)})
+        self.assertIn(f'event: notification\nid: {self.new.id}\n', body)
+        self.assertIn('"title": "New"', body)
+        self.assertNotIn('"title": "Old"', body)
+
+    async def test_new_ticket_resumes_after_last_event_id_parameter(self):
+        body = await self.stream(last_event_id=self.old.id)
+        self.assertIn(f'event: notification\nid: {self.new.id}\n', body)
+        self.assertNotIn('"title": "Old"', body)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_access_token_in_query_string_is_refused(self):
+        response = await self.async_client.get('/api/notifications/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 401)
+
+    def test_ticket_is_issued_to_authenticated_users(self):
+        response = self.client.post(
+            '/api/notifications/stream-ticket/', HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(redeem_ticket(response.json()['ticket']), self.user)
+        self.assertEqual(self.client.post('/api/notifications/stream-ticket/').status_code, 401)
+
+    def test_ticket_is_accepted_until_it_expires(self):
+        ticket = issue_ticket(self.user)
+        self.assertEqual(redeem_ticket(ticket), self.user)
+        self.assertEqual(redeem_ticket(ticket), self.user)
+        with override_settings(NOTIFICATION_STREAM_TICKET_MAX_AGE=-1):
+            self.assertIsNone(redeem_ticket(ticket))
+
+    def test_ticket_of_inactive_user_is_refused(self):
+        ticket = issue_ticket(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(redeem_ticket(ticket))
+
+    @override_settings(NOTIFICATION_STREAM_TICKET_MAX_AGE=-1)
+    def test_expired_ticket_is_refused(self):
+        self.assertIsNone(redeem_ticket(issue_ticket(self.user)))
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get('/api/notifications/stream/', {'ticket': issue_ticket(self.user)})
+        self.assertEqual(response.status_code, 501)
+
+
+class RetentionTests(TestCase):
+    """Old history is compacted, archived or expired by apply_retention."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='historic@example.com')
+
+    def notify(self, days_ago, is_read=True, notification_type='myth_update'):
+        notification = Notification.objects.create(
+            user=self.user, notification_type=notification_type,
+            title='T', message='.', is_read=is_read,
+        )
+        Notification.objects.filter(pk=notification.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return notification
+
+    def test_old_read_notifications_are_compacted(self):
+        for _ in range(3):
+            self.notify(60)
+        self.notify(60, notification_type='new_comment')
+        unread = self.notify(60, is_read=False)
+        recent = self.notify(1)
+        call_command('apply_retention', stdout=StringIO())
+        call_command('apply_retention', stdout=StringIO())
+
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)), {unread.pk, recent.pk}
+        )
+        self.assertEqual(
+            sorted(NotificationSummary.objects.values_list('notification_type', 'count')),
+            [('myth_update', 3), ('new_comment', 1)],
+        )
+
+    def test_expired_rows_are_archived_or_deleted(self):
+        old = UserActivity.objects.create(
+            user=self.user, activity_type='old', created_at=timezone.now() - timedelta(days=400)
+        )
+        UserActivity.objects.create(user=self.user, activity_type='new')
+        self.notify(400, is_read=False)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').json(), {'unread': 1})
+
+        call_command('apply_retention', stdout=StringIO())
+        self.assertEqual(list(UserActivity.objects.values_list('activity_type', flat=True)), ['new'])
+        self.assertEqual(UserActivityArchive.objects.get().pk, old.pk)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').json(), {'unread': 0})
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'needs table partitioning')
+    def test_expired_months_are_detached(self):
+        created_at = timezone.now() - timedelta(days=400)
+        old_month = month_start(created_at)
+        partition_table(connection, 'core_useractivity')
+        create_partition(connection, 'core_useractivity', old_month)
+        UserActivity.objects.create(user=self.user, activity_type='old', created_at=created_at)
+        partitions, rows = expire_history(
+            UserActivity, timezone.now() - timedelta(days=180), archive_model=UserActivityArchive
+        )
+        self.assertEqual(partitions, [f'core_useractivity_{old_month:%Y_%m}'])
+        self.assertFalse(UserActivity.objects.exists())
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'needs table partitioning')
+    def test_rows_in_the_default_partition_get_their_month(self):
+        partition_table(connection, 'core_useractivity')
+        later = timezone.now() + timedelta(days=200)
+        activity = UserActivity.objects.create(user=self.user, activity_type='ahead', created_at=later)
+        created = ensure_all_partitions()
+        self.assertIn(f'core_useractivity_{month_start(later):%Y_%m}', created)
+        self.assertEqual(stranded_months(connection, 'core_useractivity'), [])
+        self.assertTrue(UserActivity.objects.filter(pk=activity.pk).exists())
+
+    def test_partitioning_is_opt_in(self):
+        self.assertFalse(is_partitioned(connection, 'core_useractivity'))
+        if connection.vendor != 'postgresql':
+            with self.assertRaises(CommandError):
+                call_command('partition_history', stdout=StringIO())
+
+
+class MythCounterTests(APITestCase):
+    """Evidence, comment and research counters on Myth follow their rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='counted@example.com')
+        cls.myth = Myth.objects.create(title='Counted myth', description='.')
+        cls.other = Myth.objects.create(title='Other myth', description='.')
+
+    def setUp(self):
+        get_cache().clear()
+
+    def listed(self, myth=None):
+        response = self.client.get('/api/myths/', {'search': (myth or self.myth).title})
+        return response.json()['results'][0]
+
+    def evidence(self, myth=None, **kwargs):
+        return Evidence.objects.create(
+            myth=myth or self.myth, title='E', description='.', submitted_by=self.user, **kwargs
+        )
+
+    def test_counters_follow_changes(self):
+        study = self.evidence(evidence_type='scientific_study', is_approved=True)
+        pending = self.evidence(evidence_type='field_trial')
+        Comment.objects.create(myth=self.myth, user=self.user, content='Yes')
+        Comment.objects.create(myth=self.myth, user=self.user, content='No', is_approved=False)
+        research = ResearchRequest.objects.create(myth=self.myth, requested_by=self.user)
+
+        listed = self.listed()
+        self.assertEqual(
+            (listed['evidence_count'], listed['comment_count'], listed['open_research_count']),
+            (1, 1, 1),
+        )
+        self.assertEqual(listed['evidence_by_type']['scientific_study'], 1)
+        self.assertEqual(listed['evidence_by_type']['field_trial'], 0)
+
+        pending.is_approved = True
+        pending.save()
+        study.myth = self.other
+        study.save()
+        research.status = ResearchRequest.Status.COMPLETED
+        research.save()
+        listed = self.listed()
+        self.assertEqual(listed['evidence_count'], 1)
+        self.assertEqual(listed['evidence_by_type']['field_trial'], 1)
+        self.assertEqual(listed['open_research_count'], 0)
+        self.assertEqual(self.listed(self.other)['evidence_by_type']['scientific_study'], 1)
+
+        pending.delete()
+        self.assertEqual(self.listed()['evidence_count'], 0)
+
+    def test_list_does_not_count_related_rows(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/myths/')
+        self.assertFalse(any('myths_evidence' in query['sql'] for query in context))
+
+    def test_refresh_locks_the_myths_before_recounting(self):
+        self.evidence(is_approved=True)
+        Myth.objects.filter(pk=self.myth.pk).update(evidence_count=5)
+        locks = []
+
+        def lock(queryset, **kwargs):
+            # Records the lock and runs the SELECT without it, as on SQLite.
+            locks.append(kwargs)
+            return queryset.all()
+
+        with (
+            mock.patch.object(connection.features, 'has_select_for_update', True),
+            mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lock),
+            CaptureQueriesContext(connection) as context,
+        ):
+            refresh_myth_counters([self.other.pk, self.myth.pk], model=Evidence)
+        self.assertEqual(locks, [{'no_key': True}])
+        statements = [query['sql'].split()[0] for query in context]
+        self.assertLess(statements.index('SELECT'), statements.index('UPDATE'))
+        self.myth.refresh_from_db()
+        self.assertEqual(self.myth.evidence_count, 1)
+
+    def test_reconcile_repairs_drift(self):
+        self.evidence(is_approved=True)
+        Myth.objects.filter(pk=self.myth.pk).update(evidence_count=5, comment_count=2)
+        out = StringIO()
+        call_command('reconcile_myth_counters', stdout=out)
+        self.assertIn('Corrected 1 myths', out.getvalue())
+        self.myth.refresh_from_db()
+        self.assertEqual((self.myth.evidence_count, self.myth.comment_count), (1, 0))
+        self.assertEqual(reconcile_myth_counters(), 0)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class FastListSerializationTests(APITestCase):
+    """The .values() list path renders exactly what the serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crops, soil = Category.objects.create(name='Crops'), Category.objects.create(name='Soil')
+        pictured = User.objects.create(
+            email='pictured@example.com', first_name='Pic', profile_picture='profile_pics/p.png'
+        )
+        plain = User.objects.create(email='plain@example.com', location='Nakuru')
+        for i, (category, user) in enumerate([
+            (crops, pictured), (crops, plain), (soil, pictured), (None, None), (crops, None),
+        ]):
+            myth = Myth.objects.create(
+                title=f'Fast myth {i} \u2028 mäït', description='.', origin='Kenya',
+                category=category, submitted_by=user, total_votes=i, upvotes=i,
+            )
+            Evidence.objects.create(
+                myth=myth, title='E', description='.', submitted_by=plain,
+                evidence_type='field_trial', is_approved=bool(i % 2),
+            )
+        cls.user = plain
+
+    def assertIdentical(self, path, params=None):
+        responses = []
+        for enabled in (False, True):
+            with override_settings(API_FAST_LIST_SERIALIZATION=enabled):
+                response = self.client.get(path, params or {})
+            self.assertEqual(response.status_code, 200)
+            responses.append(response)
+        self.assertEqual(responses[1].content, responses[0].content)
+        return responses[1].json()
+
+    def test_list_output_is_identical(self):
+        first = self.assertIdentical('/api/myths/', {'page_size': 2})
+        self.assertIdentical(first['next'])
+        self.assertIdentical('/api/myths/', {'ordering': '-total_votes', 'count': 'exact'})
+        self.assertIdentical('/api/myths/', {'page': 1})
+        self.assertIdentical('/api/myths/', {'search': 'fast', 'category': 1})
+        self.client.force_authenticate(self.user)
+        self.assertIdentical('/api/myths/')
+
+    def test_leaderboards_and_pending_votes_are_identical(self):
+        refresh_rankings()
+        self.assertIdentical('/api/myths/top/')
+        self.assertIdentical('/api/myths/trending/')
+        with override_settings(MYTH_VOTE_COUNTER_MODE='sharded'):
+            myth = Myth.objects.first()
+            cast_vote(myth.id, self.user, Vote.VoteType.DOWNVOTE)
+            listed = self.assertIdentical('/api/myths/', {'search': myth.title})
+        self.assertEqual(listed['results'][0]['downvotes'], myth.downvotes + 1)
+
+    def test_rows_share_nested_dicts(self):
+        serializer = MythListValuesSerializer()
+        data = serializer.serialize(serializer.values(Myth.objects.filter(category__name='Crops')))
+        self.assertEqual(len(data), 3)
+        self.assertIs(data[0]['category'], data[1]['category'])
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            'when': timezone.now(), 'amount': Decimal('1.50'), 1: [None, True, 2.5],
+            'text': 'maïs\u2028\u2029"quoted"\n', 'lazy': gettext_lazy('Crops'),
+            'huge': 2 ** 70,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class SparseFieldsetTests(APITestCase):
+    """?fields= and ?expand= prune the output and the queries behind it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='sparse@example.com', first_name='Sparse')
+        cls.category = Category.objects.create(name='Pests')
+        cls.myth = Myth.objects.create(
+            title='Sparse myth', description='Long description.', category=cls.category,
+            submitted_by=cls.user,
+        )
+        cls.comments = [
+            Comment.objects.create(myth=cls.myth, user=cls.user, content=f'Comment {i}')
+            for i in range(NESTED_PAGE_SIZE + 2)
+        ]
+        Evidence.objects.create(
+            myth=cls.myth, title='Trial', description='.', submitted_by=cls.user
+        )
+        cls.detail = f'/api/myths/{cls.myth.id}/'
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response.json(), [query['sql'] for query in context]
+
+    def test_nested_collections_are_paginated(self):
+        data, _ = self.get(self.detail)
+        self.assertEqual(data['evidence']['results'][0]['title'], 'Trial')
+        first = data['comments']
+        self.assertEqual(len(first['results']), NESTED_PAGE_SIZE)
+        self.assertEqual(first['results'][0]['content'], self.comments[-1].content)
+        rest, _ = self.get(first['next'])
+        self.assertIsNone(rest['next'])
+        self.assertEqual(
+            [row['content'] for row in first['results'] + rest['results']],
+            [comment.content for comment in reversed(self.comments)],
+        )
+
+    def test_fields_and_expand_prune_output_and_queries(self):
+        data, queries = self.get(
+            self.detail, fields='id,title,category,comments.content', expand='category,comments'
+        )
+        self.assertEqual(list(data), ['id', 'title', 'category', 'comments'])
+        self.assertEqual(data['category']['name'], 'Pests')
+        self.assertEqual(list(data['comments']['results'][0]), ['content'])
+        self.assertIn('fields=content', data['comments']['next'])
+        self.assertNotIn('"myths_myth"."description"', queries[0])
+        self.assertFalse(any('myths_vote' in sql or 'myths_evidence' in sql for sql in queries))
+        self.assertFalse(any('core_user' in sql for sql in queries))
+
+        data, queries = self.get(self.detail, expand='')
+        self.assertEqual((data['category'], data['submitted_by']), (self.category.id, self.user.id))
+        self.assertNotIn('comments', data)
+        self.assertEqual(len(queries), 1)
+
+    def test_list_endpoints(self):
+        for enabled in (True, False):
+            with override_settings(API_FAST_LIST_SERIALIZATION=enabled):
+                data, queries = self.get('/api/myths/', fields='id,title,category.name')
+            self.assertEqual(data['results'][0], {
+                'id': self.myth.id, 'title': 'Sparse myth', 'category': {'name': 'Pests'},
+            })
+            self.assertNotIn('"myths_myth"."description"', queries[-1])
+
+        data, _ = self.get('/api/evidence/', fields='id,submitted_by.first_name')
+        self.assertEqual(data['results'][0]['submitted_by'], {'first_name': 'Sparse'})
+        data, queries = self.get('/api/comments/', expand='', fields='content,user')
+        self.assertEqual(data['results'][0], {'content': self.comments[-1].content, 'user': self.user.id})
+        self.assertFalse(any('core_user' in sql for sql in queries))
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(self.detail, {'fields': 'id,comments.nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field: comments.nope']})
+        response = self.client.get('/api/myths/', {'expand': 'title'})
+        self.assertEqual(response.json(), {'expand': ['Unknown field: title']})
+
+
+class BatchIngestTests(APITestCase):
+    """Offline votes and comments are applied once per idempotency key."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='offline@example.com')
+        cls.other = User.objects.create(email='online@example.com')
+        cls.myths = [
+            Myth.objects.create(title=f'Offline myth {i}', description='.') for i in range(12)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def send(self, *operations):
+        response = self.client.post('/api/myths/batch/', {'operations': list(operations)}, format='json')
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response.json()['results']
+
+    def vote(self, key, myth, vote_type):
+        return {'key': key, 'type': 'vote', 'myth': myth.id, 'vote_type': vote_type}
+
+    def counters(self, myth):
+        myth.refresh_from_db()
+        return myth.upvotes, myth.downvotes, myth.total_votes
+
+    def test_operations_are_applied_once(self):
+        first, second = self.myths[:2]
+        cast_vote(second.id, self.user, Vote.VoteType.UPVOTE)
+        cast_vote(first.id, self.other, Vote.VoteType.UPVOTE)
+        batch = [
+            self.vote('a', first, 'upvote'),
+            self.vote('b', second, 'downvote'),
+            {'key': 'c', 'type': 'comment', 'myth': first.id, 'content': 'Mulching worked here'},
+            self.vote('d', first, None),
+            self.vote('e', first, 'downvote'),
+        ]
+        results = self.send(*batch)
+        self.assertEqual([result['status'] for result in results], ['applied'] * 5)
+        self.assertEqual(
+            [result['result'].get('vote') for result in results],
+            ['recorded', 'switched', None, 'removed', 'recorded'],
+        )
+        comment = Comment.objects.get(pk=results[2]['result']['comment'])
+        self.assertEqual(comment.user, self.user)
+        self.assertEqual(self.counters(first), (1, 1, 2))
+        self.assertEqual(self.counters(second), (0, 1, 1))
+        first.refresh_from_db()
+        self.assertEqual(first.comment_count, 1)
+        found = get_search_backend().search(Myth.objects.all(), 'mulching')
+        self.assertEqual([myth.id for myth in found], [first.id])
+
+        replayed = self.send(*batch, self.vote('f', second, None))
+        self.assertEqual([result['status'] for result in replayed], ['duplicate'] * 5 + ['applied'])
+        self.assertEqual([result['result'] for result in replayed[:5]], [r['result'] for r in results])
+        self.assertEqual(self.counters(first), (1, 1, 2))
+        self.assertEqual(self.counters(second), (0, 0, 0))
+        self.assertEqual(Comment.objects.filter(myth=first).count(), 1)
+
+    def test_invalid_and_repeated_operations(self):
+        myth = self.myths[0]
+        results = self.send(
+            self.vote('a', myth, 'upvote'),
+            self.vote('a', myth, 'downvote'),
+            {'key': 'b', 'type': 'comment', 'myth': myth.id},
+            {'key': 'c', 'type': 'vote', 'myth': 0, 'vote_type': 'upvote'},
+            'not an operation',
+        )
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['applied', 'duplicate', 'invalid', 'invalid', 'invalid'],
+        )
+        self.assertEqual(results[1]['result'], results[0]['result'])
+        self.assertEqual(results[2]['errors'], {'content': ['This field is required.']})
+        self.assertEqual(results[3]['errors'], {'myth': ['Myth not found.']})
+        self.assertEqual(self.counters(myth), (1, 0, 1))
+        self.assertEqual(set(IngestedOperation.objects.values_list('key', flat=True)), {'a'})
+
+        response = self.client.post('/api/myths/batch/', {'operations': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(MYTH_BATCH_MAX_OPERATIONS=1):
+            response = self.client.post('/api/myths/batch/', {'operations': [{}, {}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_vote_inserted_concurrently_is_applied_on_top(self):
+        myth = self.myths[0]
+        cast_vote(myth.id, self.user, Vote.VoteType.DOWNVOTE)
+        # The first read misses the vote, as if it was inserted right after.
+        reads = [{}]
+        read = ingest.current_votes
+
+        def racing_read(user, myth_ids):
+            return reads.pop() if reads else read(user, myth_ids)
+
+        with mock.patch.object(ingest, 'current_votes', side_effect=racing_read):
+            results = self.send(self.vote('a', myth, 'upvote'))
+        self.assertEqual(results[0]['result']['vote'], 'switched')
+        self.assertEqual(self.counters(myth), (1, 0, 1))
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        counts = []
+        for size, prefix in ((2, 'small'), (10, 'large')):
+            operations = []
+            for i, myth in enumerate(self.myths[:size]):
+                operations.append(self.vote(f'{prefix}-v{i}', myth, 'upvote' if i % 2 else 'downvote'))
+                operations.append({
+                    'key': f'{prefix}-c{i}', 'type': 'comment', 'myth': myth.id, 'content': 'Yes',
+                })
+            with CaptureQueriesContext(connection) as context:
+                self.send(*operations)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(APITestCase):
+    """/api/sync/ returns the rows changed since a token, with tombstones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='mobile@example.com')
+        cls.category = Category.objects.create(name='Soil')
+        cls.myths = [
+            Myth.objects.create(title=f'Synced myth {i}', description='.', category=cls.category)
+            for i in range(3)
+        ]
+        cls.evidence = Evidence.objects.create(
+            myth=cls.myths[0], title='Trial', description='.', evidence_type='field_trial'
+        )
+        cls.comment = Comment.objects.create(myth=cls.myths[1], user=cls.user, content='Seen it')
+
+    def sync(self, since=None, **extra):
+        response = self.client.get('/api/sync/', {'since': since} if since else {}, **extra)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return response.json()
+
+    def sync_all(self, since=None):
+        """Follow ``next`` to the end; returns ``(changes, token)``."""
+        changes, page = [], self.sync(since)
+        while True:
+            changes.extend(page['changes'])
+            if page['next'] is None:
+                return changes, page['token']
+            page = self.client.get(page['next']).json()
+
+    def keys(self, changes):
+        return [(change['type'], change['id'], change['deleted']) for change in changes]
+
+    def test_first_sync_then_deltas(self):
+        with override_settings(SYNC_PAGE_SIZE=2):
+            changes, token = self.sync_all()
+        self.assertEqual(self.keys(changes), [
+            ('category', self.category.id, False),
+            *[('myth', myth.id, False) for myth in self.myths],
+            ('evidence', self.evidence.id, False),
+            ('comment', self.comment.id, False),
+        ])
+        self.assertEqual(changes[1]['data']['category_id'], self.category.id)
+        self.assertEqual(changes[-1]['data']['content'], 'Seen it')
+        self.assertEqual(self.sync(token)['changes'], [])
+
+        first, second, third = self.myths
+        first.title = 'Renamed'
+        first.save()
+        comment_id = self.comment.id
+        self.comment.delete()
+        cast_vote(third.id, self.user, Vote.VoteType.UPVOTE)
+        changes, token = self.sync_all(token)
+        self.assertEqual(self.keys(changes), [
+            ('myth', first.id, False),
+            ('comment', comment_id, True),
+            ('myth', third.id, False),
+        ])
+        self.assertEqual(changes[0]['data']['title'], 'Renamed')
+        self.assertEqual(changes[2]['data']['upvotes'], 1)
+        self.assertNotIn('data', changes[1])
+
+        category_id = self.category.id
+        self.category.delete()
+        changes, token = self.sync_all(token)
+        self.assertEqual(sorted(self.keys(changes[:3])), [('myth', myth.id, False) for myth in self.myths])
+        self.assertEqual(self.keys(changes[3:]), [('category', category_id, True)])
+        self.assertEqual({change['data']['category_id'] for change in changes[:3]}, {None})
+
+    def test_bulk_writes_are_logged(self):
+        _, token = self.sync_all()
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/myths/batch/', {'operations': [
+            {'key': 'a', 'type': 'comment', 'myth': self.myths[2].id, 'content': 'Offline'},
+            {'key': 'b', 'type': 'vote', 'myth': self.myths[0].id, 'vote_type': 'downvote'},
+        ]}, format='json')
+        comment_id = response.json()['results'][0]['result']['comment']
+        self.client.force_authenticate(None)
+        changes, _ = self.sync_all(token)
+        self.assertEqual(
+            self.keys(changes),
+            [('myth', self.myths[0].id, False), ('comment', comment_id, False)],
+        )
+
+    def test_recent_changes_wait_to_settle(self):
+        _, token = self.sync_all()
+        Myth.objects.create(title='Just now', description='.')
+        with override_settings(SYNC_SETTLE_SECONDS=60):
+            page = self.sync(token)
+        self.assertEqual(page['changes'], [])
+        self.assertEqual(len(self.sync(page['token'])['changes']), 1)
+
+    def test_pages_stop_at_the_first_unsettled_change(self):
+        _, token = self.sync_all()
+        first = Category.objects.create(name='Stamped late')
+        second = Category.objects.create(name='Stamped early')
+        # The higher id has the older stamp, e.g. from an app server behind the other.
+        SyncChange.objects.filter(kind='category', object_id=second.id).update(
+            created_at=timezone.now() - timedelta(seconds=60)
+        )
+        with override_settings(SYNC_SETTLE_SECONDS=10):
+            page = self.sync(token)
+        self.assertEqual(page['changes'], [])
+        SyncChange.objects.filter(kind='category', object_id=first.id).update(
+            created_at=timezone.now()
+        )
+        changes, _ = self.sync_all(page['token'])
+        self.assertEqual(
+            self.keys(changes), [('category', first.id, False), ('category', second.id, False)]
+        )
+
+    def test_changes_after_an_open_write_transaction_are_held_back(self):
+        _, token = self.sync_all()
+        started = timezone.now()
+        Myth.objects.create(title='Committed while another writes', description='.')
+        with mock.patch.object(sync, 'oldest_write_started', return_value=started):
+            page = self.sync(token)
+        self.assertEqual(page['changes'], [])
+        self.assertEqual(len(self.sync(page['token'])['changes']), 1)
+
+    def test_invalid_and_expired_tokens(self):
+        response = self.client.get('/api/sync/', {'since': 'not-a-token'})
+        self.assertEqual(response.status_code, 400)
+        expired = encode_token(0, timezone.now() - timedelta(days=365))
+        response = self.client.get('/api/sync/', {'since': expired})
+        self.assertEqual(response.status_code, 410)
+
+    def test_response_is_compressed(self):
+        response = self.client.get('/api/sync/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        page = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(page['changes']), 6)
+
+    def test_retention_expires_old_tombstones(self):
+        self.comment.delete()
+        self.evidence.delete()
+        SyncChange.objects.filter(kind='comment').update(
+            created_at=timezone.now() - timedelta(days=365)
+        )
+        call_command('apply_retention', stdout=StringIO())
+        self.assertEqual(
+            list(SyncChange.objects.filter(deleted=True).values_list('kind', flat=True)),
+            ['evidence'],
+        )
+
+
+class ResponseCompressionTests(APITestCase):
+    """Responses are compressed as negotiated; cached ones are stored compressed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='metered@example.com')
+        cls.myths = [
+            Myth.objects.create(title=f'Compressed myth {i}', description='Rain follows the plough. ' * 5)
+            for i in range(20)
+        ]
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_cached_responses_are_served_compressed(self):
+        plain = self.client.get('/api/myths/')
+        self.assertNotIn('Content-Encoding', plain)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/myths/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], f'W/{plain["ETag"]}')
+        not_modified = self.client.get(
+            '/api/myths/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        if brotli is not None:
+            response = self.client.get('/api/myths/', HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_uncached_and_unsafe_requests(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/myths/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 20)
+        response = self.client.post(
+            '/api/myths/batch/', {'operations': []}, format='json', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertNotIn('Content-Encoding', response)
+        with override_settings(API_COMPRESSION_ENABLED=False):
+            response = self.client.get('/api/myths/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_export_is_compressed_as_a_stream(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/myths/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 20)
+
+    @unittest.skipIf(msgpack is None, 'requires msgpack')
+    def test_message_pack_is_negotiated_and_cached(self):
+        expected = self.client.get('/api/myths/').json()
+        for _ in range(2):
+            response = self.client.get('/api/myths/', HTTP_ACCEPT='application/msgpack')
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(response.content), expected)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = self.client.get('/api/myths/', {'format': 'msgpack'})
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class AsyncReadTests(TestCase):
+    """Async views answer reads exactly like the sync viewsets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='reader@example.com')
+        crops = Category.objects.create(name='Crops')
+        Category.objects.create(name='Soil')
+        cls.myths = [
+            Myth.objects.create(
+                title=f'Async myth {i}', description='.', origin='Kenya',
+                category=crops if i % 2 else None, submitted_by=cls.user, total_votes=i,
+            )
+            for i in range(5)
+        ]
+        Evidence.objects.create(
+            myth=cls.myths[0], title='Trial', description='.', evidence_type='field_trial',
+        )
+        Comment.objects.create(myth=cls.myths[0], user=cls.user, content='Seen it.')
+        for i in range(3):
+            Notification.objects.create(
+                user=cls.user, notification_type='myth_update', title=f'Update {i}', message='.'
+            )
+
+    @staticmethod
+    def views(viewset, actions):
+        with override_settings(API_ASYNC_VIEWS=True):
+            async_view = viewset.as_view(actions)
+        return viewset.as_view(actions), async_view
+
+    async def assertIdentical(self, viewset, path, params=None, user=None, status=200, **kwargs):
+        """Returns the data of the async view after comparing it with the sync one."""
+        sync_view, async_view = self.views(viewset, {'get': 'retrieve' if kwargs else 'list'})
+        sync_request = RequestFactory().get(path, params or {})
+        async_request = AsyncRequestFactory().get(path, params or {})
+        if user is not None:
+            force_authenticate(sync_request, user)
+            force_authenticate(async_request, user)
+        expected = await sync_to_async(sync_view)(sync_request, **kwargs)
+        response = await async_view(async_request, **kwargs)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.render().content, expected.render().content)
+        return json.loads(response.content)
+
+    def test_views_are_async_only_when_enabled(self):
+        read_write = {'get': 'list', 'post': 'create'}
+        self.assertFalse(iscoroutinefunction(MythViewSet.as_view(read_write)))
+        with override_settings(API_ASYNC_VIEWS=True):
+            view = MythViewSet.as_view(read_write)
+            self.assertFalse(iscoroutinefunction(MythViewSet.as_view({'get': 'trending'})))
+            self.assertFalse(iscoroutinefunction(MythViewSet.as_view({'post': 'batch'})))
+        self.assertTrue(iscoroutinefunction(view))
+        self.assertIs(view.cls, MythViewSet)
+        self.assertEqual(view.actions, read_write)
+        self.assertTrue(view.csrf_exempt)
+
+    async def test_myth_reads_are_identical(self):
+        first = await self.assertIdentical(MythViewSet, '/api/myths/', {'page_size': 2})
+        await self.assertIdentical(MythViewSet, first['next'])
+        await self.assertIdentical(
+            MythViewSet, '/api/myths/', {'ordering': '-total_votes', 'count': 'exact'}
+        )
+        await self.assertIdentical(MythViewSet, '/api/myths/', {'page': 1})
+        await self.assertIdentical(MythViewSet, '/api/myths/', {'search': 'async', 'category': 1})
+        await self.assertIdentical(MythViewSet, '/api/myths/', {'fields': 'id,title,category.name'})
+        await self.assertIdentical(MythViewSet, '/api/myths/', {'cursor': 'nonsense'}, status=404)
+
+        myth = self.myths[0]
+        detail = await self.assertIdentical(MythViewSet, f'/api/myths/{myth.id}/', pk=myth.id)
+        self.assertEqual(len(detail['evidence']['results']), 1)
+        self.assertEqual(len(detail['comments']['results']), 1)
+        await self.assertIdentical(MythViewSet, '/api/myths/0/', pk=0, status=404)
+        await self.assertIdentical(MythViewSet, '/api/myths/x/', pk='x', status=404)
+
+    async def test_category_and_notification_reads_are_identical(self):
+        categories = await self.assertIdentical(CategoryViewSet, '/api/categories/')
+        self.assertEqual(categories['count'], 2)
+        category = categories['results'][0]['id']
+        await self.assertIdentical(
+            CategoryViewSet, f'/api/categories/{category}/', pk=category
+        )
+        notifications = await self.assertIdentical(
+            NotificationViewSet, '/api/notifications/', {'is_read': 'false'}, user=self.user
+        )
+        self.assertEqual(len(notifications['results']), 3)
+        await self.assertIdentical(NotificationViewSet, '/api/notifications/', status=401)
+
+    async def test_writes_go_to_the_sync_view(self):
+        _, view = self.views(MythViewSet, {'get': 'list', 'post': 'create'})
+        request = AsyncRequestFactory().post('/api/myths/', {'title': 'Sneaky'})
+        response = await view(request)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(await Myth.objects.filter(title='Sneaky').aexists())
+
+    async def test_responses_are_cached_for_both_views(self):
+        sync_view, async_view = self.views(MythViewSet, {'get': 'list'})
+        await sync_to_async(get_cache().clear)()
+        with override_settings(API_CACHE_ENABLED=True):
+            response = await async_view(AsyncRequestFactory().get('/api/myths/'))
+            self.assertEqual(response['X-Cache'], 'MISS')
+            cached = await sync_to_async(sync_view)(RequestFactory().get('/api/myths/'))
+            self.assertEqual(cached['X-Cache'], 'HIT')
+            response = await async_view(AsyncRequestFactory().get('/api/myths/'))
+            self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.content, cached.content)
+
+    async def test_asgi_stack(self):
+        response = await self.async_client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import streams, views
 
 router = DefaultRouter()
 router.register(r'categories', views.CategoryViewSet)
@@ -10,12 +10,12 @@ router.register(r'comments', views.CommentViewSet)
 router.register(r'votes', views.VoteViewSet)
 router.register(r'research-requests', views.ResearchRequestViewSet, basename='research-request')
 router.register(r'notifications', views.NotificationViewSet, basename='notification')
+router.register(r'sync', views.SyncViewSet, basename='sync')
 
 # Additional URL patterns for nested routes
 urlpatterns = [
-    # Custom actions for myths
-    path('myths/<int:pk>/upvote/', views.MythViewSet.as_view({'post': 'upvote'}), name='myth-upvote'),
-    path('myths/<int:pk>/downvote/', views.MythViewSet.as_view({'post': 'downvote'}), name='myth-downvote'),
+    # Myth upvote/downvote are routed by the router so that their
+    # action-level permissions apply.
     
     # Custom actions for research requests
     path('research-requests/<int:pk>/assign/', 
@@ -32,6 +32,9 @@ urlpatterns = [
     path('notifications/<int:pk>/mark-read/', 
          views.NotificationViewSet.as_view({'post': 'mark_as_read'}), 
          name='notification-mark-read'),
+    # Server-sent events; async, served without a worker thread under ASGI
+    path('notifications/stream/', streams.notification_stream,
+         name='notification-stream'),
     
     # Include router URLs
     path('', include(router.urls)),
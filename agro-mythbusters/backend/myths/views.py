@@ -1,8 +1,12 @@
+import codecs
+
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from .models import (
     Category, Myth, Evidence, Comment, 
@@ -12,15 +16,32 @@ from .serializers import (
     CategorySerializer, MythSerializer, 
     EvidenceSerializer, CommentSerializer,
     VoteSerializer, ResearchRequestSerializer,
-    NotificationSerializer, MythListSerializer
+    NotificationSerializer, MythListSerializer, MythListValuesSerializer
 )
+from .cache import CachedResponseMixin
+from .export import CONTENT_TYPES, FORMAT_NDJSON, export_blocks, export_lines, parse_since
+from .filters import MythSearchFilter
+from .importer import IMPORT_FORMATS, MythImporter, read_rows
+from .ingest import ingest_operations, max_operations
+from .notifications import enqueue_fanout, get_unread_count, mark_read
+from .rankings import TOP, TRENDING, leaderboard, top_n
+from .streams import issue_ticket, ticket_max_age
+from .sync import InvalidSyncToken, SyncTokenExpired, sync_page
+from .votes import cast_vote, with_pending_votes, VOTE_REMOVED
+from core.async_views import AsyncReadMixin
+from core.fast_serializers import FastListMixin
+from core.fieldsets import SparseFieldsetMixin
+from core.pagination import KeysetPagination
+from core.query_plans import QueryPlanMixin, plan_for_instance
 from core.permissions import IsOwnerOrReadOnly, IsResearcherOrReadOnly, IsAdminOrReadOnly
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing categories.
     """
+    cache_name = 'category'
+    serializer_queries = False
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAdminOrReadOnly]
@@ -30,35 +51,39 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering = ['name']
 
 
-class MythViewSet(viewsets.ModelViewSet):
+class MythViewSet(CachedResponseMixin, SparseFieldsetMixin, FastListMixin, QueryPlanMixin,
+                  AsyncReadMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing myths.
     """
+    cache_name = 'myth'
     queryset = Myth.objects.all()
     serializer_class = MythSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, MythSearchFilter]
     filterset_fields = ['status', 'is_featured', 'category']
-    search_fields = ['title', 'description', 'origin']
     ordering_fields = ['created_at', 'updated_at', 'total_votes']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    query_plan_actions = QueryPlanMixin.query_plan_actions + ('trending', 'top')
+    fast_list_serializer_class = MythListValuesSerializer
+    # Pages of the collections MythSerializer embeds (see core.fieldsets).
+    nested_collections = {
+        'evidence': ('evidences', EvidenceSerializer),
+        'comments': ('comments', CommentSerializer),
+        'votes': ('votes', VoteSerializer),
+        'research_requests': ('research_requests', ResearchRequestSerializer),
+    }
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'trending', 'top'):
             return MythListSerializer
+        if self.action in self.nested_collections:
+            return self.nested_collections[self.action][1]
         return MythSerializer
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Filter by search query
-        search_query = self.request.query_params.get('search', None)
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(origin__icontains=search_query)
-            )
+        queryset = with_pending_votes(super().get_queryset())
         
         # Filter by category name
         category = self.request.query_params.get('category_name', None)
@@ -85,62 +110,159 @@ class MythViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(submitted_by=self.request.user)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Myths with the most recent votes and comments (see myths.rankings)."""
+        return self._leaderboard(request, TRENDING)
+    
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        """Myths with the most votes of all time, optionally per ``category``."""
+        return self._leaderboard(request, TOP)
+    
+    def _leaderboard(self, request, kind):
+        try:
+            category = request.query_params.get('category')
+            category = int(category) if category else None
+            limit = int(request.query_params.get('limit', top_n()))
+        except ValueError:
+            return Response(
+                {'detail': 'category and limit must be integers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit < 1:
+            return Response({'detail': 'limit must be at least 1.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, top_n())
+        if self.use_fast_list():
+            serializer = self.get_fast_list_serializer()
+            myths = leaderboard(serializer.values(self.get_queryset()), kind, category, limit)
+            return Response(serializer.serialize(myths))
+        myths = leaderboard(self.get_queryset(), kind, category, limit)
+        serializer = self.get_serializer(myths, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        """
+        Stream all myths with evidence and vote tallies as NDJSON or CSV
+        (``export_format``), optionally only those changed ``since`` a datetime.
+        The list filters apply.
+        """
+        export_format = request.query_params.get('export_format', FORMAT_NDJSON)
+        if export_format not in CONTENT_TYPES:
+            return Response(
+                {'export_format': f'Must be one of: {", ".join(CONTENT_TYPES)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            since = parse_since(request.query_params.get('since'))
+        except ValueError as exc:
+            return Response({'since': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lines = export_lines(queryset, export_format, since=since)
+        response = StreamingHttpResponse(
+            export_blocks(lines),
+            content_type=CONTENT_TYPES[export_format]
+        )
+        stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+        response['Content-Disposition'] = f'attachment; filename="myths-{stamp}.{export_format}"'
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='import',
+            permission_classes=[permissions.IsAdminUser])
+    def bulk_import(self, request):
+        """
+        Import myths with evidence from an uploaded ``file`` or the raw request
+        body, as NDJSON or CSV (``import_format``). Invalid rows are reported
+        and skipped.
+        """
+        import_format = request.query_params.get('import_format', FORMAT_NDJSON)
+        if import_format not in IMPORT_FORMATS:
+            return Response(
+                {'import_format': f'Must be one of: {", ".join(IMPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'file': 'No file was submitted.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            stream = upload.file
+        else:
+            # Read the body as it arrives instead of through a parser.
+            stream = request._request
+        text = codecs.getreader('utf-8-sig')(stream)
+        summary = MythImporter(user=request.user).run(read_rows(text, import_format))
+        return Response(summary)
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def batch(self, request):
+        """
+        Apply a batch of vote and comment ``operations`` recorded offline,
+        each with a client-generated idempotency ``key`` (see myths.ingest).
+        Returns one result per operation, in order.
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return Response({'operations': 'Must be a non-empty list.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > max_operations():
+            return Response(
+                {'operations': f'At most {max_operations()} operations per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'results': ingest_operations(request.user, operations)})
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def upvote(self, request, pk=None):
         """Upvote a myth."""
         return self._handle_vote(request, pk, 'upvote')
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def downvote(self, request, pk=None):
         """Downvote a myth."""
         return self._handle_vote(request, pk, 'downvote')
     
+    @action(detail=True, methods=['get'])
+    def evidence(self, request, pk=None):
+        """All evidence of a myth, newest first (the rest of ``evidence``)."""
+        return self._nested_page(request)
+    
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        """All comments on a myth, newest first."""
+        return self._nested_page(request)
+    
+    @action(detail=True, methods=['get'])
+    def votes(self, request, pk=None):
+        """All votes on a myth, newest first."""
+        return self._nested_page(request)
+    
+    @action(detail=True, methods=['get'], url_path='research-requests')
+    def research_requests(self, request, pk=None):
+        """All research requests for a myth, newest first."""
+        return self._nested_page(request)
+    
+    def _nested_page(self, request):
+        myth = self.get_object()
+        relation, _ = self.nested_collections[self.action]
+        queryset = getattr(myth, relation).all()
+        queryset = self.load_only_selected(plan_for_instance(self.get_serializer()).apply(queryset))
+        page = self.paginate_queryset(queryset.order_by('-created_at', '-id'))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+    
     def _handle_vote(self, request, pk, vote_type):
         myth = self.get_object()
-        user = request.user
-        
-        # Check if user has already voted
-        vote = Vote.objects.filter(myth=myth, user=user).first()
+        outcome = cast_vote(myth.pk, request.user, vote_type)
         
-        if vote:
-            # If same vote type, remove the vote
-            if vote.vote_type == vote_type:
-                vote.delete()
-                # Update vote counts
-                myth.total_votes -= 1
-                if vote_type == 'upvote':
-                    myth.upvotes -= 1
-                else:
-                    myth.downvotes -= 1
-                myth.save()
-                return Response({'status': 'vote removed'})
-            # If different vote type, update the vote
-            else:
-                # Update previous vote counts
-                if vote.vote_type == 'upvote':
-                    myth.upvotes -= 1
-                    myth.downvotes += 1
-                else:
-                    myth.downvotes -= 1
-                    myth.upvotes += 1
-                # Update vote
-                vote.vote_type = vote_type
-                vote.save()
-        else:
-            # Create new vote
-            Vote.objects.create(myth=myth, user=user, vote_type=vote_type)
-            # Update vote counts
-            myth.total_votes += 1
-            if vote_type == 'upvote':
-                myth.upvotes += 1
-            else:
-                myth.downvotes += 1
-        
-        myth.save()
+        if outcome == VOTE_REMOVED:
+            return Response({'status': 'vote removed'})
         return Response({'status': 'vote recorded'})
 
 
-class EvidenceViewSet(viewsets.ModelViewSet):
+class EvidenceViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing evidence.
     """
@@ -177,7 +299,7 @@ class EvidenceViewSet(viewsets.ModelViewSet):
         serializer.save(submitted_by=self.request.user)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing comments.
     """
@@ -188,6 +310,7 @@ class CommentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['myth', 'is_approved']
     ordering_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -213,7 +336,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class ResearchRequestViewSet(viewsets.ModelViewSet):
+class ResearchRequestViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing research requests.
     """
@@ -306,6 +429,15 @@ class ResearchRequestViewSet(viewsets.ModelViewSet):
         
         myth.save()
         
+        # Followers are notified by the fan-out worker, not in this request.
+        enqueue_fanout(
+            myth,
+            Notification.NotificationType.STATUS_CHANGE,
+            title=f'Research completed: {myth.title}'[:255],
+            message=f'"{myth.title}" is now marked as {myth.get_status_display().lower()}.',
+            exclude_user=request.user,
+        )
+        
         return Response({'status': 'research request completed'})
 
 
@@ -382,15 +514,18 @@ class VoteViewSet(viewsets.ModelViewSet):
         return Response({"status": "vote updated"}, status=status.HTTP_200_OK)
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and managing notifications.
     """
     serializer_class = NotificationSerializer
+    serializer_queries = False
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['is_read', 'notification_type']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
@@ -399,18 +534,44 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_as_read(self, request, pk=None):
         """Mark a notification as read."""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        mark_read(request.user.pk, [notification.pk])
         return Response({'status': 'notification marked as read'})
     
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         """Mark all notifications as read."""
-        updated = Notification.objects.filter(
-            user=request.user, 
-            is_read=False
-        ).update(is_read=True)
+        updated = mark_read(request.user.pk)
         
         return Response({
             'status': f'marked {updated} notifications as read'
         })
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """Number of unread notifications, without listing them."""
+        return Response({'unread': get_unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['post'], url_path='stream-ticket')
+    def stream_ticket(self, request):
+        """A ticket opening the event stream until it expires (see myths/streams.py)."""
+        return Response({'ticket': issue_ticket(request.user), 'expires_in': ticket_max_age()})
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Categories, myths, evidence and comments changed or deleted since the
+    ``since`` token of a previous sync, or all of them without one (see
+    myths.sync). Follow ``next`` while it is set, then keep ``token`` for
+    the next sync.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request):
+        try:
+            changes, token, more = sync_page(request.query_params.get('since'))
+        except SyncTokenExpired as exc:
+            return Response({'since': str(exc)}, status=status.HTTP_410_GONE)
+        except InvalidSyncToken as exc:
+            return Response({'since': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        next_url = replace_query_param(request.build_absolute_uri(), 'since', token) if more else None
+        return Response({'token': token, 'next': next_url, 'changes': changes})
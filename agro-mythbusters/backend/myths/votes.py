@@ -0,0 +1,248 @@
+"""
+Vote recording and myth vote counters.
+
+Counters on ``Myth`` are only ever changed through relative, database-side
+updates (``F()`` expressions) so concurrent votes on the same myth cannot
+overwrite each other, and the myth row is only touched by a single UPDATE
+instead of a full ``save()``.
+
+``settings.MYTH_VOTE_COUNTER_MODE`` selects how vote deltas reach the myth:
+
+* ``'direct'`` (default) updates the myth row inside the voting transaction.
+* ``'sharded'`` adds the delta to one of ``MYTH_VOTE_COUNTER_SHARDS`` rows in
+  ``VoteCounterShard`` so votes on a featured myth do not all contend for
+  its row. ``flush_vote_counters`` periodically folds the shards into the
+  myth, and reads add the pending shard totals via ``with_pending_votes``.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidate_myths
+from .models import Myth, Vote, VoteCounterShard
+from .sync import record_changes
+
+VOTE_RECORDED = 'recorded'
+VOTE_SWITCHED = 'switched'
+VOTE_REMOVED = 'removed'
+
+COUNTER_MODE_DIRECT = 'direct'
+COUNTER_MODE_SHARDED = 'sharded'
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def vote_delta(vote_type, sign=1):
+    """Counter delta for adding (``sign=1``) or removing (``-1``) a vote."""
+    if vote_type == Vote.VoteType.UPVOTE:
+        return {'upvotes': sign, 'downvotes': 0}
+    return {'upvotes': 0, 'downvotes': sign}
+
+
+def switch_delta(vote_type):
+    """Counter delta for turning the opposite vote into ``vote_type``."""
+    added = vote_delta(vote_type)
+    return {key: 2 * value - 1 for key, value in added.items()}
+
+
+def apply_counter_delta(myth_id, upvotes=0, downvotes=0):
+    """Shift the vote counters of a myth by the given amounts in one UPDATE."""
+    _shift_counters([myth_id], upvotes, downvotes)
+
+
+def _shift_counters(myth_ids, upvotes, downvotes):
+    if not upvotes and not downvotes:
+        return
+    Myth.objects.filter(pk__in=myth_ids).update(
+        upvotes=F('upvotes') + upvotes,
+        downvotes=F('downvotes') + downvotes,
+        total_votes=F('total_votes') + upvotes + downvotes,
+        updated_at=timezone.now(),
+    )
+    record_changes(Myth, myth_ids)
+
+
+def counter_mode():
+    return getattr(settings, 'MYTH_VOTE_COUNTER_MODE', COUNTER_MODE_DIRECT)
+
+
+def apply_shard_delta(myth_id, upvotes=0, downvotes=0):
+    """Add a counter delta to a randomly chosen shard of the myth."""
+    if not upvotes and not downvotes:
+        return
+    shard = random.randrange(getattr(settings, 'MYTH_VOTE_COUNTER_SHARDS', 8))
+    updated = VoteCounterShard.objects.filter(myth_id=myth_id, shard=shard).update(
+        upvotes=F('upvotes') + upvotes,
+        downvotes=F('downvotes') + downvotes,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            VoteCounterShard.objects.create(
+                myth_id=myth_id, shard=shard, upvotes=upvotes, downvotes=downvotes
+            )
+    except IntegrityError:
+        # Another vote created this shard concurrently; add to it instead.
+        apply_shard_delta(myth_id, upvotes, downvotes)
+
+
+def record_counter_delta(myth_id, upvotes=0, downvotes=0):
+    """Route a vote counter delta according to the configured counter mode."""
+    if counter_mode() == COUNTER_MODE_SHARDED:
+        apply_shard_delta(myth_id, upvotes, downvotes)
+    else:
+        apply_counter_delta(myth_id, upvotes, downvotes)
+
+
+def record_counter_deltas(deltas):
+    """
+    ``record_counter_delta`` for ``{myth_id: (upvotes, downvotes)}``. In
+    direct mode myths with the same delta share one UPDATE, so a batch costs
+    at most one UPDATE per distinct delta whatever the number of myths.
+    """
+    if counter_mode() == COUNTER_MODE_SHARDED:
+        for myth_id, (upvotes, downvotes) in deltas.items():
+            apply_shard_delta(myth_id, upvotes, downvotes)
+        return
+    groups = defaultdict(list)
+    for myth_id, delta in deltas.items():
+        groups[delta].append(myth_id)
+    for (upvotes, downvotes), myth_ids in groups.items():
+        _shift_counters(myth_ids, upvotes, downvotes)
+
+
+def flush_vote_counters(myth_ids=None):
+    """
+    Fold pending counter shards into their myths.
+
+    Each myth is flushed in its own short transaction that locks its shard
+    rows, so votes on other myths are never blocked. Returns the number of
+    flushed myths.
+    """
+    shards = VoteCounterShard.objects.all()
+    if myth_ids is not None:
+        shards = shards.filter(myth_id__in=myth_ids)
+    pending = list(shards.order_by().values_list('myth_id', flat=True).distinct())
+
+    for myth_id in pending:
+        with transaction.atomic():
+            rows = list(
+                VoteCounterShard.objects.select_for_update()
+                .filter(myth_id=myth_id)
+                .values_list('pk', 'upvotes', 'downvotes')
+            )
+            VoteCounterShard.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            apply_counter_delta(
+                myth_id,
+                upvotes=sum(up for _, up, _ in rows),
+                downvotes=sum(down for _, _, down in rows),
+            )
+    return len(pending)
+
+
+def _pending_sum(field):
+    pending = (
+        VoteCounterShard.objects.filter(myth=OuterRef('pk'))
+        .order_by().values('myth').annotate(total=Sum(field)).values('total')
+    )
+    return Coalesce(Subquery(pending), Value(0))
+
+
+def with_pending_votes(queryset):
+    """
+    Annotate myths with ``pending_upvotes``/``pending_downvotes`` that have not
+    been flushed yet, so serializers can report up-to-date counts. A no-op in
+    direct mode.
+    """
+    if counter_mode() != COUNTER_MODE_SHARDED:
+        return queryset
+    return queryset.annotate(
+        pending_upvotes=_pending_sum('upvotes'),
+        pending_downvotes=_pending_sum('downvotes'),
+    )
+
+
+def cast_vote(myth_id, user, vote_type):
+    """
+    Record ``user``'s vote on a myth with toggle semantics.
+
+    Voting the same way twice removes the vote, voting the other way switches
+    it. Returns one of ``VOTE_RECORDED``, ``VOTE_SWITCHED`` or ``VOTE_REMOVED``.
+
+    Every branch starts with a write, so the transaction takes its write lock
+    up front instead of upgrading a read lock (which deadlocks on SQLite).
+    """
+    votes = Vote.objects.filter(myth_id=myth_id, user=user)
+    with transaction.atomic():
+        if votes.filter(vote_type=vote_type).delete()[0]:
+            delta, outcome = vote_delta(vote_type, -1), VOTE_REMOVED
+        elif votes.update(vote_type=vote_type):
+            delta, outcome = switch_delta(vote_type), VOTE_SWITCHED
+        else:
+            try:
+                with transaction.atomic():
+                    Vote.objects.create(myth_id=myth_id, user=user, vote_type=vote_type)
+            except IntegrityError:
+                # A concurrent request from the same user inserted first;
+                # apply this vote on top of theirs.
+                return cast_vote(myth_id, user, vote_type)
+            delta, outcome = vote_delta(vote_type), VOTE_RECORDED
+
+        record_counter_delta(myth_id, **delta)
+        # Votes are written with queryset updates, which send no signals.
+        invalidate_myths([myth_id])
+    return outcome
+
+
+def _vote_count(vote_type=None):
+    votes = Vote.objects.filter(myth=OuterRef('pk'))
+    if vote_type:
+        votes = votes.filter(vote_type=vote_type)
+    count = votes.order_by().values('myth').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(count), Value(0))
+
+
+def reconcile_vote_counts(myth_ids=None):
+    """
+    Recompute the vote counters from the ``Vote`` table.
+
+    Only myths whose stored counters disagree with the votes are rewritten,
+    one UPDATE per batch, and their cached responses invalidated. Returns the
+    number of corrected myths.
+    """
+    # Pending shards would otherwise be counted twice on their next flush.
+    flush_vote_counters(myth_ids)
+
+    myths = Myth.objects.all()
+    if myth_ids is not None:
+        myths = myths.filter(pk__in=myth_ids)
+
+    drifted = myths.annotate(
+        actual_upvotes=_vote_count(Vote.VoteType.UPVOTE),
+        actual_downvotes=_vote_count(Vote.VoteType.DOWNVOTE),
+    ).filter(
+        ~Q(upvotes=F('actual_upvotes')) |
+        ~Q(downvotes=F('actual_downvotes')) |
+        ~Q(total_votes=F('actual_upvotes') + F('actual_downvotes'))
+    )
+    drifted_ids = list(drifted.values_list('pk', flat=True))
+
+    for start in range(0, len(drifted_ids), RECONCILE_BATCH_SIZE):
+        with transaction.atomic():
+            Myth.objects.filter(
+                pk__in=drifted_ids[start:start + RECONCILE_BATCH_SIZE]
+            ).update(
+                upvotes=_vote_count(Vote.VoteType.UPVOTE),
+                downvotes=_vote_count(Vote.VoteType.DOWNVOTE),
+                total_votes=_vote_count(),
+            )
+    record_changes(Myth, drifted_ids)
+    if drifted_ids:
+        invalidate_myths(drifted_ids)
+    return len(drifted_ids)